@@ -0,0 +1,128 @@
+"""Métadonnées des images contenues dans des archives ZIP ou TAR, sans extraction sur disque
+
+Usage :
+    python archive.py ARCHIVE [ARCHIVE ...]
+    cat photos.tar.gz | python archive.py -
+
+Les membres sont parcourus dans l'ordre de l'archive et passés en flux à
+``MetadataExtractor.extract_stream`` : de chaque image, seul l'en-tête est
+lu et décompressé. Une archive TAR non positionnable (tube, socket) est
+lue en mode flux ; un ZIP doit être positionnable, son répertoire central
+étant à la fin du fichier.
+"""
+import argparse
+import json
+import os
+import sys
+import tarfile
+import zipfile
+from collections import namedtuple
+from datetime import datetime
+
+from extractor import IMAGE_EXTENSIONS, MetadataExtractor, stream_seekable
+
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+# Séparateur entre le chemin de l'archive et le nom du membre : « photos.zip!2024/img.jpg »
+MEMBER_SEPARATOR = "!"
+
+# Stat d'un membre d'archive, avec les champs lus par MetadataExtractor.flat_record
+MemberStat = namedtuple("MemberStat", "st_size st_ctime st_mtime")
+
+
+def is_archive(path):
+    """Indique si un chemin a l'extension d'une archive ZIP ou TAR"""
+    return os.fspath(path).lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def member_path(archive, name):
+    """Chemin affiché d'un membre d'archive"""
+    return f"{archive}{MEMBER_SEPARATOR}{name}"
+
+
+def zip_timestamp(date_time):
+    try:
+        return datetime(*date_time).timestamp()
+    except ValueError:
+        return None
+
+
+def iter_members(source, extensions=IMAGE_EXTENSIONS):
+    """Retourne (nom, ``MemberStat``, flux) pour chaque image d'une archive ZIP ou TAR
+
+    ``source`` est un chemin ou un objet fichier binaire. Un flux n'est
+    valable que jusqu'au membre suivant.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as fp:
+            yield from iter_members(fp, extensions)
+        return
+
+    seekable = stream_seekable(source)
+    if seekable:
+        origin = source.tell()
+        is_zip = zipfile.is_zipfile(source)
+        source.seek(origin)
+        if is_zip:
+            with zipfile.ZipFile(source) as archive:
+                for info in archive.infolist():
+                    if info.is_dir() or not info.filename.lower().endswith(extensions):
+                        continue
+                    with archive.open(info) as member:
+                        yield info.filename, MemberStat(info.file_size, None, zip_timestamp(info.date_time)), member
+            return
+
+    try:
+        archive = tarfile.open(fileobj=source, mode="r:*" if seekable else "r|*")
+    except tarfile.ReadError:
+        raise ValueError(
+            "Archive non reconnue (ZIP ou TAR attendu ; un ZIP doit être lu depuis un fichier positionnable)"
+        )
+    with archive:
+        for member in archive:
+            if not member.isfile() or not member.name.lower().endswith(extensions):
+                continue
+            stream = archive.extractfile(member)
+            with stream:
+                yield member.name, MemberStat(member.size, None, float(member.mtime)), stream
+
+
+def extract_archive(source, extractor=None, extensions=IMAGE_EXTENSIONS, name=None):
+    """Extrait les métadonnées des images d'une archive et retourne (enregistrement, ``MemberStat``) au fil de l'eau
+
+    Les enregistrements ont la forme du mode lot, {"path", "archive",
+    "metadata"} ou {"path", "archive", "error"}, où ``path`` joint le nom
+    de l'archive (``name`` ou le chemin ``source``) et celui du membre.
+    Une archive illisible lève une exception ; une image illisible ne
+    produit qu'un enregistrement d'erreur.
+    """
+    extractor = extractor or MetadataExtractor()
+    if name is None:
+        name = os.fspath(source) if isinstance(source, (str, os.PathLike)) else "-"
+    for member_name, member_stat, stream in iter_members(source, extensions):
+        path = member_path(name, member_name)
+        record = {"path": path, "archive": name}
+        try:
+            record["metadata"] = extractor.extract_stream(
+                stream, name=path, size=member_stat.st_size, modified=member_stat.st_mtime
+            )
+        except Exception as e:
+            record["error"] = str(e)
+        yield record, member_stat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("archives", nargs="+", help="Archives ZIP ou TAR ; « - » lit une archive TAR sur l'entrée standard")
+    args = parser.parse_args(argv)
+
+    extractor = MetadataExtractor()
+    for archive in args.archives:
+        source = sys.stdin.buffer if archive == "-" else archive
+        for record, _ in extract_archive(source, extractor, name=archive):
+            sys.stdout.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,523 @@
+"""Extraction de métadonnées en lot, sans interface graphique"""
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from archive import ARCHIVE_EXTENSIONS, extract_archive, is_archive
+from cache import DEFAULT_MAX_BYTES as CACHE_MAX_BYTES, MetadataCache
+from dedup import DuplicateIndex, dedup_records, fingerprint, write_clusters
+from export import BatchExporter, open_writer
+from exif_batch import apply_gps
+from exif_record import ExifRecord, selected_tags
+from extractor import FLAT_TAGS, IMAGE_EXTENSIONS, MetadataExtractor
+from geo_index import GeoIndex, index_records
+import logger
+from logger import Logger
+from manifest import COMMIT_INTERVAL, ScanManifest
+from metrics import metrics
+from pipeline import HeaderPrefetcher, Prefetched, entry_path
+from thumbnails import DEFAULT_SIZE as THUMBNAIL_SIZE, ThumbnailEngine
+
+DEFAULT_CHUNK_SIZE = 64
+# Essais d'un fichier seul avant de le tenir pour responsable de l'arrêt d'un processus
+CRASH_ATTEMPTS = 2
+
+_extractor = None
+_thumbnails = None
+_flat = False
+_archives = False
+_fingerprints = False
+
+
+def iter_entries(roots, extensions=IMAGE_EXTENSIONS):
+    """Parcourt récursivement les dossiers et retourne des couples (chemin, entrée)
+
+    L'entrée ``os.DirEntry`` permet d'obtenir le stat sans ouvrir le fichier ;
+    elle vaut None pour les fichiers passés explicitement, conservés quelle
+    que soit leur extension. Dans les dossiers, seules les extensions connues
+    sont retenues.
+    """
+    for root in roots:
+        if not os.path.isdir(root):
+            yield root, None
+            continue
+
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.name.lower().endswith(extensions):
+                            yield entry.path, entry
+            except OSError as e:
+                Logger.log_error("Impossible de parcourir le dossier", path=directory, error=str(e))
+
+
+def iter_images(roots, extensions=IMAGE_EXTENSIONS):
+    """Parcourt récursivement les dossiers et retourne les chemins d'images"""
+    for path, _ in iter_entries(roots, extensions):
+        yield path
+
+
+def init_worker(options=None):
+    """Prépare l'extracteur du processus courant
+
+    ``options`` peut contenir ``cache_path``, ``cache_max_bytes`` et
+    ``content_hash`` pour placer un cache persistant devant l'extraction,
+    ainsi que ``thumbnails_dir`` et ``thumbnail_size`` pour exporter une
+    vignette par image. Avec ``flat``, chaque enregistrement est plat et
+    typé (``MetadataExtractor.flat_record``) et, sauf ``tags`` explicite,
+    seuls les tags qu'il utilise sont décodés. ``tags`` limite le décodage
+    EXIF à une liste de noms (``exif_info`` devient un ``ExifRecord``).
+    Avec ``archives``, les archives ZIP et TAR sont lues en flux. Avec ``fingerprints``, chaque
+    image sur disque reçoit ``content_hash`` et ``phash``
+    (``dedup.fingerprint``). ``logging`` reprend la configuration du
+    journal du processus principal (``logger.configuration``).
+    """
+    global _extractor, _thumbnails, _flat, _archives, _fingerprints
+    options = options or {}
+    if multiprocessing.parent_process() is not None:
+        # Un processus créé par fork hérite des compteurs du parent : sans remise
+        # à zéro, son premier drain() les renverrait et ils seraient comptés deux fois
+        metrics.drain()
+    if options.get("logging"):
+        logger.configure(**options["logging"])
+    cache = None
+    if options.get("cache_path"):
+        cache = MetadataCache(
+            options["cache_path"],
+            max_bytes=CACHE_MAX_BYTES if options.get("cache_max_bytes") is None else options["cache_max_bytes"],
+            use_content_hash=options.get("content_hash", False)
+        )
+    _flat = options.get("flat", False)
+    tags = options.get("tags") or (FLAT_TAGS if _flat else None)
+    _extractor = MetadataExtractor(cache=cache, defer_gps=True, tags=tags)
+    _archives = options.get("archives", False)
+    _fingerprints = options.get("fingerprints", False)
+    _thumbnails = None
+    if options.get("thumbnails_dir"):
+        _thumbnails = ThumbnailEngine(
+            options.get("thumbnail_size") or THUMBNAIL_SIZE,
+            memory_items=0,
+            cache_dir=options["thumbnails_dir"]
+        )
+
+
+def extract_records(paths):
+    """Extrait les métadonnées d'un lot de fichiers sans jamais lever d'exception
+
+    Les éléments du lot sont des chemins ou des ``pipeline.Prefetched``,
+    dont le stat et l'en-tête ont déjà été lus. Les positions GPS du lot
+    sont converties en une passe par ``exif_batch``. Avec l'option
+    ``archives``, une archive ZIP ou TAR produit un enregistrement par
+    image (``archive.extract_archive``).
+    """
+    if _extractor is None:
+        init_worker()
+    records = []
+    file_stats = []
+    for path in paths:
+        if isinstance(path, Prefetched):
+            entry, path = path, path.path
+            if entry.error is not None:
+                records.append({"path": path, "error": entry.error})
+                file_stats.append(None)
+                continue
+            try:
+                records.append({"path": path, "metadata": _extractor.extract_prefetched(path, entry.stat, entry.head)})
+            except Exception as e:
+                records.append({"path": path, "error": str(e)})
+            file_stats.append(entry.stat)
+            continue
+        if _archives and is_archive(path):
+            try:
+                for record, member_stat in extract_archive(path, _extractor):
+                    records.append(record)
+                    file_stats.append(member_stat)
+            except Exception as e:
+                records.append({"path": path, "error": str(e)})
+                file_stats.append(None)
+            continue
+        file_stat = None
+        try:
+            if _flat:
+                file_stat = os.stat(path)
+            records.append({"path": path, "metadata": _extractor.extract_metadata(path)})
+        except Exception as e:
+            records.append({"path": path, "error": str(e)})
+        file_stats.append(file_stat)
+
+    extracted = [index for index, record in enumerate(records) if "metadata" in record]
+    exif_infos = [records[index]["metadata"]["exif_info"] for index in extracted]
+    apply_gps(exif_infos, _extractor)
+    if _flat:
+        for index in extracted:
+            record = records[index]
+            records[index] = _extractor.flat_record(record["path"], file_stats[index], record["metadata"])
+            if "archive" in record:
+                records[index]["archive"] = record["archive"]
+
+    if _fingerprints:
+        for index in extracted:
+            record = records[index]
+            if "archive" in record:
+                # Le flux du membre est déjà consommé
+                continue
+            try:
+                with metrics.timer("stage_seconds", stage="fingerprint"):
+                    content_hash, phash = fingerprint(record["path"])
+            except Exception as e:
+                Logger.log_warning("Empreinte impossible", path=record["path"], error=str(e))
+                continue
+            record["content_hash"] = content_hash
+            record["phash"] = f"{phash:016x}"
+
+    if _thumbnails is not None:
+        for index in extracted:
+            path = records[index]["path"]
+            if "archive" in records[index]:
+                # Les vignettes sont tirées de fichiers sur disque
+                continue
+            try:
+                records[index]["thumbnail"] = _thumbnails.thumbnail_path(path)
+            except Exception as e:
+                Logger.log_error("Erreur lors de la création de la vignette", path=path, error=str(e))
+    return records
+
+
+def extract_record(path):
+    """Extrait les métadonnées d'un fichier sans jamais lever d'exception"""
+    return extract_records([path])[0]
+
+
+def worker_stats():
+    """Compteurs du processus courant, identifiés par son pid"""
+    cache = _extractor.cache if _extractor is not None else None
+    return os.getpid(), cache.stats() if cache is not None else {}
+
+
+def extract_chunk(paths):
+    """Traite un lot de chemins dans un processus de travail
+
+    Les métriques accumulées depuis le lot précédent sont renvoyées avec
+    les résultats, et le journal du processus est vidé.
+    """
+    records = extract_records(paths)
+    logger.flush()
+    return records, worker_stats(), metrics.drain()
+
+
+def iter_chunks(paths, chunk_size):
+    """Regroupe un itérable de chemins en listes de taille bornée"""
+    chunk = []
+    for path in paths:
+        chunk.append(path)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_batch(paths, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, options=None, stats=None):
+    """Extrait les métadonnées d'une suite de chemins et retourne les résultats au fil de l'eau
+
+    ``paths`` peut aussi provenir d'un ``pipeline.HeaderPrefetcher``. Le
+    nombre de lots en vol est borné (jauge ``pipeline_queue_depth``,
+    étage ``parse``), ce qui permet de parcourir des millions de fichiers
+    sans tout charger en mémoire. Un fichier corrompu
+    ou un processus de travail qui s'arrête ne produisent qu'un
+    enregistrement d'erreur. Si ``stats`` est fourni, il reçoit les
+    compteurs de chaque processus de travail, indexés par pid.
+    """
+    stats = {} if stats is None else stats
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        init_worker(options)
+        for chunk in iter_chunks(paths, chunk_size):
+            yield from extract_records(chunk)
+        pid, counters = worker_stats()
+        stats[pid] = counters
+        return
+
+    def new_executor():
+        return ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(options,))
+
+    chunks = iter_chunks(paths, chunk_size)
+    max_pending = workers * 2
+    executor = new_executor()
+    pending = {}
+    try:
+        while True:
+            for chunk in chunks:
+                pending[executor.submit(extract_chunk, chunk)] = chunk
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                break
+
+            metrics.set_gauge("pipeline_queue_depth", len(pending), stage="parse")
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            suspects = []
+            for future in done:
+                chunk = pending.pop(future)
+                try:
+                    records, (pid, counters), drained = future.result()
+                except BrokenProcessPool:
+                    suspects.extend(chunk)
+                except Exception as e:
+                    for path in chunk:
+                        yield {"path": entry_path(path), "error": str(e)}
+                else:
+                    stats[pid] = counters
+                    metrics.merge(drained)
+                    yield from records
+
+            if suspects:
+                # Un processus s'est arrêté brutalement : les lots en vol sont perdus
+                # sans que l'on sache lequel est en cause. Ils sont relancés fichier
+                # par fichier dans un processus isolé pour n'accuser que le coupable.
+                metrics.increment("worker_restarts")
+                Logger.log_error("Processus de travail interrompu, redémarrage du pool")
+                for future, chunk in pending.items():
+                    if future.done() and not future.cancelled() and future.exception() is None:
+                        records, (pid, counters), drained = future.result()
+                        stats[pid] = counters
+                        metrics.merge(drained)
+                        yield from records
+                    else:
+                        suspects.extend(chunk)
+                pending.clear()
+                executor.shutdown(wait=False, cancel_futures=True)
+                executor = new_executor()
+                yield from isolate_crashes(suspects, options, stats)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def isolate_crashes(paths, options, stats):
+    """Traite un à un, dans un pool d'un seul processus, les fichiers d'un pool interrompu
+
+    Un fichier qui arrête encore le processus ``CRASH_ATTEMPTS`` fois de
+    suite produit un enregistrement d'erreur ; les autres sont extraits
+    normalement.
+    """
+    executor = None
+    try:
+        for path in paths:
+            for _ in range(CRASH_ATTEMPTS):
+                if executor is None:
+                    executor = ProcessPoolExecutor(max_workers=1, initializer=init_worker, initargs=(options,))
+                try:
+                    records, (pid, counters), drained = executor.submit(extract_chunk, [path]).result()
+                except BrokenProcessPool:
+                    metrics.increment("worker_restarts")
+                    executor.shutdown(wait=False)
+                    executor = None
+                    continue
+                except Exception as e:
+                    records = [{"path": entry_path(path), "error": str(e)}]
+                else:
+                    stats[pid] = counters
+                    metrics.merge(drained)
+                yield from records
+                break
+            else:
+                Logger.log_error("Fichier en cause dans l'arrêt du processus de travail", path=entry_path(path))
+                yield {"path": entry_path(path), "error": "Le processus de travail s'est arrêté"}
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+def json_default(value):
+    """Valeurs inconnues de json : ``ExifRecord`` en objet, le reste en texte"""
+    if isinstance(value, ExifRecord):
+        return value.to_dict()
+    return str(value)
+
+
+def write_records(records, output):
+    """Écrit un enregistrement JSON par ligne et retourne le nombre d'erreurs"""
+    errors = 0
+    for record in records:
+        if "error" in record:
+            errors += 1
+        output.write(json.dumps(record, ensure_ascii=False, default=json_default) + "\n")
+    output.flush()
+    return errors
+
+
+def track_changes(records, manifest, roots, output, commit_interval=COMMIT_INTERVAL):
+    """Inscrit dans le manifeste les fichiers dont le résultat a été émis
+
+    Le manifeste n'est validé qu'après vidage de ``output`` : après une
+    interruption, aucun fichier n'y figure sans que son enregistrement ait
+    été écrit. Avec ``commit_interval`` à None, rien n'est validé ici :
+    l'appelant valide le manifeste une fois ``output`` fermé. Les fichiers
+    supprimés depuis le dernier passage sont émis en fin de parcours sous
+    la forme {"path", "deleted": true}.
+
+    Les images d'une archive sont suivies par le fichier de l'archive, qui
+    n'est inscrit qu'une fois tous ses membres émis sans erreur : ils se
+    suivent dans le flux, une archive étant traitée par un seul processus.
+    """
+    staged = 0
+    archive = None
+    archive_failed = False
+    for record in records:
+        yield record
+        path = os.path.abspath(record.get("archive", record["path"]))
+        if archive is not None and path != archive:
+            if archive_failed:
+                manifest.discard(archive)
+            else:
+                manifest.record(archive)
+                staged += 1
+            archive = None
+        if "archive" in record or path == archive:
+            # Membre d'archive, ou erreur de lecture de l'archive après ses premiers membres
+            archive_failed = (archive is not None and archive_failed) or "error" in record
+            archive = path
+        elif "error" in record:
+            manifest.discard(path)
+        else:
+            manifest.record(path)
+            staged += 1
+        if commit_interval is not None and staged >= commit_interval:
+            output.flush()
+            manifest.commit()
+            staged = 0
+
+    if archive is not None:
+        if archive_failed:
+            manifest.discard(archive)
+        else:
+            manifest.record(archive)
+
+    for path in list(manifest.removed(roots)):
+        yield {"path": path, "deleted": True}
+        manifest.forget(path)
+    if commit_interval is not None:
+        output.flush()
+        manifest.commit()
+
+
+def export_records(records, exporter):
+    """Transmet les enregistrements plats à un ``export.BatchExporter`` et retourne le nombre d'erreurs"""
+    errors = 0
+    for record in records:
+        if "error" in record:
+            errors += 1
+        exporter.write(record)
+    exporter.flush()
+    return errors
+
+
+def summarize_stats(stats):
+    """Additionne les compteurs des processus de travail"""
+    total = {}
+    for counters in stats.values():
+        for name, value in counters.items():
+            total[name] = total.get(name, 0) + value
+    return total
+
+
+def run_cli(args):
+    """Point d'entrée du mode ligne de commande"""
+    tags = None
+    if args.tags:
+        tags = [name.strip() for name in args.tags.split(",") if name.strip()]
+        try:
+            selected_tags(tags)
+        except ValueError as e:
+            Logger.log_error("Liste de tags invalide", error=str(e))
+            return 2
+    options = {
+        "cache_path": args.cache,
+        "cache_max_bytes": args.cache_max_mb * 1024 * 1024 if args.cache_max_mb is not None else None,
+        "content_hash": args.content_hash,
+        "thumbnails_dir": args.thumbnails,
+        "thumbnail_size": (args.thumbnail_size, args.thumbnail_size),
+        "flat": bool(args.export),
+        "archives": args.archives,
+        "tags": tags,
+        "fingerprints": bool(args.dedup),
+        "logging": logger.configuration()
+    }
+    stats = {}
+    manifest = ScanManifest(args.manifest) if args.manifest else None
+    extensions = IMAGE_EXTENSIONS + ARCHIVE_EXTENSIONS if args.archives else IMAGE_EXTENSIONS
+    if manifest is not None:
+        paths = manifest.changes(iter_entries(args.paths, extensions))
+    else:
+        paths = iter_images(args.paths, extensions)
+    prefetcher = None
+    if args.io_threads:
+        prefetcher = HeaderPrefetcher(
+            paths, threads=args.io_threads, queue_size=args.io_queue,
+            passthrough=is_archive if args.archives else None
+        )
+        paths = prefetcher
+    records = run_batch(paths, workers=args.workers, options=options, stats=stats)
+    geo_index = GeoIndex(args.geo_index) if args.geo_index else None
+    duplicate_index = DuplicateIndex(args.dedup) if args.dedup else None
+
+    if args.export:
+        output = BatchExporter(open_writer(args.export))
+    elif args.output:
+        output = open(args.output, "w", encoding="utf-8")
+    else:
+        output = sys.stdout
+    try:
+        if manifest is not None:
+            # Un export n'est lisible qu'une fois fermé (pied Parquet ou Arrow) :
+            # le manifeste n'est validé qu'après sa fermeture
+            commit_interval = None if args.export else COMMIT_INTERVAL
+            records = track_changes(records, manifest, args.paths, output, commit_interval)
+        # Les index suivent le manifeste : ils reçoivent aussi les suppressions
+        if geo_index is not None:
+            records = index_records(records, geo_index)
+        if duplicate_index is not None:
+            records = dedup_records(records, duplicate_index)
+        if args.export:
+            errors = export_records(records, output)
+            output.close()
+            if manifest is not None:
+                manifest.commit()
+        else:
+            errors = write_records(records, output)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if manifest is not None:
+            manifest.close()
+        if geo_index is not None:
+            geo_index.close()
+        if duplicate_index is not None:
+            if args.duplicates:
+                clusters = write_clusters(duplicate_index, args.duplicates)
+                Logger.log_info("Groupes de doublons écrits", path=args.duplicates, clusters=clusters)
+            duplicate_index.close()
+
+    if errors:
+        Logger.log_info("Traitement terminé avec des erreurs", errors=errors)
+    if args.cache:
+        cache_stats = summarize_stats(stats)
+        Logger.log_info(
+            "Statistiques du cache", hits=cache_stats.get('hits', 0), hash_hits=cache_stats.get('hash_hits', 0),
+            misses=cache_stats.get('misses', 0)
+        )
+    if manifest is not None:
+        Logger.log_info("Statistiques du manifeste", **manifest.stats())
+    if prefetcher is not None:
+        Logger.log_info("Statistiques du préchargement", **prefetcher.stats())
+    if args.metrics_dump:
+        metrics.dump(args.metrics_dump)
+    return 0
@@ -0,0 +1,498 @@
+"""Mesures de performance de l'extracteur de métadonnées
+
+Usage :
+    python bench.py io IMAGE [IMAGE ...]
+    python bench.py imports [--module MODULE ...]
+    python bench.py search IMAGE [--repeat N]
+    python bench.py thumbnails IMAGE [IMAGE ...]
+    python bench.py pipeline CORPUS|IMAGE [...] [--repeat N] [--output FICHIER]
+    python bench.py compare AVANT.json APRES.json [--threshold RATIO]
+    python bench.py prefetch CORPUS|IMAGE [...] [--latency S] [--io-threads N,...] [--workers N]
+
+Le corpus de ``pipeline`` se génère avec ``corpus.py``.
+"""
+import argparse
+import builtins
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+import PIL
+
+from corpus import load_manifest
+from extractor import IMAGE_EXTENSIONS, MetadataExtractor
+
+
+class CountingFile:
+    """Enveloppe un fichier ouvert et compte les octets lus"""
+    def __init__(self, fp, counter):
+        self._fp = fp
+        self._counter = counter
+
+    def read(self, *args):
+        data = self._fp.read(*args)
+        self._counter["bytes_read"] += len(data)
+        return data
+
+    def readinto(self, buffer):
+        count = self._fp.readinto(buffer)
+        self._counter["bytes_read"] += count or 0
+        return count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._fp.close()
+
+    def __getattr__(self, name):
+        return getattr(self._fp, name)
+
+
+@contextmanager
+def count_io():
+    """Compte les ouvertures de fichiers et les octets lus pendant le bloc"""
+    counter = {"opens": 0, "bytes_read": 0}
+    real_open = builtins.open
+
+    def counting_open(file, mode='r', *args, **kwargs):
+        fp = real_open(file, mode, *args, **kwargs)
+        if 'b' in mode and 'r' in mode:
+            counter["opens"] += 1
+            return CountingFile(fp, counter)
+        return fp
+
+    builtins.open = counting_open
+    try:
+        yield counter
+    finally:
+        builtins.open = real_open
+
+
+def bench_io(paths):
+    """Compare les ouvertures et lectures par fichier avant/après l'ouverture unique"""
+    extractor = MetadataExtractor()
+    report = []
+    for path in paths:
+        # Ancien chemin : une ouverture par section
+        with count_io() as before:
+            extractor.get_file_info(path)
+            extractor.get_image_info(path)
+            extractor.get_exif_info(path)
+
+        with count_io() as after:
+            extractor.extract_metadata(path)
+
+        report.append({"path": path, "before": before, "after": after})
+    return report
+
+
+# Modules qui ne doivent pas être chargés par un processus d'extraction seule
+HEAVY_MODULES = ('tkinter', '_tkinter', 'selenium', 'webdriver_manager', 'PIL.ImageTk')
+
+# ru_maxrss survit à exec sous Linux (pic du processus parent) : VmHWM est préféré quand il existe
+IMPORT_PROBE = """
+import json, resource, sys
+import {module}
+max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+try:
+    with open("/proc/self/status") as fp:
+        max_rss_kb = next(int(line.split()[1]) for line in fp if line.startswith("VmHWM:"))
+except (OSError, StopIteration):
+    pass
+print(json.dumps({{
+    "modules": sorted(sys.modules),
+    "max_rss_kb": max_rss_kb,
+}}))
+"""
+
+
+def bench_imports(modules):
+    """Mesure le temps d'import (-X importtime) et le RSS d'un processus neuf par module"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    report = []
+    for module in modules:
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", IMPORT_PROBE.format(module=module)],
+            capture_output=True, text=True, check=True, cwd=here
+        )
+        probe = json.loads(proc.stdout)
+
+        import_us = None
+        for line in proc.stderr.splitlines():
+            fields = line.split("|")
+            if len(fields) == 3 and fields[2].strip() == module:
+                import_us = int(fields[1])
+
+        heavy = [
+            name for name in probe["modules"]
+            if any(name == prefix or name.startswith(prefix + ".") for prefix in HEAVY_MODULES)
+        ]
+        report.append({
+            "module": module,
+            "import_ms": import_us / 1000 if import_us is not None else None,
+            "max_rss_kb": probe["max_rss_kb"],
+            "heavy_modules": heavy
+        })
+    return report
+
+
+THUMBNAIL_PROBE = """
+import json, resource, sys, time
+from PIL import Image
+from thumbnails import ThumbnailEngine
+path, mode = sys.argv[1], sys.argv[2]
+start = time.perf_counter()
+if mode == "full":
+    image = Image.open(path)
+    image.thumbnail((350, 350), Image.Resampling.LANCZOS)
+else:
+    image = ThumbnailEngine((350, 350)).thumbnail(path)
+print(json.dumps({
+    "decode_ms": (time.perf_counter() - start) * 1000,
+    "size": image.size,
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}))
+"""
+
+
+def bench_thumbnails(paths):
+    """Compare le décodage complet de l'aperçu et ThumbnailEngine (temps et RSS maximal)
+
+    Chaque mesure a lieu dans un processus neuf : le RSS maximal d'un
+    processus ne redescend jamais.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    report = []
+    for path in paths:
+        entry = {"path": path}
+        for mode in ("full", "engine"):
+            proc = subprocess.run(
+                [sys.executable, "-c", THUMBNAIL_PROBE, os.path.abspath(path), mode],
+                capture_output=True, text=True, check=True, cwd=here
+            )
+            entry[mode] = json.loads(proc.stdout)
+        report.append(entry)
+    return report
+
+
+def bench_search(path, repeat):
+    """Répète une recherche inverse avec un driver chaud et résume la durée de chaque phase"""
+    from reverse_search import ImageReverseSearch
+
+    search = ImageReverseSearch()
+    runs = []
+    try:
+        for _ in range(repeat):
+            search.search_image(path, runs.append)
+    finally:
+        search.close()
+
+    phases = {}
+    for result in runs:
+        for phase, duration in result.get("timings", {}).items():
+            phases.setdefault(phase, []).append(duration)
+        phases.setdefault("total", []).append(sum(result.get("timings", {}).values()))
+    return {
+        "path": path,
+        "runs": len(runs),
+        "errors": sum(1 for result in runs if "error" in result),
+        "p50_s": {phase: statistics.median(durations) for phase, durations in phases.items()},
+        "max_s": {phase: max(durations) for phase, durations in phases.items()}
+    }
+
+
+PIPELINE_STAGES = ("file_info", "image_info", "exif_info", "gps", "extract_metadata")
+
+
+def percentile(ordered, fraction):
+    """Percentile par rang le plus proche d'une liste triée"""
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def corpus_files(sources):
+    """(chemin, cas) à mesurer : ``corpus.json`` d'un dossier, ses images, ou les fichiers donnés"""
+    files = []
+    for source in sources:
+        if not os.path.isdir(source):
+            files.append((source, "all"))
+            continue
+        entries = load_manifest(source)
+        if entries is not None:
+            files += [(os.path.join(source, entry["file"]), entry["case"]) for entry in entries]
+        else:
+            files += [
+                (os.path.join(source, name), "all") for name in sorted(os.listdir(source))
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            ]
+    return files
+
+
+def timed(samples, stage, func, *args):
+    """Appelle ``func`` et ajoute sa durée à l'étape de chaque groupe ; une exception compte comme erreur"""
+    start = time.perf_counter()
+    failed = False
+    try:
+        return func(*args)
+    except Exception:
+        failed = True
+        return None
+    finally:
+        duration = time.perf_counter() - start
+        for sample in samples:
+            sample["timings"][stage].append(duration)
+            sample["errors"][stage] += failed
+
+
+def summarize_sample(sample):
+    """Débit, latences p50/p99 par étape et octets lus d'un groupe de mesures"""
+    stages = {}
+    for stage, durations in sample["timings"].items():
+        if not durations:
+            continue
+        ordered = sorted(durations)
+        stages[stage] = {
+            "count": len(ordered),
+            "errors": sample["errors"][stage],
+            "p50_ms": percentile(ordered, 0.5) * 1000,
+            "p99_ms": percentile(ordered, 0.99) * 1000,
+            "max_ms": ordered[-1] * 1000,
+            "total_s": sum(ordered)
+        }
+    staged_s = sum(stages[stage]["total_s"] for stage in PIPELINE_STAGES[:4] if stage in stages)
+    single_s = stages.get("extract_metadata", {}).get("total_s")
+    return {
+        "files": sample["files"],
+        "files_per_s": sample["files"] / single_s if single_s else None,
+        "staged_files_per_s": sample["files"] / staged_s if staged_s else None,
+        "gps_hits": sample["gps_hits"],
+        "bytes_read": sample["bytes_read"],
+        "staged_bytes_read": sample["staged_bytes_read"],
+        "stages": stages
+    }
+
+
+def new_sample():
+    return {
+        "files": 0,
+        "gps_hits": 0,
+        "bytes_read": 0,
+        "staged_bytes_read": 0,
+        "timings": {stage: [] for stage in PIPELINE_STAGES},
+        "errors": dict.fromkeys(PIPELINE_STAGES, 0)
+    }
+
+
+def max_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def bench_pipeline(sources, repeat=1):
+    """Mesure débit, latences par étape, octets lus et RSS maximal de l'extraction sur un corpus
+
+    Les étapes ``file_info``, ``image_info``, ``exif_info`` et ``gps`` sont
+    celles de l'extraction section par section (``get_file_info``,
+    ``get_image_info``, ``get_exif_info`` puis ``process_gps_data``) ;
+    ``extract_metadata`` mesure le chemin à ouverture unique utilisé par
+    l'interface et le mode lot. Les résultats sont groupés par cas du
+    corpus. Les fichiers ne sont pas évincés du cache du système : à partir
+    du deuxième passage, les mesures sont « à chaud ».
+    """
+    staged = MetadataExtractor(defer_gps=True)
+    single = MetadataExtractor()
+    files = corpus_files(sources)
+    samples = {}
+    overall = new_sample()
+    start = time.perf_counter()
+
+    for _ in range(repeat):
+        for path, case in files:
+            group = (samples.setdefault(case, new_sample()), overall)
+            with count_io() as staged_io:
+                timed(group, "file_info", staged.get_file_info, path)
+                timed(group, "image_info", staged.get_image_info, path)
+                exif_info = timed(group, "exif_info", staged.get_exif_info, path) or {}
+            gps = None
+            if "GPSInfo" in exif_info:
+                gps = timed(group, "gps", staged.process_gps_data, exif_info["GPSInfo"])
+
+            with count_io() as single_io:
+                timed(group, "extract_metadata", single.extract_metadata, path)
+
+            for sample in group:
+                sample["files"] += 1
+                sample["gps_hits"] += bool(gps)
+                sample["staged_bytes_read"] += staged_io["bytes_read"]
+                sample["bytes_read"] += single_io["bytes_read"]
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z")
+        },
+        "repeat": repeat,
+        "wall_s": time.perf_counter() - start,
+        "max_rss_kb": max_rss_kb(),
+        "total": summarize_sample(overall),
+        "cases": {case: summarize_sample(sample) for case, sample in samples.items()}
+    }
+
+
+def slow_opener(latency):
+    """``open`` précédé d'une attente de ``latency`` secondes, comme sur un stockage distant"""
+    def opener(path, mode='rb'):
+        time.sleep(latency)
+        return open(path, mode)
+    return opener
+
+
+def bench_prefetch(sources, latency, io_threads, workers):
+    """Débit du mode lot avec préchargement des en-têtes, pour chaque nombre de fils d'entrée/sortie
+
+    Chaque ouverture du préchargement attend ``latency`` secondes. Avec un
+    seul fil, les lectures sont séquentielles : c'est la référence.
+    """
+    from batch import run_batch
+    from pipeline import HeaderPrefetcher
+
+    paths = [path for path, _ in corpus_files(sources)]
+    runs = []
+    for threads in io_threads:
+        prefetcher = HeaderPrefetcher(paths, threads=threads, opener=slow_opener(latency))
+        start = time.perf_counter()
+        errors = sum("error" in record for record in run_batch(prefetcher, workers=workers))
+        wall = time.perf_counter() - start
+        runs.append({
+            "io_threads": threads,
+            "wall_s": wall,
+            "files_per_s": len(paths) / wall if wall else None,
+            "errors": errors,
+            "io": prefetcher.stats()
+        })
+    return {"files": len(paths), "latency_s": latency, "workers": workers, "runs": runs}
+
+
+def compare_reports(before, after, threshold):
+    """Rapport p50 après/avant par cas et par étape ; signale les ratios au-delà de ``threshold``"""
+    comparison = {}
+    regressions = []
+    for case, new in after["cases"].items():
+        old = before["cases"].get(case)
+        if old is None:
+            continue
+        ratios = {}
+        for stage, timing in new["stages"].items():
+            previous = old["stages"].get(stage)
+            if not previous or not previous["p50_ms"]:
+                continue
+            ratio = timing["p50_ms"] / previous["p50_ms"]
+            ratios[stage] = ratio
+            if ratio > threshold:
+                regressions.append({"case": case, "stage": stage, "p50_ratio": ratio})
+        comparison[case] = {
+            "p50_ratio": ratios,
+            "files_per_s_ratio": (new["files_per_s"] / old["files_per_s"]
+                                  if new["files_per_s"] and old["files_per_s"] else None),
+            "bytes_read_ratio": new["bytes_read"] / old["bytes_read"] if old["bytes_read"] else None
+        }
+    return {"threshold": threshold, "cases": comparison, "regressions": regressions}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    io_parser = subparsers.add_parser("io", help="Ouvertures et octets lus par fichier")
+    io_parser.add_argument("paths", nargs="+")
+
+    imports_parser = subparsers.add_parser(
+        "imports",
+        help="Temps d'import et RSS ; échoue si Tk ou Selenium sont chargés"
+    )
+    imports_parser.add_argument("--module", action="append", dest="modules")
+
+    search_parser = subparsers.add_parser("search", help="Durée de chaque phase de la recherche inverse")
+    search_parser.add_argument("path")
+    search_parser.add_argument("--repeat", type=int, default=5)
+
+    thumbnails_parser = subparsers.add_parser(
+        "thumbnails",
+        help="Temps de décodage et RSS maximal de l'aperçu, avant/après ThumbnailEngine"
+    )
+    thumbnails_parser.add_argument("paths", nargs="+")
+
+    pipeline_parser = subparsers.add_parser(
+        "pipeline",
+        help="Débit, latences p50/p99 par étape, octets lus et RSS maximal sur un corpus (voir corpus.py)"
+    )
+    pipeline_parser.add_argument("paths", nargs="+")
+    pipeline_parser.add_argument("--repeat", type=int, default=1)
+    pipeline_parser.add_argument("--output", help="Écrit le rapport JSON dans ce fichier")
+
+    compare_parser = subparsers.add_parser(
+        "compare",
+        help="Compare deux rapports de pipeline ; échoue si une latence p50 dépasse le seuil"
+    )
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    compare_parser.add_argument("--threshold", type=float, default=1.2)
+
+    prefetch_parser = subparsers.add_parser(
+        "prefetch",
+        help="Débit du préchargement des en-têtes sous une latence d'ouverture simulée"
+    )
+    prefetch_parser.add_argument("paths", nargs="+")
+    prefetch_parser.add_argument("--latency", type=float, default=0.02, help="Latence par ouverture, en secondes")
+    prefetch_parser.add_argument("--io-threads", default="1,8,32,128",
+                                 help="Nombres de fils d'entrée/sortie à comparer, séparés par des virgules")
+    prefetch_parser.add_argument("--workers", type=int, default=os.cpu_count())
+
+    args = parser.parse_args(argv)
+    status = 0
+    if args.command == "io":
+        report = bench_io(args.paths)
+    elif args.command == "imports":
+        report = bench_imports(args.modules or ["extractor", "batch"])
+        if any(entry["heavy_modules"] for entry in report):
+            status = 1
+    elif args.command == "thumbnails":
+        report = bench_thumbnails(args.paths)
+    elif args.command == "search":
+        report = bench_search(args.path, args.repeat)
+    elif args.command == "pipeline":
+        report = bench_pipeline(args.paths, args.repeat)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as fp:
+                json.dump(report, fp, indent=2)
+    elif args.command == "prefetch":
+        io_threads = [int(value) for value in args.io_threads.split(",") if value.strip()]
+        report = bench_prefetch(args.paths, args.latency, io_threads, args.workers)
+    elif args.command == "compare":
+        with open(args.before, encoding="utf-8") as fp:
+            before = json.load(fp)
+        with open(args.after, encoding="utf-8") as fp:
+            after = json.load(fp)
+        report = compare_reports(before, after, args.threshold)
+        if report["regressions"]:
+            status = 1
+
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
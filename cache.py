@@ -0,0 +1,170 @@
+"""Cache persistant des métadonnées extraites (SQLite)"""
+import hashlib
+import os
+import pickle
+import sqlite3
+import time
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT,
+    last_access INTEGER NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS metadata_hash ON metadata(content_hash);
+CREATE INDEX IF NOT EXISTS metadata_access ON metadata(last_access);
+CREATE TABLE IF NOT EXISTS usage (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    total_bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO usage SELECT 0, COALESCE(SUM(LENGTH(payload)), 0) FROM metadata;
+"""
+
+
+def content_digest(path):
+    """Empreinte BLAKE2b du contenu d'un fichier, lue par blocs"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as fp:
+        for block in iter(lambda: fp.read(HASH_CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class MetadataCache:
+    """Classe pour mémoriser les métadonnées sur disque
+
+    Une entrée est indexée par chemin absolu, taille et ``st_mtime_ns`` :
+    un fichier inchangé est servi sans être rouvert. En mode
+    ``use_content_hash``, un fichier déplacé ou renommé est retrouvé par
+    l'empreinte de son contenu. La taille totale des entrées est bornée par
+    ``max_bytes`` ; les entrées les moins récemment utilisées sont évincées.
+    Le total est tenu dans la table ``usage``, mise à jour dans la même
+    transaction que chaque écriture : la borne vaut pour l'ensemble des
+    processus qui partagent la base.
+    """
+    def __init__(self, db_path, max_bytes=DEFAULT_MAX_BYTES, use_content_hash=False):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.use_content_hash = use_content_hash
+        self.hits = 0
+        self.hash_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.connection = sqlite3.connect(db_path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+        self.total_bytes = self.connection.execute("SELECT total_bytes FROM usage").fetchone()[0]
+
+    def get(self, path, file_stat, accept=None):
+        """Retourne (contenu en cache, empreinte calculée) pour un fichier
+
+        Le contenu vaut None en cas d'absence ; l'empreinte n'est calculée
+        qu'en mode ``use_content_hash`` et après un échec de la recherche
+        par chemin, pour être réutilisée par ``put``. Une entrée que
+        ``accept`` refuse (produite avec d'autres options d'extraction)
+        compte comme une absence.
+        """
+        path = os.path.abspath(path)
+        row = self.connection.execute(
+            "SELECT payload FROM metadata WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (path, file_stat.st_size, file_stat.st_mtime_ns)
+        ).fetchone()
+        if row:
+            payload = pickle.loads(row[0])
+            if accept is None or accept(payload):
+                self.hits += 1
+                self.touch(path)
+                return payload, None
+
+        content_hash = None
+        if self.use_content_hash:
+            content_hash = content_digest(path)
+            rows = self.connection.execute(
+                "SELECT payload FROM metadata WHERE content_hash = ? AND size = ?",
+                (content_hash, file_stat.st_size)
+            )
+            for row in rows:
+                payload = pickle.loads(row[0])
+                if accept is None or accept(payload):
+                    self.hash_hits += 1
+                    self.put(path, file_stat, payload, content_hash)
+                    return payload, content_hash
+
+        self.misses += 1
+        return None, content_hash
+
+    def put(self, path, file_stat, payload, content_hash=None):
+        """Enregistre le contenu associé à un fichier"""
+        path = os.path.abspath(path)
+        if self.use_content_hash and content_hash is None:
+            content_hash = content_digest(path)
+        blob = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+
+        with self.connection:
+            # Verrou d'écriture pris d'emblée : le total lu tient compte des autres processus
+            self.connection.execute("BEGIN IMMEDIATE")
+            previous = self.connection.execute(
+                "SELECT LENGTH(payload) FROM metadata WHERE path = ?", (path,)
+            ).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?, ?)",
+                (path, file_stat.st_size, file_stat.st_mtime_ns, content_hash, time.time_ns(), blob)
+            )
+            self.connection.execute(
+                "UPDATE usage SET total_bytes = total_bytes + ? WHERE id = 0",
+                (len(blob) - (previous[0] if previous else 0),)
+            )
+            self.total_bytes = self.connection.execute("SELECT total_bytes FROM usage").fetchone()[0]
+
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def touch(self, path):
+        """Met à jour la date d'accès d'une entrée (ordre LRU)"""
+        with self.connection:
+            self.connection.execute(
+                "UPDATE metadata SET last_access = ? WHERE path = ?", (time.time_ns(), path)
+            )
+
+    def evict(self):
+        """Supprime les entrées les plus anciennes jusqu'à 90 % de la taille maximale"""
+        target = self.max_bytes * 0.9
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            total = self.connection.execute("SELECT total_bytes FROM usage").fetchone()[0]
+            rows = self.connection.execute(
+                "SELECT path, LENGTH(payload) FROM metadata ORDER BY last_access"
+            )
+            doomed = []
+            for path, size in rows:
+                if total <= target:
+                    break
+                doomed.append((path,))
+                total -= size
+            self.connection.executemany("DELETE FROM metadata WHERE path = ?", doomed)
+            self.connection.execute("UPDATE usage SET total_bytes = ? WHERE id = 0", (total,))
+        self.evictions += len(doomed)
+        self.total_bytes = total
+
+    def stats(self):
+        """Compteurs de succès, d'échecs et d'évictions"""
+        return {
+            "hits": self.hits,
+            "hash_hits": self.hash_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "total_bytes": self.total_bytes
+        }
+
+    def close(self):
+        """Ferme la base"""
+        self.connection.close()
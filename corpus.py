@@ -0,0 +1,201 @@
+"""Génération d'un corpus synthétique pour les mesures de performance de l'extracteur
+
+Usage :
+    python corpus.py DOSSIER [--sizes 100K,1M,10M,200M] [--base-size 100K] [--seed N]
+
+Le dossier reçoit une matrice formats (JPEG, TIFF, PNG) × variantes (sans
+EXIF, EXIF, EXIF avec GPS, MakerNote volumineuse, fichier tronqué) à la
+taille de base, puis un JPEG avec GPS pour chacune des tailles demandées.
+Les pixels sont un bruit pseudo-aléatoire tiré de ``--seed`` : deux
+générations avec la même graine donnent les mêmes fichiers. ``corpus.json``
+décrit chaque fichier (cas, format, variante, tailles visée et réelle).
+"""
+import argparse
+import io
+import json
+import math
+import os
+import random
+import sys
+
+from PIL import Image
+from PIL.TiffImagePlugin import IFDRational
+
+from exif_parser import EXIF_IFD_TAG, GPS_IFD_TAG
+
+MANIFEST_NAME = "corpus.json"
+DEFAULT_SIZES = "100K,1M,10M,200M"
+DEFAULT_BASE_SIZE = "100K"
+DEFAULT_SEED = 1
+
+FORMATS = {
+    "jpeg": ("JPEG", ".jpg"),
+    "tiff": ("TIFF", ".tiff"),
+    "png": ("PNG", ".png")
+}
+VARIANTS = ("plain", "exif", "gps", "makernote", "truncated")
+SIZE_UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+MAKERNOTE_TAG = 0x927C
+# Un segment APP1 JPEG est limité à 64 Ko ; TIFF et PNG n'ont pas cette limite
+JPEG_MAKERNOTE_BYTES = 60000
+MAKERNOTE_BYTES = 4 * 1024 * 1024
+TRUNCATE_RATIO = 0.6
+# À qualité 100, un JPEG de bruit fait environ 2 octets par pixel : 200 Mo restent
+# sous la limite anti « bombe de décompression » de Pillow (~179 millions de pixels)
+JPEG_QUALITY = 100
+SAMPLE_SIDE = 256
+NOISE_CHUNK_BYTES = 64 * 1024 * 1024
+
+
+def parse_size(text):
+    """Convertit « 100K », « 10M » ou un nombre d'octets en entier"""
+    text = text.strip().upper().rstrip("B")
+    if text and text[-1] in SIZE_UNITS:
+        return int(float(text[:-1]) * SIZE_UNITS[text[-1]])
+    return int(text)
+
+
+def size_label(size):
+    """Forme courte d'une taille pour les noms de fichiers (100K, 10M...)"""
+    for unit in ("G", "M", "K"):
+        if size >= SIZE_UNITS[unit] and size % SIZE_UNITS[unit] == 0:
+            return f"{size // SIZE_UNITS[unit]}{unit}"
+    return str(size)
+
+
+def build_exif(rng, variant, format_name):
+    """EXIF de la variante (IFD0, ExifIFD et éventuellement GPS), ou None"""
+    if variant == "plain":
+        return None
+    exif = Image.Exif()
+    exif[0x010F] = "BenchCam"
+    exif[0x0110] = "Synthetic 1"
+    exif[0x0132] = "2024:05:17 10:30:00"
+
+    sub_ifd = exif.get_ifd(EXIF_IFD_TAG)
+    sub_ifd[0x9003] = "2024:05:17 10:30:00"
+    sub_ifd[0x829A] = IFDRational(1, rng.choice((60, 125, 250, 1000)))
+    sub_ifd[0x829D] = IFDRational(rng.randint(14, 110), 10)
+    sub_ifd[0x920A] = IFDRational(rng.randint(18, 200), 1)
+    if variant == "makernote":
+        sub_ifd[MAKERNOTE_TAG] = random_bytes(rng, JPEG_MAKERNOTE_BYTES if format_name == "JPEG" else MAKERNOTE_BYTES)
+    # Pillow n'écrit les sous-IFD d'un TIFF que si leur pointeur est présent dans l'IFD0
+    exif[EXIF_IFD_TAG] = 0
+
+    if variant in ("gps", "truncated"):
+        gps_ifd = exif.get_ifd(GPS_IFD_TAG)
+        gps_ifd[1] = rng.choice("NS")
+        gps_ifd[2] = (IFDRational(rng.randint(0, 89), 1), IFDRational(rng.randint(0, 59), 1),
+                      IFDRational(rng.randint(0, 599999), 10000))
+        gps_ifd[3] = rng.choice("EW")
+        gps_ifd[4] = (IFDRational(rng.randint(0, 179), 1), IFDRational(rng.randint(0, 59), 1),
+                      IFDRational(rng.randint(0, 599999), 10000))
+        exif[GPS_IFD_TAG] = 0
+    return exif
+
+
+def random_bytes(rng, count):
+    """``count`` octets pseudo-aléatoires (``randbytes`` est limité à 2**31 bits par appel)"""
+    chunks = [rng.randbytes(NOISE_CHUNK_BYTES) for _ in range(count // NOISE_CHUNK_BYTES)]
+    chunks.append(rng.randbytes(count % NOISE_CHUNK_BYTES))
+    return b"".join(chunks)
+
+
+def noise_image(rng, width, height):
+    """Image RVB de bruit : incompressible, la taille du fichier suit le nombre de pixels"""
+    return Image.frombytes("RGB", (width, height), random_bytes(rng, width * height * 3))
+
+
+def save_options(format_name, exif):
+    options = {"format": format_name}
+    if format_name == "JPEG":
+        options["quality"] = JPEG_QUALITY
+    if exif is not None:
+        options["exif"] = exif
+    return options
+
+
+def bytes_per_pixel(rng, format_name):
+    """Octets par pixel d'un échantillon de bruit encodé dans le format"""
+    buffer = io.BytesIO()
+    noise_image(rng, SAMPLE_SIDE, SAMPLE_SIDE).save(buffer, **save_options(format_name, None))
+    return buffer.tell() / (SAMPLE_SIDE * SAMPLE_SIDE)
+
+
+def write_image(path, rng, format_name, target_bytes, exif, density):
+    """Écrit une image de bruit dont la taille approche ``target_bytes``"""
+    overhead = len(exif.tobytes()) if exif is not None else 0
+    side = max(16, int(math.sqrt(max(0, target_bytes - overhead) / density)))
+    noise_image(rng, side, side).save(path, **save_options(format_name, exif))
+    return side
+
+
+def generate(directory, sizes, base_size=parse_size(DEFAULT_BASE_SIZE), seed=DEFAULT_SEED, log=None):
+    """Génère le corpus dans ``directory`` et retourne les entrées de ``corpus.json``"""
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    densities = {format_name: bytes_per_pixel(rng, format_name) for format_name, _ in FORMATS.values()}
+
+    jobs = [(key, variant, base_size) for key in FORMATS for variant in VARIANTS]
+    jobs += [("jpeg", "gps", size) for size in sizes if size != base_size]
+
+    entries = []
+    for key, variant, target_bytes in jobs:
+        format_name, extension = FORMATS[key]
+        case = f"{key}-{variant}-{size_label(target_bytes)}"
+        filename = case + extension
+        path = os.path.join(directory, filename)
+        if log:
+            log(f"Génération de {filename}")
+
+        side = write_image(path, rng, format_name, target_bytes,
+                           build_exif(rng, variant, format_name), densities[format_name])
+        if variant == "truncated":
+            with open(path, "r+b") as fp:
+                fp.truncate(int(os.path.getsize(path) * TRUNCATE_RATIO))
+
+        entries.append({
+            "file": filename,
+            "case": case,
+            "format": key,
+            "variant": variant,
+            "dimensions": [side, side],
+            "target_bytes": target_bytes,
+            "size_bytes": os.path.getsize(path)
+        })
+
+    with open(os.path.join(directory, MANIFEST_NAME), "w", encoding="utf-8") as fp:
+        json.dump({"seed": seed, "files": entries}, fp, indent=2)
+    return entries
+
+
+def load_manifest(directory):
+    """Entrées de ``corpus.json`` d'un dossier, ou None s'il n'en a pas"""
+    path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as fp:
+        return json.load(fp)["files"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help="Tailles de la série JPEG avec GPS, séparées par des virgules")
+    parser.add_argument("--base-size", default=DEFAULT_BASE_SIZE,
+                        help="Taille des fichiers de la matrice formats × variantes")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(size) for size in args.sizes.split(",") if size.strip()]
+    entries = generate(args.directory, sizes, parse_size(args.base_size), args.seed,
+                       log=lambda message: print(message, file=sys.stderr))
+    total = sum(entry["size_bytes"] for entry in entries)
+    print(f"{len(entries)} fichiers, {total / 1024 ** 2:.1f} Mo dans {args.directory}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
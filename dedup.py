@@ -0,0 +1,292 @@
+"""Détection des doublons et quasi-doublons d'un corpus (index SQLite par empreintes)
+
+Usage :
+    python dedup.py INDEX clusters
+    python dedup.py INDEX similar IMAGE [-d DISTANCE]
+
+Chaque image reçoit deux empreintes tirées d'un même décodage réduit (un
+JPEG est décodé au 1/8 dans le domaine DCT) : une empreinte du contenu,
+condensé des pixels réduits, identique pour une copie exacte ou dont seules
+les métadonnées changent (EXIF retiré), et un dHash de 64 bits, proche pour
+une copie recompressée ou redimensionnée.
+
+La recherche par distance de Hamming suit le hachage multi-index : le dHash
+est découpé en trois tranches indexées. Deux empreintes à au plus ``r`` bits
+l'une de l'autre ont au moins une tranche à au plus ``r // 3`` bits d'écart
+(principe des tiroirs) : seules les valeurs voisines de chaque tranche sont
+interrogées, sans comparaison deux à deux. Les images proches sont réunies
+en groupes (union des groupes au fil des ajouts, transitive).
+"""
+import argparse
+import functools
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import sys
+
+from PIL import Image
+
+from archive import MEMBER_SEPARATOR
+from search_cache import DEFAULT_MAX_DISTANCE, HASH_MASK, HASH_SIZE, dhash_image, hamming, to_signed
+
+# Largeurs des tranches du dHash, des bits de poids faible aux bits de poids fort
+CHUNK_WIDTHS = (22, 21, 21)
+DRAFT_SCALE = 8
+# Les formats sans décodage réduit sont ramenés à ce côté (par facteur entier) avant condensé
+REDUCED_SIDE = 512
+CONTENT_DIGEST_BYTES = 16
+COMMIT_INTERVAL = 1000
+# Au-delà, le nombre de valeurs voisines d'une tranche explose (plus de 10^5 par tranche à 20)
+MAX_DISTANCE = 20
+# Limite historique de SQLite sur le nombre de paramètres d'une requête
+MAX_VARIABLES = 999
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    content TEXT NOT NULL,
+    phash INTEGER NOT NULL,
+    chunk0 INTEGER NOT NULL,
+    chunk1 INTEGER NOT NULL,
+    chunk2 INTEGER NOT NULL,
+    cluster INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS images_content ON images(content);
+CREATE INDEX IF NOT EXISTS images_chunk0 ON images(chunk0);
+CREATE INDEX IF NOT EXISTS images_chunk1 ON images(chunk1);
+CREATE INDEX IF NOT EXISTS images_chunk2 ON images(chunk2);
+CREATE INDEX IF NOT EXISTS images_cluster ON images(cluster);
+"""
+
+
+def fingerprint(source, hash_size=HASH_SIZE):
+    """Retourne (empreinte du contenu en hexadécimal, dHash) d'une image, chemin ou objet fichier"""
+    with Image.open(source) as img:
+        width, height = img.size
+        img.draft('RGB', (max(1, width // DRAFT_SCALE), max(1, height // DRAFT_SCALE)))
+        reduced = img.convert('RGB')
+    factor = max(reduced.width, reduced.height) // REDUCED_SIDE
+    if factor > 1:
+        reduced = reduced.reduce(factor)
+
+    digest = hashlib.blake2b(f"{width}x{height}".encode(), digest_size=CONTENT_DIGEST_BYTES)
+    digest.update(reduced.tobytes())
+    return digest.hexdigest(), dhash_image(reduced, hash_size)
+
+
+def split_chunks(phash):
+    """Tranches du dHash (entier non signé de 64 bits)"""
+    chunks = []
+    for width in CHUNK_WIDTHS:
+        chunks.append(phash & ((1 << width) - 1))
+        phash >>= width
+    return chunks
+
+
+@functools.lru_cache(maxsize=None)
+def neighbour_masks(width, radius):
+    """Masques XOR des valeurs à au plus ``radius`` bits d'une tranche de ``width`` bits"""
+    masks = []
+    for distance in range(radius + 1):
+        for bits in itertools.combinations(range(width), distance):
+            mask = 0
+            for bit in bits:
+                mask |= 1 << bit
+            masks.append(mask)
+    return tuple(masks)
+
+
+def check_distance(max_distance):
+    """Retourne ``max_distance`` s'il est entre 0 et ``MAX_DISTANCE``, lève ``ValueError`` sinon"""
+    if not 0 <= max_distance <= MAX_DISTANCE:
+        raise ValueError(f"Distance de Hamming hors limites (0 à {MAX_DISTANCE}) : {max_distance}")
+    return max_distance
+
+
+def neighbour_queries(phash, radius):
+    """Requêtes (SQL, paramètres) des images dont une tranche est à au plus ``radius`` bits de celle de ``phash``
+
+    Les valeurs voisines sont réparties en requêtes d'au plus
+    ``MAX_VARIABLES`` paramètres.
+    """
+    clauses = []
+    params = []
+    for position, (width, chunk) in enumerate(zip(CHUNK_WIDTHS, split_chunks(phash & HASH_MASK))):
+        values = [chunk ^ mask for mask in neighbour_masks(width, radius)]
+        for start in range(0, len(values), MAX_VARIABLES):
+            batch = values[start:start + MAX_VARIABLES]
+            if len(params) + len(batch) > MAX_VARIABLES:
+                yield f"SELECT path, phash, cluster FROM images WHERE {' OR '.join(clauses)}", params
+                clauses = []
+                params = []
+            clauses.append(f"chunk{position} IN ({','.join('?' * len(batch))})")
+            params.extend(batch)
+    if clauses:
+        yield f"SELECT path, phash, cluster FROM images WHERE {' OR '.join(clauses)}", params
+
+
+class DuplicateIndex:
+    """Classe pour retrouver les copies exactes et proches des images déjà vues
+
+    ``add`` inscrit une image et la rattache au groupe des images trouvées
+    par ``similar`` ; deux groupes reliés par une nouvelle image fusionnent
+    vers le plus petit identifiant. Un retrait ne scinde pas les groupes
+    existants.
+    """
+    def __init__(self, db_path, max_distance=DEFAULT_MAX_DISTANCE):
+        check_distance(max_distance)
+        self.db_path = db_path
+        self.max_distance = max_distance
+        self.connection = sqlite3.connect(db_path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+
+    def similar(self, content, phash, max_distance=None):
+        """Retourne les (chemin, distance, groupe) des images identiques ou proches, de la plus proche à la plus lointaine
+
+        Une image au contenu identique est à la distance 0, quel que soit son
+        dHash. ``max_distance`` ne peut dépasser ``MAX_DISTANCE``.
+        """
+        max_distance = self.max_distance if max_distance is None else check_distance(max_distance)
+        matches = {
+            path: (path, 0, cluster)
+            for path, cluster in self.connection.execute(
+                "SELECT path, cluster FROM images WHERE content = ?", (content,)
+            )
+        }
+
+        for query, params in neighbour_queries(phash, max_distance // len(CHUNK_WIDTHS)):
+            for path, candidate, cluster in self.connection.execute(query, params):
+                if path in matches:
+                    continue
+                distance = hamming(phash, candidate)
+                if distance <= max_distance:
+                    matches[path] = (path, distance, cluster)
+        return sorted(matches.values(), key=lambda match: (match[1], match[0]))
+
+    def add(self, path, content, phash):
+        """Inscrit ou met à jour une image et retourne (groupe, correspondances de ``similar``)"""
+        self.remove(path)
+        matches = self.similar(content, phash)
+        chunks = split_chunks(phash & HASH_MASK)
+        cursor = self.connection.execute(
+            "INSERT INTO images (path, content, phash, chunk0, chunk1, chunk2, cluster) VALUES (?, ?, ?, ?, ?, ?, 0)",
+            (path, content, to_signed(phash), *chunks)
+        )
+        clusters = {cluster for _, _, cluster in matches}
+        cluster = min(clusters) if clusters else cursor.lastrowid
+        self.connection.execute("UPDATE images SET cluster = ? WHERE id = ?", (cluster, cursor.lastrowid))
+        others = sorted(clusters - {cluster})
+        if others:
+            self.connection.execute(
+                f"UPDATE images SET cluster = ? WHERE cluster IN ({','.join('?' * len(others))})",
+                (cluster, *others)
+            )
+        return cluster, matches
+
+    def remove(self, path):
+        """Retire une image, si elle est inscrite"""
+        self.connection.execute("DELETE FROM images WHERE path = ?", (path,))
+
+    def remove_members(self, archive):
+        """Retire les images d'une archive"""
+        prefix = archive + MEMBER_SEPARATOR
+        self.connection.execute("DELETE FROM images WHERE substr(path, 1, ?) = ?", (len(prefix), prefix))
+
+    def clusters(self):
+        """Retourne les groupes d'au moins deux images : (groupe, [chemins])"""
+        rows = self.connection.execute(
+            "SELECT cluster, path FROM images WHERE cluster IN "
+            "(SELECT cluster FROM images GROUP BY cluster HAVING COUNT(*) > 1) ORDER BY cluster, path"
+        )
+        for cluster, group in itertools.groupby(rows, key=lambda row: row[0]):
+            yield cluster, [path for _, path in group]
+
+    def commit(self):
+        """Valide les modifications en attente"""
+        self.connection.commit()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+
+    def close(self):
+        """Valide les modifications et ferme la base"""
+        self.connection.commit()
+        self.connection.close()
+
+
+def dedup_records(records, index, commit_interval=COMMIT_INTERVAL):
+    """Inscrit les empreintes des enregistrements du mode lot et signale les doublons au passage
+
+    Les enregistrements porteurs de ``content_hash`` et ``phash`` (voir
+    ``batch.init_worker``) reçoivent ``cluster`` et, si une image identique
+    ou proche est déjà connue, ``duplicate_of`` (la plus proche). Le groupe
+    est celui du moment : une fusion ultérieure peut le renuméroter, la
+    liste définitive est donnée par ``DuplicateIndex.clusters``.
+    """
+    staged = 0
+    for record in records:
+        path = os.path.abspath(record["path"])
+        if record.get("deleted"):
+            index.remove(path)
+            index.remove_members(path)
+        elif record.get("content_hash") is not None:
+            cluster, matches = index.add(path, record["content_hash"], int(record["phash"], 16))
+            record["cluster"] = cluster
+            if matches:
+                record["duplicate_of"] = matches[0][0]
+        staged += 1
+        if staged >= commit_interval:
+            index.commit()
+            staged = 0
+        yield record
+    index.commit()
+
+
+def write_clusters(index, path):
+    """Écrit les groupes de doublons en JSONL, un objet {"cluster", "paths"} par ligne"""
+    count = 0
+    with open(path, "w", encoding="utf-8") as fp:
+        for cluster, paths in index.clusters():
+            fp.write(json.dumps({"cluster": cluster, "paths": paths}, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("clusters", help="Groupes de doublons et quasi-doublons")
+
+    similar_parser = subparsers.add_parser("similar", help="Images identiques ou proches d'une image")
+    similar_parser.add_argument("image")
+    similar_parser.add_argument("-d", "--distance", type=int, default=DEFAULT_MAX_DISTANCE,
+                                help=f"Distance de Hamming maximale ({DEFAULT_MAX_DISTANCE} par défaut, "
+                                     f"{MAX_DISTANCE} au plus)")
+
+    args = parser.parse_args(argv)
+    if args.command == "similar" and not 0 <= args.distance <= MAX_DISTANCE:
+        parser.error(f"--distance doit être entre 0 et {MAX_DISTANCE}")
+    index = DuplicateIndex(args.index)
+    try:
+        if args.command == "clusters":
+            for cluster, paths in index.clusters():
+                sys.stdout.write(json.dumps({"cluster": cluster, "paths": paths}, ensure_ascii=False) + "\n")
+        else:
+            content, phash = fingerprint(args.image)
+            for match in index.similar(content, phash, args.distance):
+                sys.stdout.write(json.dumps(match, ensure_ascii=False) + "\n")
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Conversion par lot des positions GPS EXIF (NumPy)
+
+Les coordonnées degrés/minutes/secondes d'un lot d'images sont converties
+en flottants exactement comme dans ``MetadataExtractor.convert_to_degrees``,
+puis combinées en degrés décimaux en une passe, avec les mêmes opérations
+dans le même ordre : les résultats sont identiques bit à bit. Sans NumPy,
+ou pour les valeurs de forme inattendue, le chemin scalaire est utilisé.
+NumPy n'est importé qu'au premier lot qui contient des positions.
+"""
+from extractor import GPS_LATITUDE, GPS_LATITUDE_REF, GPS_LONGITUDE, GPS_LONGITUDE_REF, MetadataExtractor
+from metrics import metrics
+
+
+def numpy_module():
+    """Module NumPy, ou None s'il n'est pas installé"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def apply_gps(exif_infos, extractor=None):
+    """Ajoute la clé 'GPS' aux dictionnaires EXIF décodés d'un lot, comme ``process_gps_data``"""
+    extractor = extractor or MetadataExtractor()
+    rows = []
+    values = []
+    for exif_info in exif_infos:
+        if 'GPSInfo' not in exif_info:
+            continue
+        gps_info = exif_info['GPSInfo']
+        coordinates = collect_coordinates(gps_info)
+        if coordinates is None:
+            # Forme inattendue : le chemin scalaire décide (et journalise les erreurs)
+            set_gps(exif_info, extractor.process_gps_data(gps_info))
+            continue
+        rows.append((exif_info, gps_info))
+        values.extend(coordinates)
+
+    if not rows:
+        return
+
+    np = numpy_module()
+    if np is None:
+        for exif_info, gps_info in rows:
+            set_gps(exif_info, extractor.process_gps_data(gps_info))
+        return
+
+    dms = np.array(values, dtype=np.float64).reshape(len(rows), 2, 3)
+    degrees = dms[:, :, 0] + (dms[:, :, 1] / 60.0) + (dms[:, :, 2] / 3600.0)
+    valid = (degrees[:, 0] != 0) & (degrees[:, 1] != 0)
+
+    metrics.increment("gps_hits", int(valid.sum()))
+    for (exif_info, gps_info), (lat, lon), ok in zip(rows, degrees.tolist(), valid.tolist()):
+        if not ok:
+            set_gps(exif_info, None)
+            continue
+        if gps_info.get(GPS_LATITUDE_REF, 'N') == 'S': lat = -lat
+        if gps_info.get(GPS_LONGITUDE_REF, 'E') == 'W': lon = -lon
+        set_gps(exif_info, {'latitude': lat, 'longitude': lon})
+
+
+def collect_coordinates(gps_info):
+    """Six flottants (latitude puis longitude en degrés, minutes, secondes), ou None"""
+    if not isinstance(gps_info, dict):
+        return None
+    coordinates = []
+    for tag in (GPS_LATITUDE, GPS_LONGITUDE):
+        values = gps_info.get(tag)
+        if not isinstance(values, tuple) or len(values) != 3:
+            return None
+        try:
+            coordinates.extend(float(x) for x in values)
+        except (TypeError, ValueError):
+            return None
+    return coordinates
+
+
+def set_gps(exif_info, gps):
+    """Place ou retire la position calculée"""
+    if gps:
+        exif_info['GPS'] = gps
+    else:
+        exif_info.pop('GPS', None)
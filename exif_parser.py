@@ -0,0 +1,261 @@
+"""Lecture des structures EXIF directement depuis l'en-tête du fichier
+
+Le lecteur parcourt les marqueurs JPEG et les IFD TIFF (IFD0, ExifIFD,
+GPS IFD) dans un tampon borné, sans jamais décoder les pixels. Le
+dictionnaire produit a la même forme que celui de ``Image._getexif()``.
+Avec un ensemble de tags demandés, les autres entrées sont sautées avant
+tout décodage : leur valeur n'est pas lue et leur offset n'est pas suivi
+(une MakerNote au-delà du tampon ne fait plus échouer la lecture).
+"""
+import struct
+
+from PIL.TiffImagePlugin import IFDRational
+
+DEFAULT_MAX_BYTES = 256 * 1024
+
+EXIF_IFD_TAG = 0x8769
+GPS_IFD_TAG = 0x8825
+THUMBNAIL_OFFSET_TAG = 0x0201
+THUMBNAIL_LENGTH_TAG = 0x0202
+
+# Tags de structure d'un fichier TIFF (bandes, tuiles, échantillonnage, profil ICC) : ils
+# décrivent le stockage des pixels, pas la prise de vue, et ne figurent pas dans l'EXIF d'un JPEG
+TIFF_STRUCTURE_TAGS = frozenset({
+    254, 255,                     # NewSubfileType, SubfileType
+    256, 257, 258, 259, 262, 266,  # ImageWidth, ImageLength, BitsPerSample, Compression, PhotometricInterpretation, FillOrder
+    273, 277, 278, 279, 280, 281,  # StripOffsets, SamplesPerPixel, RowsPerStrip, StripByteCounts, Min/MaxSampleValue
+    284, 290, 291, 292, 293,       # PlanarConfiguration, GrayResponseUnit/Curve, T4Options, T6Options
+    301, 317, 320,                 # TransferFunction, Predictor, ColorMap
+    322, 323, 324, 325, 330,       # TileWidth, TileLength, TileOffsets, TileByteCounts, SubIFDs
+    338, 339, 347, 530, 532,       # ExtraSamples, SampleFormat, JPEGTables, YCbCrSubSampling, ReferenceBlackWhite
+    34675,                        # InterColorProfile
+})
+
+# Marqueurs JPEG sans segment de longueur (SOI, EOI, RSTn, TEM)
+STANDALONE_MARKERS = {0xFF01, 0xFFD8, 0xFFD9} | set(range(0xFFD0, 0xFFD8))
+SOS_MARKER = 0xFFDA
+APP1_MARKER = 0xFFE1
+
+# Taille unitaire et format struct des types TIFF
+TIFF_TYPES = {
+    1: (1, None),   # BYTE
+    2: (1, None),   # ASCII
+    3: (2, "H"),    # SHORT
+    4: (4, "L"),    # LONG
+    5: (8, "L"),    # RATIONAL
+    6: (1, "b"),    # SBYTE
+    7: (1, None),   # UNDEFINED
+    8: (2, "h"),    # SSHORT
+    9: (4, "l"),    # SLONG
+    10: (8, "l"),   # SRATIONAL
+    11: (4, "f"),   # FLOAT
+    12: (8, "d"),   # DOUBLE
+    13: (4, "L"),   # IFD
+    16: (8, "Q"),   # LONG8
+}
+
+
+class NeedMoreData(Exception):
+    """Les structures demandées dépassent le tampon d'en-tête"""
+
+
+class ExifHeaderReader:
+    """Classe pour lire les métadonnées EXIF sans décoder l'image
+
+    ``tags`` limite la lecture à un ensemble d'identifiants ; l'IFD GPS
+    n'est parcouru que s'il en fait partie (``GPS_IFD_TAG``).
+    """
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, tags=None):
+        self.max_bytes = max_bytes
+        self.tags = frozenset(tags) if tags is not None else None
+        # Le pointeur de l'ExifIFD est lu même s'il n'est pas demandé, pour atteindre les tags qu'il contient
+        self.ifd0_tags = self.tags | {EXIF_IFD_TAG} if self.tags is not None else None
+
+    def read(self, fp, size=None):
+        """Lit l'en-tête d'un fichier ouvert et retourne le dictionnaire EXIF brut
+
+        Retourne None si le format n'est pas géré ou si les structures
+        EXIF se trouvent au-delà de la limite de lecture.
+        """
+        fp.seek(0)
+        head = fp.read(self.max_bytes)
+        complete = len(head) < self.max_bytes or (size is not None and len(head) >= size)
+        return self.parse(head, complete)
+
+    def parse(self, head, complete=True):
+        """Analyse un tampon d'en-tête (``complete`` indique qu'il contient tout le fichier)"""
+        try:
+            if head[:2] == b"\xff\xd8":
+                tiff = self.find_jpeg_exif(head, complete)
+                if tiff is None:
+                    return {}
+                return self.parse_tiff(tiff, complete=True)
+            if head[:4] in (b"II*\x00", b"MM\x00*"):
+                return self.parse_tiff(head, complete, TIFF_STRUCTURE_TAGS)
+        except NeedMoreData:
+            return None
+        return None
+
+    def find_jpeg_exif(self, head, complete):
+        """Parcourt les marqueurs JPEG jusqu'au début du scan et retourne le bloc TIFF EXIF"""
+        exif = None
+        pos = 2
+        while True:
+            if pos + 2 > len(head):
+                if complete:
+                    break
+                raise NeedMoreData()
+            if head[pos] != 0xFF:
+                pos += 1
+                continue
+            marker = (head[pos] << 8) | head[pos + 1]
+            if marker in (0xFF00, 0xFFFF):
+                pos += 1
+                continue
+            pos += 2
+            if marker in STANDALONE_MARKERS:
+                continue
+            if pos + 2 > len(head):
+                if complete:
+                    break
+                raise NeedMoreData()
+            length = struct.unpack(">H", head[pos:pos + 2])[0]
+            if marker == SOS_MARKER:
+                break
+            segment = head[pos + 2:pos + length]
+            if len(segment) < length - 2 and not complete:
+                raise NeedMoreData()
+            if marker == APP1_MARKER and segment.startswith(b"Exif\x00\x00"):
+                exif = segment[6:] if exif is None else exif + segment[6:]
+            pos += length
+        return exif
+
+    def parse_tiff(self, data, complete, skipped=None):
+        """Lit IFD0, ExifIFD et GPS IFD d'un bloc TIFF
+
+        Les tags de ``skipped`` sont ignorés dans l'IFD0 (structure d'un
+        fichier TIFF, voir ``TIFF_STRUCTURE_TAGS``).
+        """
+        if data[:2] == b"II":
+            endian = "<"
+        elif data[:2] == b"MM":
+            endian = ">"
+        else:
+            return {}
+        if len(data) < 8:
+            if complete:
+                return {}
+            raise NeedMoreData()
+
+        ifd0_offset = struct.unpack(endian + "L", data[4:8])[0]
+        exif = self.read_ifd(data, ifd0_offset, endian, complete, self.ifd0_tags, skipped)
+
+        if EXIF_IFD_TAG in exif:
+            sub_ifd = self.read_sub_ifd(data, exif[EXIF_IFD_TAG], endian, complete, self.tags)
+            if self.tags is not None and EXIF_IFD_TAG not in self.tags:
+                del exif[EXIF_IFD_TAG]
+            if sub_ifd:
+                exif.update(sub_ifd)
+
+        if GPS_IFD_TAG in exif:
+            exif[GPS_IFD_TAG] = self.read_sub_ifd(data, exif[GPS_IFD_TAG], endian, complete)
+
+        return exif
+
+    def read_thumbnail(self, head, complete=True):
+        """Retourne le JPEG de la vignette EXIF (IFD1) d'un tampon d'en-tête JPEG, ou None"""
+        if head[:2] != b"\xff\xd8":
+            return None
+        try:
+            data = self.find_jpeg_exif(head, complete)
+        except NeedMoreData:
+            return None
+        if not data or data[:2] not in (b"II", b"MM") or len(data) < 8:
+            return None
+
+        endian = "<" if data[:2] == b"II" else ">"
+        ifd0_offset = struct.unpack(endian + "L", data[4:8])[0]
+        if ifd0_offset + 2 > len(data):
+            return None
+        count = struct.unpack(endian + "H", data[ifd0_offset:ifd0_offset + 2])[0]
+        next_pos = ifd0_offset + 2 + count * 12
+        if next_pos + 4 > len(data):
+            return None
+        ifd1_offset = struct.unpack(endian + "L", data[next_pos:next_pos + 4])[0]
+        if not ifd1_offset:
+            return None
+
+        ifd1 = self.read_ifd(data, ifd1_offset, endian, complete=True)
+        offset = ifd1.get(THUMBNAIL_OFFSET_TAG)
+        length = ifd1.get(THUMBNAIL_LENGTH_TAG)
+        if not isinstance(offset, int) or not isinstance(length, int):
+            return None
+        thumbnail = data[offset:offset + length]
+        if len(thumbnail) != length or not thumbnail.startswith(b"\xff\xd8"):
+            return None
+        return thumbnail
+
+    def read_sub_ifd(self, data, offset, endian, complete, wanted=None):
+        """Lit un IFD imbriqué à partir de la valeur de son pointeur"""
+        if not isinstance(offset, int):
+            return None
+        return self.read_ifd(data, offset, endian, complete, wanted)
+
+    def read_ifd(self, data, offset, endian, complete, wanted=None, skipped=None):
+        """Lit les entrées d'un IFD et retourne {tag: valeur}, limitées à ``wanted`` s'il est donné
+
+        Les tags de ``skipped`` ne sont ni décodés ni suivis.
+        """
+        entries = {}
+        if offset + 2 > len(data):
+            if complete:
+                return entries
+            raise NeedMoreData()
+
+        count = struct.unpack(endian + "H", data[offset:offset + 2])[0]
+        pos = offset + 2
+        header = endian + "HHL"
+        for _ in range(count):
+            if pos + 12 > len(data):
+                if complete:
+                    break
+                raise NeedMoreData()
+            tag, typ, value_count = struct.unpack_from(header, data, pos)
+            entry = pos
+            pos += 12
+            if (wanted is not None and tag not in wanted) or (skipped is not None and tag in skipped):
+                continue
+            if typ not in TIFF_TYPES:
+                continue
+            unit_size, fmt = TIFF_TYPES[typ]
+            size = value_count * unit_size
+            if size > 4:
+                value_offset = struct.unpack_from(endian + "L", data, entry + 8)[0]
+                raw = data[value_offset:value_offset + size]
+                if len(raw) != size and not complete:
+                    raise NeedMoreData()
+            else:
+                raw = data[entry + 8:entry + 8 + size]
+
+            if len(raw) != size or not raw:
+                continue
+            entries[tag] = self.decode_value(typ, fmt, raw, endian)
+        return entries
+
+    @staticmethod
+    def decode_value(typ, fmt, raw, endian):
+        """Convertit la valeur brute d'une entrée selon les conventions de Pillow"""
+        if typ in (1, 7):
+            return raw
+        if typ == 2:
+            if raw.endswith(b"\x00"):
+                raw = raw[:-1]
+            return raw.decode("latin-1", "replace")
+
+        unit_size = TIFF_TYPES[typ][0]
+        if typ in (5, 10):
+            numbers = struct.unpack(f"{endian}{len(raw) // 4}{fmt}", raw)
+            values = tuple(IFDRational(num, denom) for num, denom in zip(numbers[::2], numbers[1::2]))
+        else:
+            values = struct.unpack(f"{endian}{len(raw) // unit_size}{fmt}", raw)
+        return values[0] if len(values) == 1 else values
@@ -0,0 +1,109 @@
+"""Enregistrement EXIF compact, limité à un ensemble de tags choisi
+
+Un extracteur configuré avec ``tags`` produit des ``ExifRecord`` au lieu
+de dictionnaires : le tuple des noms est partagé par tous les
+enregistrements du même ensemble, chaque image ne porte qu'une liste de
+valeurs (None pour un tag absent). Pour un lot de millions d'images gardées
+en mémoire, c'est un objet de deux attributs et une liste au lieu d'une
+table de hachage par image. L'interface de lecture reprend celle d'un dict
+(``get``, ``in``, ``items``...), ce qui suffit au reste de l'application.
+"""
+import functools
+
+from PIL.ExifTags import TAGS
+
+# Nom -> identifiant ; en cas de doublon, l'identifiant le plus petit l'emporte
+TAG_IDS = {name: tag_id for tag_id, name in sorted(TAGS.items(), reverse=True)}
+
+# Clé ajoutée au décodage quand la position est calculée à partir de GPSInfo
+GPS_FIELD = "GPS"
+
+
+@functools.lru_cache(maxsize=None)
+def record_names(names):
+    """Tuple canonique des noms d'un ensemble de tags, partagé par ses enregistrements"""
+    return names
+
+
+def selected_tags(names):
+    """Retourne (noms des champs, {identifiant: position}) pour une suite de noms de tags
+
+    Le champ calculé ``GPS`` suit ``GPSInfo`` lorsqu'il est demandé. Lève
+    ``ValueError`` pour un nom inconnu.
+    """
+    fields = []
+    positions = {}
+    for name in names:
+        if name in fields:
+            continue
+        if name not in TAG_IDS:
+            raise ValueError(f"Tag EXIF inconnu : {name}")
+        positions[TAG_IDS[name]] = len(fields)
+        fields.append(name)
+    if "GPSInfo" in fields:
+        fields.append(GPS_FIELD)
+    return record_names(tuple(fields)), positions
+
+
+class ExifRecord:
+    """Classe pour stocker l'EXIF décodé d'une image sous une forme compacte"""
+    __slots__ = ("names", "values")
+
+    def __init__(self, names, values=None):
+        self.names = names
+        self.values = [None] * len(names) if values is None else values
+
+    def __reduce__(self):
+        return (ExifRecord, (record_names(self.names), self.values))
+
+    def __getitem__(self, name):
+        value = self.get(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def get(self, name, default=None):
+        try:
+            value = self.values[self.names.index(name)]
+        except ValueError:
+            return default
+        return default if value is None else value
+
+    def __setitem__(self, name, value):
+        try:
+            self.values[self.names.index(name)] = value
+        except ValueError:
+            raise KeyError(f"{name} ne fait pas partie des tags demandés") from None
+
+    def pop(self, name, default=None):
+        value = self.get(name, default)
+        if name in self.names:
+            self.values[self.names.index(name)] = None
+        return value
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def keys(self):
+        return [name for name, value in zip(self.names, self.values) if value is not None]
+
+    def items(self):
+        return [(name, value) for name, value in zip(self.names, self.values) if value is not None]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return sum(value is not None for value in self.values)
+
+    def __eq__(self, other):
+        if isinstance(other, (ExifRecord, dict)):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def to_dict(self):
+        """Dictionnaire des tags présents (sérialisation JSON)"""
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"ExifRecord({self.to_dict()!r})"
@@ -0,0 +1,143 @@
+"""Export en colonnes (Parquet, Arrow IPC) ou JSONL compressé d'enregistrements plats
+
+pyarrow et zstandard ne sont importés que par les écrivains qui en ont besoin.
+"""
+import gzip
+import json
+
+DEFAULT_CHUNK_SIZE = 65536
+
+# Schéma des enregistrements produits par MetadataExtractor.extract_flat
+FLAT_FIELDS = (
+    ("path", "string"),
+    ("filename", "string"),
+    ("archive", "string"),
+    ("size_bytes", "int64"),
+    ("created", "float64"),
+    ("modified", "float64"),
+    ("format", "string"),
+    ("mode", "string"),
+    ("width", "int32"),
+    ("height", "int32"),
+    ("dpi_x", "float64"),
+    ("dpi_y", "float64"),
+    ("make", "string"),
+    ("model", "string"),
+    ("datetime_original", "string"),
+    ("latitude", "float64"),
+    ("longitude", "float64"),
+    ("exposure_time", "float64"),
+    ("f_number", "float64"),
+    ("focal_length", "float64"),
+    ("content_hash", "string"),
+    ("phash", "string"),
+    ("cluster", "int64"),
+    ("duplicate_of", "string"),
+    ("thumbnail", "string"),
+    ("deleted", "bool"),
+    ("error", "string"),
+)
+
+STRING_FIELDS = {name for name, kind in FLAT_FIELDS if kind == "string"}
+
+
+def normalize(record):
+    """Complète un enregistrement avec toutes les colonnes du schéma, dans l'ordre"""
+    row = {}
+    for name, _ in FLAT_FIELDS:
+        value = record.get(name)
+        if name in STRING_FIELDS and value is not None and not isinstance(value, str):
+            value = str(value)
+        row[name] = value
+    return row
+
+
+class JsonlWriter:
+    """Écrit un enregistrement JSON par ligne, compressé selon l'extension (.gz, .zst)"""
+    def __init__(self, path, level=None):
+        if path.endswith(".zst"):
+            import zstandard
+            self.raw = open(path, "wb")
+            compressor = zstandard.ZstdCompressor(level=level or 3)
+            self.stream = compressor.stream_writer(self.raw)
+        elif path.endswith(".gz"):
+            self.raw = None
+            self.stream = gzip.open(path, "wb", compresslevel=level or 6)
+        else:
+            self.raw = None
+            self.stream = open(path, "wb")
+
+    def write_batch(self, records):
+        lines = "".join(json.dumps(normalize(record), ensure_ascii=False) + "\n" for record in records)
+        self.stream.write(lines.encode("utf-8"))
+
+    def close(self):
+        self.stream.close()
+        if self.raw is not None and not self.raw.closed:
+            self.raw.close()
+
+
+class ArrowWriter:
+    """Écrit des lots d'enregistrements en Parquet (un groupe de lignes par lot) ou en Arrow IPC"""
+    def __init__(self, path, compression="zstd"):
+        import pyarrow as pa
+
+        self.pa = pa
+        self.schema = pa.schema([(name, pa.type_for_alias(kind)) for name, kind in FLAT_FIELDS])
+        if path.endswith(".parquet"):
+            import pyarrow.parquet as pq
+            self.writer = pq.ParquetWriter(path, self.schema, compression=compression)
+        else:
+            self.writer = pa.ipc.new_file(
+                path, self.schema, options=pa.ipc.IpcWriteOptions(compression=compression)
+            )
+
+    def write_batch(self, records):
+        columns = {name: [] for name, _ in FLAT_FIELDS}
+        for record in records:
+            for name, value in normalize(record).items():
+                columns[name].append(value)
+        self.writer.write_table(self.pa.Table.from_pydict(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def open_writer(path):
+    """Choisit l'écrivain d'après l'extension du fichier de sortie"""
+    if path.endswith((".parquet", ".arrow", ".feather")):
+        return ArrowWriter(path)
+    return JsonlWriter(path)
+
+
+class BatchExporter:
+    """Accumule les enregistrements et les transmet à un écrivain par lots de ``chunk_size``
+
+    Seul le lot courant est gardé en mémoire ; ``flush`` écrit le lot
+    entamé (un groupe de lignes Parquet ou un bloc compressé). Le fichier
+    n'est complet et lisible qu'après ``close`` (pied Parquet ou Arrow,
+    fin du flux compressé).
+    """
+    def __init__(self, writer, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.writer = writer
+        self.chunk_size = chunk_size
+        self.chunk = []
+        self.closed = False
+
+    def write(self, record):
+        self.chunk.append(record)
+        if len(self.chunk) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.chunk:
+            self.writer.write_batch(self.chunk)
+            self.chunk = []
+
+    def close(self):
+        if self.closed:
+            return
+        self.flush()
+        # Un échec de fermeture n'est pas retenté par un second appel
+        self.closed = True
+        self.writer.close()
@@ -0,0 +1,498 @@
+import io
+import os
+import time
+from datetime import datetime
+from PIL import Image
+from PIL.ExifTags import TAGS
+from exif_parser import DEFAULT_MAX_BYTES, EXIF_IFD_TAG, GPS_IFD_TAG, TIFF_STRUCTURE_TAGS, ExifHeaderReader
+from exif_record import ExifRecord, selected_tags
+from logger import Logger
+from metrics import metrics
+
+# Identifiants des tags de l'IFD GPS utilisés pour calculer la position
+GPS_LATITUDE_REF = 1
+GPS_LATITUDE = 2
+GPS_LONGITUDE_REF = 3
+GPS_LONGITUDE = 4
+
+# Tags rationnels convertis en flottants dans les enregistrements plats
+FLAT_RATIONALS = {
+    "exposure_time": "ExposureTime",
+    "f_number": "FNumber",
+    "focal_length": "FocalLength"
+}
+
+# Tags lus par flat_record : suffisent aux enregistrements plats
+FLAT_TAGS = ("Make", "Model", "DateTimeOriginal", "GPSInfo") + tuple(FLAT_RATIONALS.values())
+
+# Extensions proposées par le sélecteur de fichiers et retenues en mode lot
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tiff', '.bmp', '.gif')
+
+
+def rewind(fp):
+    """Replace un fichier au début et le retourne"""
+    fp.seek(0)
+    return fp
+
+
+def read_head(fp, count):
+    """Lit jusqu'à ``count`` octets d'un flux, en relançant les lectures partielles"""
+    chunks = []
+    remaining = count
+    while remaining > 0:
+        chunk = fp.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def stream_seekable(fp):
+    """Indique si un objet fichier accepte ``seek`` (certains flux n'ont pas de ``seekable``)"""
+    try:
+        return fp.seekable()
+    except Exception:
+        return False
+
+
+class MetadataExtractor:
+    """Classe pour gérer l'extraction des métadonnées
+
+    ``tags`` (noms de ``PIL.ExifTags.TAGS``) limite le décodage EXIF à ces
+    tags : les autres, MakerNote comprise, ne sont ni lus ni suivis, et
+    ``exif_info`` est un ``ExifRecord`` compact au lieu d'un dict.
+    ``keep_bytes`` laisse les valeurs binaires en ``bytes`` au lieu de les
+    décoder en texte (l'interface les affiche en hexadécimal).
+    """
+    def __init__(self, max_header_bytes=DEFAULT_MAX_BYTES, cache=None, defer_gps=False, tags=None,
+                 keep_bytes=False):
+        self.logger = Logger()
+        self.tag_names = None
+        self.tag_positions = None
+        if tags is not None:
+            self.tag_names, self.tag_positions = selected_tags(tags)
+        self.header_reader = ExifHeaderReader(
+            max_header_bytes, self.tag_positions.keys() if tags is not None else None
+        )
+        self.cache = cache
+        # En mode lot, la position GPS est calculée pour tout un lot par exif_batch.apply_gps
+        self.defer_gps = defer_gps
+        self.keep_bytes = keep_bytes
+
+    def extract_metadata(self, source):
+        """Extrait toutes les métadonnées d'une image en une seule ouverture du fichier
+
+        ``source`` est un chemin, ou bien des octets ou un objet fichier
+        (voir ``extract_stream``).
+        """
+        if not isinstance(source, (str, os.PathLike)):
+            return self.extract_stream(source)
+        if self.cache is not None:
+            return self.extract_metadata_cached(source)
+        return self.extract_metadata_uncached(source)
+
+    def extract_metadata_uncached(self, image_path):
+        """Extrait les métadonnées sans consulter le cache"""
+        start = time.perf_counter()
+        try:
+            with open(image_path, 'rb') as fp:
+                file_stat = os.fstat(fp.fileno())
+                head = fp.read(self.header_reader.max_bytes)
+                return self.read_metadata(
+                    head, len(head) >= file_stat.st_size, lambda: rewind(fp),
+                    self.file_info_from_stat(image_path, file_stat), start
+                )
+        except Exception as e:
+            metrics.increment("extract_errors")
+            self.logger.log_error("Erreur lors de l'extraction des métadonnées", path=image_path, error=str(e))
+            raise
+
+    def extract_stream(self, source, name=None, size=None, modified=None):
+        """Extrait les métadonnées d'une image en mémoire ou d'un flux, sans fichier sur disque
+
+        ``source`` est un ``bytes``, ``bytearray``, ``memoryview`` ou un objet
+        fichier binaire, positionnable ou non (membre d'archive, socket) :
+        seul l'en-tête est lu, et le reste seulement si Pillow en a besoin
+        pour un format que le lecteur d'en-tête ne gère pas. ``name``,
+        ``size`` et ``modified`` (horodatage) renseignent les informations
+        du fichier.
+        """
+        start = time.perf_counter()
+        try:
+            max_bytes = self.header_reader.max_bytes
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                view = memoryview(source)
+                size = view.nbytes if size is None else size
+                head = bytes(view[:max_bytes])
+                complete = len(head) >= view.nbytes
+                reopen = lambda: io.BytesIO(view)
+            else:
+                fp = source
+                origin = fp.tell() if stream_seekable(fp) else None
+                head = read_head(fp, max_bytes)
+                complete = len(head) < max_bytes or (size is not None and len(head) >= size)
+                if origin == 0:
+                    reopen = lambda: rewind(fp)
+                else:
+                    # Pillow lit les offsets depuis le début du flux : le reste est mis en mémoire
+                    reopen = lambda: io.BytesIO(head + fp.read())
+            if size is None and complete:
+                size = len(head)
+            return self.read_metadata(head, complete, reopen, self.file_info_from_values(name, size, modified), start)
+        except Exception as e:
+            metrics.increment("extract_errors")
+            self.logger.log_error("Erreur lors de l'extraction des métadonnées", path=name, error=str(e))
+            raise
+
+    def read_metadata(self, head, complete, reopen, file_info, start):
+        """Construit les métadonnées à partir de l'en-tête lu
+
+        ``complete`` indique que ``head`` contient toute l'image ; ``reopen``
+        retourne un fichier positionné au début de l'image, pour les
+        formats que Pillow doit relire. La durée de chaque étape (lecture de
+        l'en-tête, informations image, décodage EXIF) alimente
+        l'histogramme ``stage_seconds``.
+        """
+        raw_exif = self.header_reader.parse(head, complete)
+        header_done = time.perf_counter()
+        try:
+            img = self.open_image(head, complete or raw_exif is not None, reopen)
+        except Exception as e:
+            self.logger.log_error("Erreur lors de la récupération des infos image", path=file_info["path"], error=str(e))
+            raise
+        with img:
+            image_info = self.image_info_from(img)
+            image_done = time.perf_counter()
+            metadata = {
+                "file_info": file_info,
+                "image_info": image_info,
+                "exif_info": self.exif_info_from(img, raw_exif)
+            }
+        end = time.perf_counter()
+        metrics.increment("files_processed")
+        metrics.observe("stage_seconds", header_done - start, stage="header")
+        metrics.observe("stage_seconds", image_done - header_done, stage="image_info")
+        metrics.observe("stage_seconds", end - image_done, stage="exif_info")
+        metrics.observe("extract_seconds", end - start)
+        return metadata
+
+    def extract_metadata_cached(self, image_path):
+        """Extrait les métadonnées en passant par le cache persistant
+
+        Un fichier inchangé (même taille et même ``st_mtime_ns``) est servi
+        sans être ouvert ; seules les informations du fichier sont
+        recalculées à partir du stat.
+        """
+        try:
+            file_stat = os.stat(image_path)
+        except Exception as e:
+            self.logger.log_error("Erreur lors de la récupération des infos fichier", path=image_path, error=str(e))
+            raise
+
+        cached, content_hash = self.cache.get(image_path, file_stat, self.cache_matches)
+        if cached is None:
+            metadata = self.extract_metadata_uncached(image_path)
+            self.cache.put(image_path, file_stat, {
+                "image_info": metadata["image_info"],
+                "exif_info": metadata["exif_info"]
+            }, content_hash)
+            return metadata
+
+        return self.metadata_from_cache(image_path, file_stat, cached)
+
+    def cache_matches(self, cached):
+        """Indique si une entrée du cache a été produite avec le même ensemble de tags"""
+        exif_info = cached["exif_info"]
+        if self.tag_names is None:
+            return isinstance(exif_info, dict)
+        return isinstance(exif_info, ExifRecord) and exif_info.names == self.tag_names
+
+    def metadata_from_cache(self, image_path, file_stat, cached):
+        """Complète une entrée du cache avec les informations du fichier"""
+        metrics.increment("files_processed")
+        return {
+            "file_info": self.file_info_from_stat(image_path, file_stat),
+            "image_info": cached["image_info"],
+            "exif_info": cached["exif_info"]
+        }
+
+    def extract_prefetched(self, image_path, file_stat, head):
+        """Extrait les métadonnées d'un fichier dont le stat et l'en-tête ont déjà été lus
+
+        Utilisé par le préchargement du mode lot (``pipeline``) : le fichier
+        n'est rouvert que si Pillow doit relire un format que le lecteur
+        d'en-tête ne gère pas. Avec un cache, un fichier inchangé est servi
+        sans analyse.
+        """
+        content_hash = None
+        if self.cache is not None:
+            cached, content_hash = self.cache.get(image_path, file_stat, self.cache_matches)
+            if cached is not None:
+                return self.metadata_from_cache(image_path, file_stat, cached)
+
+        start = time.perf_counter()
+        opened = []
+
+        def reopen():
+            fp = open(image_path, 'rb')
+            opened.append(fp)
+            return fp
+
+        try:
+            metadata = self.read_metadata(
+                head, len(head) >= file_stat.st_size, reopen, self.file_info_from_stat(image_path, file_stat), start
+            )
+        except Exception as e:
+            metrics.increment("extract_errors")
+            self.logger.log_error("Erreur lors de l'extraction des métadonnées", path=image_path, error=str(e))
+            raise
+        finally:
+            for fp in opened:
+                fp.close()
+
+        if self.cache is not None:
+            self.cache.put(image_path, file_stat, {
+                "image_info": metadata["image_info"],
+                "exif_info": metadata["exif_info"]
+            }, content_hash)
+        return metadata
+
+    def extract_flat(self, image_path):
+        """Extrait un enregistrement plat et typé (voir ``export.FLAT_FIELDS``)
+
+        Taille en octets, dates en secondes depuis l'époque, dimensions
+        entières et coordonnées GPS flottantes, sans chaînes de présentation.
+        """
+        file_stat = os.stat(image_path)
+        metadata = self.extract_metadata(image_path)
+        return self.flat_record(image_path, file_stat, metadata)
+
+    @staticmethod
+    def flat_record(image_path, file_stat, metadata):
+        """Construit l'enregistrement plat à partir du stat et des métadonnées extraites"""
+        image_info = metadata["image_info"]
+        exif_info = metadata["exif_info"]
+        width, _, height = image_info["size"].partition(" x ")
+        dpi = image_info["dpi"] if isinstance(image_info["dpi"], tuple) else (None, None)
+        gps = exif_info.get("GPS") or {}
+        rationals = {
+            field: MetadataExtractor.rational_value(exif_info.get(tag)) for field, tag in FLAT_RATIONALS.items()
+        }
+        return {
+            "path": os.path.abspath(image_path),
+            "filename": os.path.basename(image_path),
+            "size_bytes": file_stat.st_size,
+            "created": file_stat.st_ctime,
+            "modified": file_stat.st_mtime,
+            "format": image_info["format"],
+            "mode": image_info["mode"],
+            "width": int(width),
+            "height": int(height),
+            "dpi_x": float(dpi[0]) if dpi[0] is not None else None,
+            "dpi_y": float(dpi[1]) if dpi[1] is not None else None,
+            "make": exif_info.get("Make"),
+            "model": exif_info.get("Model"),
+            "datetime_original": exif_info.get("DateTimeOriginal"),
+            "latitude": gps.get("latitude"),
+            "longitude": gps.get("longitude"),
+            **rationals
+        }
+
+    @staticmethod
+    def open_image(head, use_head, reopen):
+        """Ouvre l'image avec Pillow en réutilisant l'en-tête déjà lu si possible
+
+        ``use_head`` indique que le tampon contient tout le fichier ou que le
+        lecteur d'en-tête gère le format ; sinon Pillow relit le fichier
+        retourné par ``reopen``.
+        """
+        if use_head:
+            try:
+                return Image.open(io.BytesIO(head))
+            except Exception:
+                pass
+        return Image.open(reopen())
+
+    def get_file_info(self, image_path):
+        """Récupère les informations du fichier"""
+        try:
+            return self.file_info_from_stat(image_path, os.stat(image_path))
+        except Exception as e:
+            self.logger.log_error("Erreur lors de la récupération des infos fichier", path=image_path, error=str(e))
+            raise
+
+    def file_info_from_stat(self, image_path, file_stat):
+        """Construit les informations du fichier à partir d'un résultat de stat"""
+        return {
+            "filename": os.path.basename(image_path),
+            "size": self.format_file_size(file_stat.st_size),
+            "created": datetime.fromtimestamp(file_stat.st_ctime).strftime('%d/%m/%Y %H:%M:%S'),
+            "modified": datetime.fromtimestamp(file_stat.st_mtime).strftime('%d/%m/%Y %H:%M:%S'),
+            "path": os.path.abspath(image_path)
+        }
+
+    def file_info_from_values(self, name, size, modified):
+        """Informations du fichier d'une image sans chemin sur disque (octets, flux, membre d'archive)"""
+        return {
+            "filename": os.path.basename(name) if name else "Non spécifié",
+            "size": self.format_file_size(size) if size is not None else "Non spécifié",
+            "created": "Non spécifié",
+            "modified": (datetime.fromtimestamp(modified).strftime('%d/%m/%Y %H:%M:%S')
+                         if modified is not None else "Non spécifié"),
+            "path": name
+        }
+
+    def get_image_info(self, image_path):
+        """Récupère les informations techniques de l'image"""
+        try:
+            with Image.open(image_path) as img:
+                return self.image_info_from(img)
+        except Exception as e:
+            self.logger.log_error("Erreur lors de la récupération des infos image", path=image_path, error=str(e))
+            raise
+
+    def image_info_from(self, img):
+        """Récupère les informations techniques d'une image déjà ouverte"""
+        return {
+            "format": img.format,
+            "mode": img.mode,
+            "size": f"{img.width} x {img.height}",
+            "dpi": img.info.get('dpi', 'Non spécifié')
+        }
+
+    def get_exif_info(self, image_path):
+        """Récupère les métadonnées EXIF"""
+        try:
+            with open(image_path, 'rb') as fp:
+                file_size = os.fstat(fp.fileno()).st_size
+                head = fp.read(self.header_reader.max_bytes)
+                complete = len(head) >= file_size
+                exif = self.header_reader.parse(head, complete)
+                if exif is None:
+                    with self.open_image(head, complete, lambda: rewind(fp)) as img:
+                        exif = self.pillow_exif(img)
+                return self.decode_exif(exif)
+        except Exception as e:
+            metrics.increment("exif_failures")
+            self.logger.log_error("Erreur lors de la récupération des infos EXIF", path=image_path, error=str(e))
+            return self.decode_exif(None)
+
+    def exif_info_from(self, img, raw_exif=None):
+        """Récupère les métadonnées EXIF d'une image déjà ouverte
+
+        ``raw_exif`` est le résultat du lecteur d'en-tête ; Pillow sert de
+        repli pour les formats que ce lecteur ne gère pas.
+        """
+        try:
+            if raw_exif is None:
+                raw_exif = self.pillow_exif(img)
+            return self.decode_exif(raw_exif)
+        except Exception as e:
+            metrics.increment("exif_failures")
+            self.logger.log_error("Erreur lors de la récupération des infos EXIF", error=str(e))
+            return self.decode_exif(None)
+
+    @staticmethod
+    def pillow_exif(img):
+        """Dictionnaire EXIF brut via Pillow (IFD0, ExifIFD et GPS fusionnés)"""
+        if hasattr(img, '_getexif'):
+            return img._getexif()
+        if img.format == 'TIFF':
+            exif = img.getexif()
+            merged = {tag: value for tag, value in exif.items() if tag not in TIFF_STRUCTURE_TAGS}
+            merged.update(exif.get_ifd(EXIF_IFD_TAG))
+            if GPS_IFD_TAG in exif:
+                merged[GPS_IFD_TAG] = exif.get_ifd(GPS_IFD_TAG)
+            return merged
+        return None
+
+    def decode_exif(self, exif):
+        """Convertit un dictionnaire EXIF brut (identifiants numériques) en noms de tags"""
+        if self.tag_names is not None:
+            return self.decode_selected(exif)
+        exif_data = {}
+        if exif:
+            for tag_id in exif:
+                tag = TAGS.get(tag_id, tag_id)
+                data = exif[tag_id]
+                if isinstance(data, bytes) and not self.keep_bytes:
+                    data = data.decode(errors='replace')
+                exif_data[tag] = data
+
+            # Traitement spécial pour les données GPS
+            if 'GPSInfo' in exif_data and not self.defer_gps:
+                gps_info = self.process_gps_data(exif_data['GPSInfo'])
+                if gps_info:
+                    exif_data['GPS'] = gps_info
+
+        return exif_data
+
+    def decode_selected(self, exif):
+        """Comme ``decode_exif``, limité aux tags demandés et rangé dans un ``ExifRecord``"""
+        record = ExifRecord(self.tag_names)
+        if exif:
+            values = record.values
+            for tag_id, position in self.tag_positions.items():
+                data = exif.get(tag_id)
+                if data is None:
+                    continue
+                if isinstance(data, bytes) and not self.keep_bytes:
+                    data = data.decode(errors='replace')
+                values[position] = data
+
+            if 'GPSInfo' in record and not self.defer_gps:
+                gps_info = self.process_gps_data(record['GPSInfo'])
+                if gps_info:
+                    record['GPS'] = gps_info
+        return record
+
+    def process_gps_data(self, gps_info):
+        """Traite les données GPS"""
+        try:
+            lat = self.convert_to_degrees(gps_info.get(GPS_LATITUDE))
+            lat_ref = gps_info.get(GPS_LATITUDE_REF, 'N')
+
+            lon = self.convert_to_degrees(gps_info.get(GPS_LONGITUDE))
+            lon_ref = gps_info.get(GPS_LONGITUDE_REF, 'E')
+
+            if all([lat, lon]):
+                if lat_ref == 'S': lat = -lat
+                if lon_ref == 'W': lon = -lon
+                metrics.increment("gps_hits")
+                return {'latitude': lat, 'longitude': lon}
+
+        except Exception as e:
+            self.logger.log_error("Erreur lors du traitement GPS", error=str(e))
+            return None
+
+    @staticmethod
+    def convert_to_degrees(values):
+        """Convertit les coordonnées GPS en degrés décimaux"""
+        if not values:
+            return None
+
+        try:
+            d, m, s = [float(x) for x in values]
+            return d + (m / 60.0) + (s / 3600.0)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def rational_value(value):
+        """Convertit une valeur EXIF numérique (rationnel ou entier) en flottant, ou None"""
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def format_file_size(size):
+        """Formate la taille du fichier"""
+        for unit in ['B', 'KB', 'MB', 'GB']:
+            if size < 1024:
+                return f"{size:.2f} {unit}"
+            size /= 1024
+        return f"{size:.2f} TB"
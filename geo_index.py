@@ -0,0 +1,238 @@
+"""Index spatial persistant des coordonnées GPS extraites (SQLite R*Tree)
+
+Usage :
+    python geo_index.py INDEX radius LAT LON METRES
+    python geo_index.py INDEX bbox LAT_MIN LON_MIN LAT_MAX LON_MAX
+    python geo_index.py INDEX nearest LAT LON [-k K]
+"""
+import argparse
+import json
+import math
+import os
+import sqlite3
+import sys
+
+from archive import MEMBER_SEPARATOR
+
+EARTH_RADIUS = 6371008.8
+METRES_PER_DEGREE = math.pi * EARTH_RADIUS / 180
+HALF_CIRCUMFERENCE = math.pi * EARTH_RADIUS
+NEAREST_START_RADIUS = 1000
+COMMIT_INTERVAL = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS points (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL
+);
+"""
+RTREE_SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS points_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon)"
+FALLBACK_SCHEMA = "CREATE INDEX IF NOT EXISTS points_position ON points(latitude, longitude)"
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Distance en mètres entre deux points"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def record_position(record):
+    """Coordonnées d'un enregistrement du mode lot (imbriqué ou plat), ou None"""
+    if "metadata" in record:
+        gps = record["metadata"]["exif_info"].get("GPS")
+        if gps:
+            return gps["latitude"], gps["longitude"]
+        return None
+    if record.get("latitude") is not None and record.get("longitude") is not None:
+        return record["latitude"], record["longitude"]
+    return None
+
+
+class GeoIndex:
+    """Classe pour interroger les positions des images par rectangle, rayon ou proximité
+
+    Les points sont stockés dans une table SQLite doublée d'un index
+    R*Tree ; si le module R*Tree n'est pas compilé dans SQLite, un index
+    B-tree sur (latitude, longitude) prend le relais. L'index se met à jour
+    au fil des extractions (``add``, ``remove``).
+    """
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        try:
+            self.connection.execute(RTREE_SCHEMA)
+            self.rtree = True
+        except sqlite3.OperationalError:
+            self.connection.execute(FALLBACK_SCHEMA)
+            self.rtree = False
+        self.connection.commit()
+
+    def add(self, path, latitude, longitude):
+        """Ajoute ou déplace le point d'une image"""
+        self.remove(path)
+        cursor = self.connection.execute(
+            "INSERT INTO points (path, latitude, longitude) VALUES (?, ?, ?)", (path, latitude, longitude)
+        )
+        if self.rtree:
+            self.connection.execute(
+                "INSERT INTO points_rtree VALUES (?, ?, ?, ?, ?)",
+                (cursor.lastrowid, latitude, latitude, longitude, longitude)
+            )
+
+    def remove(self, path):
+        """Retire le point d'une image, s'il existe"""
+        row = self.connection.execute("SELECT id FROM points WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return
+        self.connection.execute("DELETE FROM points WHERE id = ?", row)
+        if self.rtree:
+            self.connection.execute("DELETE FROM points_rtree WHERE id = ?", row)
+
+    def remove_members(self, archive):
+        """Retire les points des images d'une archive"""
+        prefix = archive + MEMBER_SEPARATOR
+        rows = self.connection.execute(
+            "SELECT id FROM points WHERE substr(path, 1, ?) = ?", (len(prefix), prefix)
+        ).fetchall()
+        self.connection.executemany("DELETE FROM points WHERE id = ?", rows)
+        if self.rtree:
+            self.connection.executemany("DELETE FROM points_rtree WHERE id = ?", rows)
+
+    def commit(self):
+        """Valide les modifications en attente"""
+        self.connection.commit()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM points").fetchone()[0]
+
+    def bbox(self, lat_min, lon_min, lat_max, lon_max):
+        """Retourne les (chemin, latitude, longitude) dans un rectangle
+
+        Un rectangle qui traverse l'antiméridien s'écrit avec ``lon_min`` > ``lon_max``.
+        """
+        if lon_min > lon_max:
+            return self.bbox(lat_min, lon_min, lat_max, 180.0) + self.bbox(lat_min, -180.0, lat_max, lon_max)
+        if self.rtree:
+            # Le R*Tree stocke des flottants 32 bits arrondis vers l'extérieur :
+            # il sert de préfiltre par chevauchement, les coordonnées exactes tranchent.
+            query = (
+                "SELECT p.path, p.latitude, p.longitude FROM points_rtree r JOIN points p ON p.id = r.id "
+                "WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ? "
+                "AND p.latitude BETWEEN ? AND ? AND p.longitude BETWEEN ? AND ?"
+            )
+            params = (lat_min, lat_max, lon_min, lon_max, lat_min, lat_max, lon_min, lon_max)
+        else:
+            query = (
+                "SELECT path, latitude, longitude FROM points "
+                "WHERE latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?"
+            )
+            params = (lat_min, lat_max, lon_min, lon_max)
+        return self.connection.execute(query, params).fetchall()
+
+    def radius(self, latitude, longitude, metres):
+        """Retourne les (chemin, latitude, longitude, distance) à moins de ``metres``, du plus proche au plus lointain"""
+        dlat = metres / METRES_PER_DEGREE
+        lat_min = max(-90.0, latitude - dlat)
+        lat_max = min(90.0, latitude + dlat)
+        widest = max(abs(lat_min), abs(lat_max))
+        if widest >= 90.0 or metres >= HALF_CIRCUMFERENCE:
+            lon_min, lon_max = -180.0, 180.0
+        else:
+            dlon = dlat / math.cos(math.radians(widest))
+            if dlon >= 180.0:
+                lon_min, lon_max = -180.0, 180.0
+            else:
+                lon_min = (longitude - dlon + 180.0) % 360.0 - 180.0
+                lon_max = (longitude + dlon + 180.0) % 360.0 - 180.0
+
+        matches = []
+        for path, lat, lon in self.bbox(lat_min, lon_min, lat_max, lon_max):
+            distance = haversine(latitude, longitude, lat, lon)
+            if distance <= metres:
+                matches.append((path, lat, lon, distance))
+        matches.sort(key=lambda match: match[3])
+        return matches
+
+    def nearest(self, latitude, longitude, k=1):
+        """Retourne les ``k`` points les plus proches, en élargissant la recherche par doublement du rayon"""
+        metres = NEAREST_START_RADIUS
+        while True:
+            matches = self.radius(latitude, longitude, metres)
+            if len(matches) >= k or metres >= HALF_CIRCUMFERENCE:
+                return matches[:k]
+            metres *= 4 if not matches else 2
+
+    def close(self):
+        """Valide les modifications et ferme la base"""
+        self.connection.commit()
+        self.connection.close()
+
+
+def index_records(records, index, commit_interval=COMMIT_INTERVAL):
+    """Met l'index à jour au passage des enregistrements du mode lot et les retransmet"""
+    staged = 0
+    for record in records:
+        path = os.path.abspath(record["path"])
+        if record.get("deleted"):
+            index.remove(path)
+            index.remove_members(path)
+        elif "error" not in record:
+            position = record_position(record)
+            if position is not None:
+                index.add(path, *position)
+            else:
+                index.remove(path)
+        staged += 1
+        if staged >= commit_interval:
+            index.commit()
+            staged = 0
+        yield record
+    index.commit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    radius_parser = subparsers.add_parser("radius", help="Images à moins de METRES d'un point")
+    radius_parser.add_argument("latitude", type=float)
+    radius_parser.add_argument("longitude", type=float)
+    radius_parser.add_argument("metres", type=float)
+
+    bbox_parser = subparsers.add_parser("bbox", help="Images dans un rectangle")
+    for name in ("lat_min", "lon_min", "lat_max", "lon_max"):
+        bbox_parser.add_argument(name, type=float)
+
+    nearest_parser = subparsers.add_parser("nearest", help="Images les plus proches d'un point")
+    nearest_parser.add_argument("latitude", type=float)
+    nearest_parser.add_argument("longitude", type=float)
+    nearest_parser.add_argument("-k", type=int, default=10)
+
+    args = parser.parse_args(argv)
+    index = GeoIndex(args.index)
+    try:
+        if args.command == "radius":
+            matches = index.radius(args.latitude, args.longitude, args.metres)
+        elif args.command == "bbox":
+            matches = index.bbox(args.lat_min, args.lon_min, args.lat_max, args.lon_max)
+        else:
+            matches = index.nearest(args.latitude, args.longitude, args.k)
+    finally:
+        index.close()
+
+    for match in matches:
+        sys.stdout.write(json.dumps(match, ensure_ascii=False) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
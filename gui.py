@@ -0,0 +1,624 @@
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+from PIL import ImageTk
+import json
+import os
+import webbrowser
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from extractor import IMAGE_EXTENSIONS, MetadataExtractor
+from prefetch import DEFAULT_DEPTH as PREFETCH_DEPTH, DEFAULT_MAX_BYTES as PREFETCH_MAX_BYTES, Prefetcher
+from thumbnails import ThumbnailEngine, user_cache_dir
+from virtual_table import VirtualTable
+from logger import Logger
+
+# Au-delà, une valeur est tronquée dans le panneau des métadonnées
+MAX_VALUE_CHARS = 300
+HEX_PREVIEW_BYTES = 32
+
+
+def looks_binary(text, sample=512):
+    """Indique si un texte décodé (erreurs remplacées) provient manifestement de données binaires"""
+    head = text[:sample]
+    if not head:
+        return False
+    unreadable = sum(1 for c in head if c == "\ufffd" or (not c.isprintable() and c not in "\n\r\t"))
+    return unreadable > len(head) // 10
+
+
+class MetadataExtractorGUI:
+    """Classe principale de l'interface graphique"""
+    def __init__(self, prefetch_depth=PREFETCH_DEPTH, prefetch_max_bytes=PREFETCH_MAX_BYTES):
+        self.root = tk.Tk()
+        self.setup_window()
+        
+        # Instances des classes utilitaires
+        self.metadata_extractor = MetadataExtractor(keep_bytes=True)
+        try:
+            self.thumbnails = ThumbnailEngine((350, 350), cache_dir=user_cache_dir())
+        except OSError:
+            # Dossier de cache impossible à créer : vignettes en mémoire seulement
+            self.thumbnails = ThumbnailEngine((350, 350))
+        self.reverse_search = None  # Créée au premier usage (charge Selenium)
+        self.logger = Logger()
+
+        # Variables d'instance
+        self.current_image_path = None
+        self.current_metadata = None
+
+        # Chargements en arrière-plan ; un nouveau choix rend les précédents obsolètes
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.prefetcher = Prefetcher(
+            self.executor,
+            self.metadata_extractor,
+            self.thumbnails,
+            depth=prefetch_depth,
+            max_bytes=prefetch_max_bytes
+        )
+        self.load_generation = 0
+        self.loads_remaining = 0
+
+        # Mode dossier : images du dossier ouvert et position courante
+        self.folder_images = []
+        self.folder_index = 0
+
+        # Configuration de l'interface
+        self.setup_styles()
+        self.create_widgets()
+        self.setup_grid_weights()
+
+    def setup_window(self):
+        """Configure la fenêtre principale"""
+        self.root.title("Extracteur de Métadonnées Avancé")
+        width = 1000
+        height = 800
+        screen_width = self.root.winfo_screenwidth()
+        screen_height = self.root.winfo_screenheight()
+        x = (screen_width - width) // 2
+        y = (screen_height - height) // 2
+        self.root.geometry(f"{width}x{height}+{x}+{y}")
+        self.root.minsize(800, 600)
+
+    def setup_styles(self):
+        """Configure les styles de l'interface"""
+        style = ttk.Style()
+        style.configure('TButton', padding=5)
+        style.configure('TLabel', padding=5)
+        style.configure('Header.TLabel', font=('Helvetica', 14, 'bold'))
+        style.configure('Section.TLabel', font=('Helvetica', 11, 'bold'))
+        style.configure('Info.TLabel', font=('Helvetica', 10))
+
+    def create_widgets(self):
+        """Crée tous les widgets de l'interface"""
+        # Frame principal
+        self.main_frame = ttk.Frame(self.root, padding="20")
+        self.main_frame.grid(row=0, column=0, sticky="nsew")
+
+        # En-tête
+        self.create_header()
+
+        # Conteneur principal
+        content_frame = ttk.Frame(self.main_frame)
+        content_frame.grid(row=1, column=0, sticky="nsew", pady=10)
+        content_frame.grid_columnconfigure(1, weight=1)
+
+        # Panneau gauche (aperçu)
+        self.create_preview_panel(content_frame)
+
+        # Panneau droit (métadonnées)
+        self.create_metadata_panel(content_frame)
+
+        # Barre de statut
+        self.create_status_bar()
+
+    def create_header(self):
+        """Crée la section d'en-tête"""
+        header_frame = ttk.Frame(self.main_frame)
+        header_frame.grid(row=0, column=0, sticky="ew")
+
+        title = ttk.Label(
+            header_frame,
+            text="Analyseur de Métadonnées et Recherche d'Images",
+            style='Header.TLabel'
+        )
+        title.pack(pady=10)
+
+        select_btn = ttk.Button(
+            header_frame,
+            text="Sélectionner une image",
+            command=self.select_image,
+            width=25
+        )
+        select_btn.pack(pady=5)
+
+        browse_btn = ttk.Button(
+            header_frame,
+            text="Parcourir un résultat de lot",
+            command=self.browse_batch,
+            width=25
+        )
+        browse_btn.pack(pady=5)
+
+        folder_btn = ttk.Button(
+            header_frame,
+            text="Ouvrir un dossier",
+            command=self.select_folder,
+            width=25
+        )
+        folder_btn.pack(pady=5)
+
+    def create_preview_panel(self, parent):
+        """Crée le panneau d'aperçu"""
+        preview_frame = ttk.LabelFrame(parent, text="Aperçu", padding="10")
+        preview_frame.grid(row=0, column=0, sticky="nsew", padx=(0, 10))
+
+        self.preview_label = ttk.Label(preview_frame)
+        self.preview_label.pack(expand=True, fill="both")
+
+        # Boutons d'action
+        button_frame = ttk.Frame(preview_frame)
+        button_frame.pack(fill="x", pady=(10, 0))
+
+        self.maps_btn = ttk.Button(
+            button_frame,
+            text="Ouvrir dans Google Maps",
+            command=self.open_in_maps,
+            state="disabled"
+        )
+        self.maps_btn.pack(side="left", padx=5)
+
+        self.reverse_search_btn = ttk.Button(
+            button_frame,
+            text="Recherche inverse",
+            command=self.start_reverse_search,
+            state="disabled"
+        )
+        self.reverse_search_btn.pack(side="left", padx=5)
+
+        # Navigation dans un dossier
+        nav_frame = ttk.Frame(preview_frame)
+        nav_frame.pack(fill="x", pady=(5, 0))
+
+        self.prev_btn = ttk.Button(
+            nav_frame,
+            text="◀ Précédente",
+            command=lambda: self.navigate(-1),
+            state="disabled"
+        )
+        self.prev_btn.pack(side="left", padx=5)
+
+        self.position_var = tk.StringVar(value="")
+        ttk.Label(nav_frame, textvariable=self.position_var, style='Info.TLabel').pack(side="left", expand=True)
+
+        self.next_btn = ttk.Button(
+            nav_frame,
+            text="Suivante ▶",
+            command=lambda: self.navigate(1),
+            state="disabled"
+        )
+        self.next_btn.pack(side="right", padx=5)
+
+        self.root.bind("<Left>", lambda event: self.on_arrow_key(event, -1))
+        self.root.bind("<Right>", lambda event: self.on_arrow_key(event, 1))
+    def create_metadata_panel(self, parent):
+        """Crée le panneau des métadonnées"""
+        metadata_frame = ttk.LabelFrame(parent, text="Informations et Métadonnées", padding="10")
+        metadata_frame.grid(row=0, column=1, sticky="nsew")
+        
+        # Zone de texte avec scrollbar
+        self.metadata_text = tk.Text(
+            metadata_frame,
+            wrap=tk.WORD,
+            font=('Consolas', 10),
+            padx=10,
+            pady=10
+        )
+        scrollbar = ttk.Scrollbar(
+            metadata_frame,
+            orient="vertical",
+            command=self.metadata_text.yview
+        )
+        
+        self.metadata_text.configure(yscrollcommand=scrollbar.set)
+        self.metadata_text.tag_configure("expand", foreground="blue", underline=True)
+        self.metadata_text.tag_bind("expand", "<Button-1>", self.expand_value)
+        self.expandable = {}
+        self.expand_count = 0
+        self.metadata_text.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+    def create_status_bar(self):
+        """Crée la barre de statut"""
+        self.status_var = tk.StringVar(value="Prêt")
+        self.status_label = ttk.Label(
+            self.main_frame,
+            textvariable=self.status_var,
+            style='Info.TLabel'
+        )
+        self.status_label.grid(row=2, column=0, sticky="ew", pady=(10, 0))
+
+    def setup_grid_weights(self):
+        """Configure le redimensionnement de la grille"""
+        self.root.grid_rowconfigure(0, weight=1)
+        self.root.grid_columnconfigure(0, weight=1)
+        self.main_frame.grid_rowconfigure(1, weight=1)
+        self.main_frame.grid_columnconfigure(0, weight=1)
+
+    def select_image(self):
+        """Gère la sélection d'une image"""
+        filetypes = (
+            ("Images", ";".join(f"*{ext}" for ext in IMAGE_EXTENSIONS)),
+            ("JPEG", "*.jpg;*.jpeg"),
+            ("PNG", "*.png"),
+            ("Tous les fichiers", "*.*")
+        )
+        
+        try:
+            filename = filedialog.askopenfilename(
+                title="Sélectionner une image",
+                filetypes=filetypes
+            )
+            
+            if filename:
+                self.folder_images = []
+                self.update_navigation()
+                self.current_image_path = filename
+                self.start_loading(filename)
+                
+        except Exception as e:
+            self.logger.log_error("Erreur lors de la sélection de l'image", error=str(e))
+            messagebox.showerror("Erreur", "Impossible de charger l'image sélectionnée")
+
+    def start_loading(self, image_path):
+        """Affiche l'aperçu et les métadonnées dès qu'ils sont prêts, en arrière-plan
+
+        En mode dossier, les images suivantes sont préchargées ; sinon le
+        chargement de l'image précédente est annulé.
+        """
+        self.load_generation += 1
+        generation = self.load_generation
+
+        self.current_metadata = None
+        self.loads_remaining = 2
+        self.maps_btn.configure(state="disabled")
+        self.reverse_search_btn.configure(state="disabled")
+        self.metadata_text.delete(1.0, tk.END)
+        self.expandable.clear()
+        self.status_var.set(f"Chargement de {os.path.basename(image_path)}... (0/2)")
+
+        if self.folder_images:
+            self.prefetcher.focus(self.folder_images, self.folder_index)
+        else:
+            self.prefetcher.focus([image_path], 0)
+        preview, metadata = self.prefetcher.load(image_path)
+        self.watch_load(generation, preview, self.load_image, self.handle_preview_error)
+        self.watch_load(generation, metadata, self.extract_and_display_metadata, self.handle_metadata_error)
+
+    def watch_load(self, generation, future, on_done, on_error):
+        """Renvoie le résultat d'un chargement au thread Tk lorsqu'il se termine"""
+        def done(future):
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is not None:
+                self.root.after(0, self.finish_load, generation, on_error, error)
+            else:
+                self.root.after(0, self.finish_load, generation, on_done, future.result())
+
+        future.add_done_callback(done)
+
+    def finish_load(self, generation, callback, value):
+        """Applique un résultat de chargement s'il concerne encore l'image courante"""
+        if generation != self.load_generation:
+            return
+        callback(value)
+
+        self.loads_remaining -= 1
+        if self.loads_remaining:
+            name = os.path.basename(self.current_image_path)
+            self.status_var.set(f"Chargement de {name}... ({2 - self.loads_remaining}/2)")
+        else:
+            self.reverse_search_btn.configure(state="normal")
+            self.status_var.set("Image chargée avec succès")
+
+    def load_image(self, image):
+        """Affiche l'aperçu calculé en arrière-plan"""
+        # Conversion pour Tkinter (dans le thread Tk)
+        photo = ImageTk.PhotoImage(image)
+        self.preview_label.configure(image=photo)
+        self.preview_label.image = photo  # Garde une référence
+
+    def handle_preview_error(self, error):
+        """Gère l'échec du calcul de l'aperçu"""
+        self.logger.log_error("Erreur lors du chargement de l'image", error=str(error))
+        self.preview_label.configure(image="")
+        self.preview_label.image = None
+        messagebox.showerror("Erreur", "Impossible de charger l'image sélectionnée")
+
+    def extract_and_display_metadata(self, metadata):
+        """Affiche les métadonnées extraites en arrière-plan"""
+        self.current_metadata = metadata
+
+        # Affichage des informations du fichier
+        self.display_section("INFORMATIONS DU FICHIER", metadata["file_info"])
+
+        # Affichage des informations de l'image
+        self.display_section("INFORMATIONS DE L'IMAGE", metadata["image_info"])
+
+        # Affichage des métadonnées EXIF
+        self.display_section("MÉTADONNÉES EXIF", metadata["exif_info"])
+
+        # Active le bouton Google Maps si des coordonnées GPS sont présentes
+        if "GPS" in metadata["exif_info"]:
+            self.maps_btn.configure(state="normal")
+        else:
+            self.maps_btn.configure(state="disabled")
+
+    def handle_metadata_error(self, error):
+        """Gère l'échec de l'extraction des métadonnées"""
+        self.logger.log_error("Erreur lors de l'extraction des métadonnées", error=str(error))
+        self.metadata_text.insert(tk.END, "Erreur lors de l'extraction des métadonnées\n")
+
+    def display_section(self, title, data):
+        """Affiche une section de métadonnées en un seul appel à ``insert``
+
+        Les valeurs longues sont tronquées et les valeurs binaires résumées
+        en hexadécimal ; un clic sur le lien affiche la valeur complète.
+        """
+        width = 50
+        chunks = ["\n" + "=" * width + "\n" + title.center(width) + "\n" + "=" * width + "\n\n", ()]
+
+        if isinstance(data, dict):
+            lines = []
+            for key, value in data.items():
+                preview, full = self.format_value(value)
+                if full is None:
+                    lines.append(f"{key}: {preview}\n")
+                    continue
+                self.expand_count += 1
+                tag = f"expand-{self.expand_count}"
+                self.expandable[tag] = full
+                chunks.extend((
+                    "".join(lines) + f"{key}: ", (),
+                    f"{preview} ", (tag,),
+                    f"[afficher {len(full)} caractères]", ("expand", tag),
+                    "\n", ()
+                ))
+                lines = []
+            lines.append("\n")
+            chunks.extend(("".join(lines), ()))
+        else:
+            chunks.extend((str(data) + "\n\n", ()))
+
+        self.metadata_text.insert(tk.END, *chunks)
+
+    @staticmethod
+    def format_value(value):
+        """Retourne (texte affiché, texte complet ou None si la valeur n'est pas tronquée)"""
+        if isinstance(value, bytes):
+            text = value.decode(errors='replace')
+            if looks_binary(text):
+                return MetadataExtractorGUI.format_bytes(value)
+        else:
+            text = str(value)
+        if len(text) > MAX_VALUE_CHARS:
+            return text[:MAX_VALUE_CHARS] + "…", text
+        return text, None
+
+    @staticmethod
+    def format_bytes(data):
+        """Résume une valeur binaire en hexadécimal, à partir de ses octets d'origine"""
+        preview = f"<binaire, {len(data)} octets> {data[:HEX_PREVIEW_BYTES].hex(' ')}"
+        full = "\n".join(
+            data[i:i + HEX_PREVIEW_BYTES].hex(' ') for i in range(0, len(data), HEX_PREVIEW_BYTES)
+        )
+        return preview, "\n" + full if len(data) > HEX_PREVIEW_BYTES else None
+
+    def expand_value(self, event):
+        """Remplace l'aperçu et son lien « afficher » par la valeur complète"""
+        index = self.metadata_text.index(f"@{event.x},{event.y}")
+        for tag in self.metadata_text.tag_names(index):
+            if tag in self.expandable:
+                start, end = self.metadata_text.tag_ranges(tag)[:2]
+                self.metadata_text.delete(start, end)
+                self.metadata_text.insert(start, self.expandable.pop(tag))
+                break
+
+    def browse_batch(self):
+        """Ouvre un fichier JSONL produit par le mode lot dans un tableau virtualisé"""
+        filename = filedialog.askopenfilename(
+            title="Sélectionner un résultat de lot",
+            filetypes=(("JSON Lines", "*.jsonl"), ("Tous les fichiers", "*.*"))
+        )
+        if not filename:
+            return
+
+        window = tk.Toplevel(self.root)
+        window.title(os.path.basename(filename))
+        window.geometry("900x500")
+        paths = []
+        table = VirtualTable(
+            window,
+            columns=(("Fichier", 320), ("Format", 70), ("Dimensions", 110), ("GPS", 200), ("Erreur", 200)),
+            on_activate=lambda index: self.open_from_batch(paths[index])
+        )
+        table.pack(fill="both", expand=True)
+        self.status_var.set(f"Lecture de {os.path.basename(filename)}...")
+
+        def read_rows():
+            rows = []
+            with open(filename, encoding="utf-8") as fp:
+                for line in fp:
+                    record = json.loads(line)
+                    metadata = record.get("metadata", {})
+                    image_info = metadata.get("image_info", {})
+                    gps = metadata.get("exif_info", {}).get("GPS")
+                    paths.append(record["path"])
+                    rows.append((
+                        record["path"],
+                        image_info.get("format", ""),
+                        image_info.get("size", ""),
+                        f"{gps['latitude']:.5f}, {gps['longitude']:.5f}" if gps else "",
+                        record.get("error", "deleted" if record.get("deleted") else "")
+                    ))
+            return rows
+
+        def show_rows(future):
+            try:
+                rows = future.result()
+            except Exception as e:
+                self.logger.log_error("Erreur lors de la lecture du lot", error=str(e))
+                self.root.after(0, self.status_var.set, "Impossible de lire le résultat de lot")
+                return
+            self.root.after(0, table.set_rows, rows)
+            self.root.after(0, self.status_var.set, f"{len(rows)} enregistrement(s) chargé(s)")
+
+        self.executor.submit(read_rows).add_done_callback(show_rows)
+
+    def open_from_batch(self, path):
+        """Affiche dans la fenêtre principale une image choisie dans un lot"""
+        self.folder_images = []
+        self.update_navigation()
+        self.current_image_path = path
+        self.start_loading(path)
+
+    def select_folder(self):
+        """Ouvre toutes les images d'un dossier, avec navigation suivante/précédente"""
+        directory = filedialog.askdirectory(title="Sélectionner un dossier")
+        if not directory:
+            return
+
+        try:
+            with os.scandir(directory) as entries:
+                images = sorted(
+                    entry.path for entry in entries
+                    if entry.is_file() and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS
+                )
+        except OSError as e:
+            self.logger.log_error("Impossible de parcourir le dossier", path=directory, error=str(e))
+            messagebox.showerror("Erreur", "Impossible d'ouvrir le dossier sélectionné")
+            return
+
+        if not images:
+            messagebox.showinfo("Information", "Aucune image dans ce dossier")
+            return
+        self.folder_images = images
+        self.show_folder_image(0)
+
+    def show_folder_image(self, index):
+        """Affiche l'image ``index`` du dossier ouvert"""
+        self.folder_index = index
+        self.current_image_path = self.folder_images[index]
+        self.update_navigation()
+        self.start_loading(self.current_image_path)
+
+    def navigate(self, step):
+        """Passe à l'image suivante (``step`` = 1) ou précédente (``step`` = -1)"""
+        if not self.folder_images:
+            return
+        index = self.folder_index + step
+        if 0 <= index < len(self.folder_images):
+            self.show_folder_image(index)
+
+    def on_arrow_key(self, event, step):
+        """Navigation au clavier, sauf pendant l'édition du panneau de métadonnées"""
+        if event.widget is self.metadata_text:
+            return
+        self.navigate(step)
+
+    def update_navigation(self):
+        """Met à jour les boutons de navigation et la position dans le dossier"""
+        count = len(self.folder_images)
+        self.prev_btn.configure(state="normal" if count and self.folder_index > 0 else "disabled")
+        self.next_btn.configure(state="normal" if self.folder_index < count - 1 else "disabled")
+        self.position_var.set(f"{self.folder_index + 1} / {count}" if count else "")
+
+    def start_reverse_search(self):
+        """Lance la recherche inverse"""
+        if not self.current_image_path:
+            return
+            
+        self.status_var.set("Recherche inverse en cours...")
+        self.reverse_search_btn.configure(state="disabled")
+        self.metadata_text.insert(tk.END, "\nLancement de la recherche inverse...\n")
+        
+        def search_thread():
+            try:
+                self.get_reverse_search().search_image(
+                    self.current_image_path,
+                    self.handle_search_results
+                )
+            except Exception as e:
+                self.root.after(0, self.handle_search_error, str(e))
+                
+        thread = threading.Thread(target=search_thread)
+        thread.daemon = True
+        thread.start()
+
+    def get_reverse_search(self):
+        """Retourne l'instance de recherche inverse, créée au premier usage"""
+        if self.reverse_search is None:
+            from reverse_search import ImageReverseSearch
+            from search_cache import ReverseSearchCache
+            self.reverse_search = ImageReverseSearch(result_cache=ReverseSearchCache(":memory:"))
+        return self.reverse_search
+
+    def handle_search_results(self, results):
+        """Traite les résultats de la recherche inverse"""
+        def update_ui():
+            if "error" in results:
+                self.handle_search_error(results["error"])
+                return
+                
+            self.display_section("RÉSULTATS DE LA RECHERCHE INVERSE", {
+                "Sites trouvés": "\n".join(results["sites"]) if results["sites"] else "Aucun",
+                "Descriptions": "\n".join(results["descriptions"]) if results["descriptions"] else "Aucune",
+                "Durées": ", ".join(f"{phase} {duration:.2f} s" for phase, duration in results["timings"].items())
+            })
+            
+            self.status_var.set("Recherche terminée")
+            self.reverse_search_btn.configure(state="normal")
+            
+        self.root.after(0, update_ui)
+
+    def handle_search_error(self, error_message):
+        """Gère les erreurs de recherche"""
+        self.status_var.set("Erreur lors de la recherche")
+        self.reverse_search_btn.configure(state="normal")
+        self.metadata_text.insert(tk.END, f"\nErreur: {error_message}\n")
+        
+        messagebox.showerror(
+            "Erreur",
+            f"La recherche inverse a échoué: {error_message}"
+        )
+
+    def open_in_maps(self):
+        """Ouvre les coordonnées dans Google Maps"""
+        if not self.current_metadata:
+            return
+            
+        try:
+            gps_info = self.current_metadata["exif_info"].get("GPS")
+            if gps_info:
+                lat = gps_info["latitude"]
+                lon = gps_info["longitude"]
+                url = f"https://www.google.com/maps?q={lat},{lon}"
+                webbrowser.open(url)
+            else:
+                messagebox.showinfo(
+                    "Information",
+                    "Aucune coordonnée GPS disponible pour cette image"
+                )
+        except Exception as e:
+            self.logger.log_error("Erreur lors de l'ouverture de Google Maps", error=str(e))
+            messagebox.showerror("Erreur", "Impossible d'ouvrir Google Maps")
+
+    def run(self):
+        """Lance l'application"""
+        try:
+            self.root.mainloop()
+        finally:
+            self.prefetcher.clear()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            if self.reverse_search:
+                self.reverse_search.close()
@@ -0,0 +1,203 @@
+"""Journalisation structurée de l'application
+
+Le niveau est vérifié avant toute mise en forme : un événement filtré ne
+coûte qu'une comparaison. Les autres sont confiés à un fil d'écriture qui
+les met en forme (texte lisible ou un objet JSON par ligne) et les écrit
+par paquets. Les champs nommés (``path=...``, ``error=...``) restent des
+clés distinctes dans la sortie JSON ; les ``args`` positionnels ne sont
+appliqués au message (``%``) que dans le fil d'écriture.
+"""
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+LEVEL_NAMES = {value: name for name, value in LEVELS.items()}
+
+MAX_BATCH = 512
+FLUSH_TIMEOUT = 5
+
+_level = INFO
+_json = False
+_path = None
+_writer = None
+_writer_lock = threading.Lock()
+
+
+class LogWriter:
+    """Fil d'écriture : met en forme et écrit les événements par paquets, hors du code appelant
+
+    Un fichier est ouvert en ajout et chaque paquet y est écrit d'un seul
+    appel système, ce qui permet à plusieurs processus de partager le même
+    journal sans mélanger les lignes.
+    """
+    def __init__(self, path=None, json_format=False):
+        self.json_format = json_format
+        self.file = open(path, "ab", buffering=0) if path else None
+        self.queue = queue.SimpleQueue()
+        self.pid = os.getpid()
+        self.thread = threading.Thread(target=self.run, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def put(self, event):
+        self.queue.put(event)
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = []
+            markers = []
+            for event in batch:
+                if isinstance(event, tuple):
+                    lines.append(self.format(event))
+                else:
+                    markers.append(event)
+            if lines:
+                self.write("".join(lines))
+            for marker in markers:
+                if marker is None:
+                    return
+                marker.set()
+
+    def write(self, text):
+        try:
+            if self.file is not None:
+                self.file.write(text.encode("utf-8"))
+            else:
+                sys.stderr.write(text)
+                sys.stderr.flush()
+        except Exception:
+            # Le journal ne doit jamais interrompre l'application
+            pass
+
+    def format(self, event):
+        timestamp, level, message, args, fields = event
+        if args:
+            try:
+                message = message % args
+            except (TypeError, ValueError):
+                message = f"{message} {args!r}"
+        if self.json_format:
+            record = {"ts": timestamp, "level": LEVEL_NAMES[level], "pid": self.pid, "message": message}
+            record.update(fields)
+            return json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        text = f"[{LEVEL_NAMES[level].upper()}] {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))} - {message}"
+        if fields:
+            text += " (" + ", ".join(f"{name}={value}" for name, value in fields.items()) + ")"
+        return text + "\n"
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """Attend que les événements déjà émis soient écrits"""
+        marker = threading.Event()
+        self.queue.put(marker)
+        marker.wait(timeout)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join(FLUSH_TIMEOUT)
+        if self.file is not None:
+            self.file.close()
+
+
+def get_writer():
+    """Fil d'écriture du processus courant (recréé après un fork)"""
+    global _writer
+    writer = _writer
+    if writer is not None and writer.pid == os.getpid():
+        return writer
+    with _writer_lock:
+        if _writer is None or _writer.pid != os.getpid():
+            _writer = LogWriter(_path, _json)
+        return _writer
+
+
+def configure(level=None, json_format=None, path=None):
+    """Règle le niveau minimal (nom ou nombre), le format JSON et le fichier de sortie
+
+    Sans ``path``, les événements vont sur la sortie d'erreur. Les
+    événements déjà émis sont écrits avec l'ancienne configuration.
+    """
+    global _level, _json, _path, _writer
+    if level is not None:
+        _level = LEVELS[level.lower()] if isinstance(level, str) else level
+    with _writer_lock:
+        if json_format is not None:
+            _json = json_format
+        if path is not None:
+            _path = path
+        writer, _writer = _writer, None
+    if writer is not None and writer.pid == os.getpid():
+        writer.close()
+
+
+def configuration():
+    """Configuration courante, transmissible à ``configure`` dans un autre processus"""
+    return {"level": _level, "json_format": _json, "path": _path}
+
+
+def enabled(level):
+    """Indique si un événement de ce niveau serait émis"""
+    return level >= _level
+
+
+def log(level, message, *args, **fields):
+    """Émet un événement si son niveau est actif"""
+    if level < _level:
+        return
+    get_writer().put((time.time(), level, message, args, fields))
+
+
+def flush():
+    """Attend l'écriture des événements émis par le processus courant"""
+    writer = _writer
+    if writer is not None and writer.pid == os.getpid():
+        writer.flush()
+
+
+@atexit.register
+def shutdown():
+    writer = _writer
+    if writer is not None and writer.pid == os.getpid():
+        writer.close()
+
+
+class Logger:
+    """Classe pour gérer les logs de l'application (le niveau est testé avant tout appel)"""
+    @staticmethod
+    def log_error(error_message, *args, **fields):
+        if ERROR >= _level:
+            get_writer().put((time.time(), ERROR, error_message, args, fields))
+
+    @staticmethod
+    def log_warning(warning_message, *args, **fields):
+        if WARNING >= _level:
+            get_writer().put((time.time(), WARNING, warning_message, args, fields))
+
+    @staticmethod
+    def log_info(info_message, *args, **fields):
+        if INFO >= _level:
+            get_writer().put((time.time(), INFO, info_message, args, fields))
+
+    @staticmethod
+    def log_debug(debug_message, *args, **fields):
+        if DEBUG >= _level:
+            get_writer().put((time.time(), DEBUG, debug_message, args, fields))
+
+    @staticmethod
+    def enabled(level):
+        return enabled(level)
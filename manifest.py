@@ -0,0 +1,119 @@
+"""Manifeste des arborescences parcourues, pour les relances incrémentales (SQLite)"""
+import os
+import sqlite3
+
+from logger import Logger
+
+COMMIT_INTERVAL = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+"""
+
+
+class ScanManifest:
+    """Classe pour mémoriser l'état des fichiers traités lors du dernier passage
+
+    Chaque fichier est inscrit avec sa taille et son ``st_mtime_ns``. Au
+    passage suivant, le stat relevé pendant le parcours suffit à classer un
+    fichier comme nouveau, modifié ou inchangé : les fichiers inchangés ne
+    sont pas ouverts. Un fichier n'est inscrit qu'après l'émission de son
+    résultat et les écritures sont validées par transactions : une relance
+    après interruption ne retraite que ce qui n'a pas été enregistré.
+    """
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.pending = {}
+        self.added = 0
+        self.modified = 0
+        self.unchanged = 0
+        self.deleted = 0
+
+        self.connection = sqlite3.connect(db_path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS seen (path TEXT PRIMARY KEY)")
+
+    def changes(self, entries):
+        """Retourne les chemins nouveaux ou modifiés parmi des couples (chemin, entrée)
+
+        ``entries`` a la forme produite par ``batch.iter_entries``. Le stat
+        de chaque fichier à traiter est conservé jusqu'à ``record`` ou
+        ``discard``.
+        """
+        for path, entry in entries:
+            path = os.path.abspath(path)
+            try:
+                file_stat = entry.stat() if entry is not None else os.stat(path)
+            except OSError as e:
+                Logger.log_error("Impossible de lire les attributs du fichier", path=path, error=str(e))
+                continue
+
+            self.connection.execute("INSERT OR IGNORE INTO seen VALUES (?)", (path,))
+            row = self.connection.execute(
+                "SELECT size, mtime_ns FROM files WHERE path = ?", (path,)
+            ).fetchone()
+            if row == (file_stat.st_size, file_stat.st_mtime_ns):
+                self.unchanged += 1
+                continue
+
+            if row is None:
+                self.added += 1
+            else:
+                self.modified += 1
+            self.pending[path] = file_stat
+            yield path
+
+    def record(self, path):
+        """Inscrit un fichier traité avec le stat relevé lors du parcours"""
+        file_stat = self.pending.pop(path, None)
+        if file_stat is None:
+            return
+        self.connection.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?)",
+            (path, file_stat.st_size, file_stat.st_mtime_ns)
+        )
+
+    def discard(self, path):
+        """Oublie un fichier en échec : il sera retraité au prochain passage"""
+        self.pending.pop(path, None)
+
+    def removed(self, roots):
+        """Retourne les chemins inscrits sous ``roots`` absents du parcours courant"""
+        for root in roots:
+            root = os.path.abspath(root)
+            prefix = root.rstrip(os.sep) + os.sep
+            rows = self.connection.execute(
+                "SELECT path FROM files WHERE (path = ? OR substr(path, 1, ?) = ?) "
+                "AND path NOT IN (SELECT path FROM seen)",
+                (root, len(prefix), prefix)
+            ).fetchall()
+            for (path,) in rows:
+                yield path
+
+    def forget(self, path):
+        """Retire un fichier supprimé du manifeste"""
+        self.connection.execute("DELETE FROM files WHERE path = ?", (path,))
+        self.deleted += 1
+
+    def commit(self):
+        """Valide les inscriptions et suppressions en attente"""
+        self.connection.commit()
+
+    def stats(self):
+        """Compteurs du passage courant"""
+        return {
+            "added": self.added,
+            "modified": self.modified,
+            "unchanged": self.unchanged,
+            "deleted": self.deleted
+        }
+
+    def close(self):
+        """Ferme la base ; les écritures non validées sont abandonnées"""
+        self.connection.close()
@@ -0,0 +1,217 @@
+"""Compteurs, jauges et histogrammes de durées de l'application
+
+``metrics`` est le registre du processus. Les histogrammes ont des bornes
+fixes : enregistrer une durée coûte une recherche dichotomique et trois
+incréments sous verrou. Le contenu s'obtient par ``snapshot`` (JSON),
+``dump`` (fichier, flux ou signal SIGUSR1) ou par un point d'accès HTTP
+local (``serve``) au format texte Prometheus ou JSON. En mode lot, chaque
+processus de travail renvoie ses incréments (``drain``) que le processus
+principal additionne (``merge``) ; les jauges (profondeur d'une file...)
+restent propres au processus qui les pose.
+"""
+import bisect
+import json
+import signal
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Bornes supérieures des classes des histogrammes, en secondes
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf"))
+
+DEFAULT_HOST = "127.0.0.1"
+
+
+def metric_key(name, labels):
+    if not labels:
+        return (name, ())
+    return (name, tuple(labels.items()) if len(labels) == 1 else tuple(sorted(labels.items())))
+
+
+def key_text(key):
+    """Nom affichable d'une série : nom{étiquette="valeur",...}"""
+    name, labels = key
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{label}="{value}"' for label, value in labels) + "}"
+
+
+def bucket_quantile(buckets, count, fraction):
+    """Borne supérieure de la classe qui contient le quantile (estimation par excès)"""
+    rank = fraction * count
+    seen = 0
+    for bound, bucket_count in zip(BUCKETS, buckets):
+        seen += bucket_count
+        if seen >= rank:
+            return bound
+    return BUCKETS[-1]
+
+
+class Metrics:
+    """Classe pour tenir les compteurs, les jauges et les histogrammes de durées d'un processus"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.started = time.time()
+
+    def increment(self, name, amount=1, **labels):
+        """Ajoute ``amount`` à un compteur"""
+        key = metric_key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        """Fixe la valeur courante d'une jauge"""
+        key = metric_key(name, labels)
+        with self.lock:
+            self.gauges[key] = value
+
+    def observe(self, name, seconds, **labels):
+        """Ajoute une durée à un histogramme"""
+        key = metric_key(name, labels)
+        index = bisect.bisect_left(BUCKETS, seconds)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(BUCKETS), 0, 0.0]
+            histogram[0][index] += 1
+            histogram[1] += 1
+            histogram[2] += seconds
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Mesure la durée du bloc dans un histogramme"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        """Copie lisible des compteurs, jauges et histogrammes (p50/p99 estimés par les classes)"""
+        with self.lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            histograms = {key: (list(buckets), count, total) for key, (buckets, count, total) in self.histograms.items()}
+        return {
+            "uptime_s": time.time() - self.started,
+            "counters": {key_text(key): value for key, value in sorted(counters.items())},
+            "gauges": {key_text(key): value for key, value in sorted(gauges.items())},
+            "histograms": {
+                key_text(key): {
+                    "count": count,
+                    "sum_s": total,
+                    "p50_s": bucket_quantile(buckets, count, 0.5),
+                    "p99_s": bucket_quantile(buckets, count, 0.99)
+                }
+                for key, (buckets, count, total) in sorted(histograms.items())
+            }
+        }
+
+    def drain(self):
+        """Retourne les valeurs brutes accumulées depuis le dernier appel et les remet à zéro"""
+        with self.lock:
+            counters, self.counters = self.counters, {}
+            histograms, self.histograms = self.histograms, {}
+        return {"counters": counters, "histograms": histograms}
+
+    def merge(self, drained):
+        """Additionne les valeurs brutes d'un autre processus (résultat de ``drain``)"""
+        with self.lock:
+            for key, value in drained["counters"].items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            for key, (buckets, count, total) in drained["histograms"].items():
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = [[0] * len(BUCKETS), 0, 0.0]
+                histogram[0] = [a + b for a, b in zip(histogram[0], buckets)]
+                histogram[1] += count
+                histogram[2] += total
+
+    def prometheus(self):
+        """Texte au format d'exposition Prometheus"""
+        with self.lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            histograms = sorted((key, (list(b), c, t)) for key, (b, c, t) in self.histograms.items())
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{key_text((name, labels))} {value}")
+        for (name, labels), value in gauges:
+            if name not in typed:
+                lines.append(f"# TYPE {name} gauge")
+                typed.add(name)
+            lines.append(f"{key_text((name, labels))} {value}")
+        for (name, labels), (buckets, count, total) in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS, buckets):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{key_text((name + '_bucket', labels + (('le', le),)))} {cumulative}")
+            lines.append(f"{key_text((name + '_sum', labels))} {total}")
+            lines.append(f"{key_text((name + '_count', labels))} {count}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, destination=None):
+        """Écrit ``snapshot`` en JSON dans un fichier (chemin) ou un flux (sortie d'erreur par défaut)"""
+        text = json.dumps(self.snapshot(), indent=2, ensure_ascii=False)
+        if isinstance(destination, str):
+            with open(destination, "w", encoding="utf-8") as fp:
+                fp.write(text + "\n")
+        else:
+            stream = destination or sys.stderr
+            stream.write(text + "\n")
+            stream.flush()
+
+    def install_dump_signal(self, destination=None):
+        """Écrit les métriques à chaque réception de SIGUSR1 (systèmes POSIX uniquement)"""
+        def handler(signum, frame):
+            # Le gestionnaire peut interrompre un détenteur du verrou : l'écriture se fait à côté
+            threading.Thread(target=self.dump, args=(destination,), daemon=True).start()
+
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, handler)
+
+    def serve(self, port, host=DEFAULT_HOST):
+        """Expose ``/metrics`` (Prometheus) et ``/metrics.json`` sur un serveur HTTP local en arrière-plan"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = registry.prometheus(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = json.dumps(registry.snapshot(), ensure_ascii=False), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type + "; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+
+metrics = Metrics()
@@ -0,0 +1,123 @@
+"""Préchargement des en-têtes pour le mode lot sur un stockage à forte latence
+
+Sur un système de fichiers réseau, le coût d'un fichier tient surtout à la
+latence de l'ouverture, du stat et de la lecture de l'en-tête, pas à
+l'analyse. Le lot se découpe alors en deux étages :
+
+- ``HeaderPrefetcher`` : ``threads`` fils d'entrée/sortie ouvrent chaque
+  fichier, en lisent le stat et les premiers octets ; au plus
+  ``queue_size`` fichiers sont en cours de lecture ou en attente d'analyse ;
+- ``batch.run_batch`` : les processus d'analyse reçoivent ces en-têtes par
+  lots (``MetadataExtractor.extract_prefetched``) sans rouvrir le fichier,
+  sauf pour un format que le lecteur d'en-tête ne gère pas. Au plus deux
+  lots par processus sont en vol.
+
+Les deux étages sont bornés : quand l'analyse prend du retard, plus aucune
+lecture n'est lancée et les en-têtes ne s'accumulent pas en mémoire. La
+profondeur de chaque file est publiée dans la jauge ``pipeline_queue_depth``
+et le nombre de fichiers lus dans le compteur ``pipeline_items``.
+"""
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from exif_parser import DEFAULT_MAX_BYTES
+from metrics import metrics
+
+DEFAULT_IO_THREADS = 32
+DEFAULT_QUEUE_SIZE = 256
+
+# Fichier préchargé : stat et en-tête, ou message d'erreur
+Prefetched = namedtuple("Prefetched", "path stat head error")
+
+
+def read_header(path, max_bytes=DEFAULT_MAX_BYTES, opener=open):
+    """Lit le stat et les ``max_bytes`` premiers octets d'un fichier, sans lever d'exception"""
+    try:
+        with opener(path, 'rb') as fp:
+            file_stat = os.fstat(fp.fileno())
+            head = fp.read(max_bytes)
+    except Exception as e:
+        return Prefetched(path, None, None, str(e))
+    return Prefetched(path, file_stat, head, None)
+
+
+def entry_path(entry):
+    """Chemin d'un élément du lot : chemin simple ou ``Prefetched``"""
+    return entry.path if isinstance(entry, Prefetched) else entry
+
+
+class HeaderPrefetcher:
+    """Classe pour lire en parallèle le stat et l'en-tête des fichiers d'un lot
+
+    L'itération retourne un ``Prefetched`` par chemin, dans l'ordre de fin
+    de lecture. Les chemins pour lesquels ``passthrough`` est vrai (les
+    archives, lues en flux par l'analyse) sont retransmis tels quels. Le
+    parcours de ``paths`` reste dans le fil appelant : un générateur adossé
+    à SQLite (``ScanManifest.changes``) peut être passé directement.
+    ``opener`` remplace ``open``, par exemple pour simuler une latence.
+    """
+    def __init__(self, paths, threads=DEFAULT_IO_THREADS, queue_size=DEFAULT_QUEUE_SIZE,
+                 max_bytes=DEFAULT_MAX_BYTES, opener=open, passthrough=None):
+        self.paths = paths
+        self.threads = threads
+        self.queue_size = max(queue_size, threads)
+        self.max_bytes = max_bytes
+        self.opener = opener
+        self.passthrough = passthrough
+        self.files = 0
+        self.bytes_read = 0
+        self.errors = 0
+        self.max_ready = 0
+        self.seconds = 0.0
+
+    def read(self, path):
+        return read_header(path, self.max_bytes, self.opener)
+
+    def __iter__(self):
+        start = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="prefetch")
+        paths = iter(self.paths)
+        pending = set()
+        try:
+            while True:
+                for path in paths:
+                    if self.passthrough is not None and self.passthrough(path):
+                        yield path
+                        continue
+                    pending.add(executor.submit(self.read, path))
+                    if len(pending) >= self.queue_size:
+                        break
+                if not pending:
+                    break
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                ready = len(done) + sum(future.done() for future in pending)
+                self.max_ready = max(self.max_ready, ready)
+                metrics.set_gauge("pipeline_queue_depth", len(pending), stage="io")
+                metrics.set_gauge("pipeline_ready", ready, stage="io")
+                for future in done:
+                    entry = future.result()
+                    self.files += 1
+                    if entry.error is not None:
+                        self.errors += 1
+                    else:
+                        self.bytes_read += len(entry.head)
+                    metrics.increment("pipeline_items", stage="io")
+                    yield entry
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            self.seconds += time.perf_counter() - start
+
+    def stats(self):
+        """Fichiers et octets lus, erreurs, débit et plus grand nombre d'en-têtes prêts en attente"""
+        return {
+            "files": self.files,
+            "bytes_read": self.bytes_read,
+            "errors": self.errors,
+            "files_per_s": self.files / self.seconds if self.seconds else None,
+            "max_ready": self.max_ready
+        }
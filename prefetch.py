@@ -0,0 +1,89 @@
+"""Préchargement en arrière-plan des images voisines de l'image affichée"""
+import threading
+from collections import OrderedDict
+
+DEFAULT_DEPTH = 3
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class Prefetcher:
+    """Classe pour charger à l'avance l'aperçu et les métadonnées des images suivantes
+
+    Chaque image de la fenêtre (la précédente, l'image courante et les
+    ``depth`` suivantes) a deux futures sur ``executor`` : la vignette
+    (``thumbnails.thumbnail``) et les métadonnées
+    (``extractor.extract_metadata``). Les chargements sortis de la fenêtre
+    sont annulés ou oubliés ; au-delà de ``max_bytes`` de vignettes
+    décodées, les images les plus lointaines sont abandonnées.
+    """
+    def __init__(self, executor, extractor, thumbnails, depth=DEFAULT_DEPTH, max_bytes=DEFAULT_MAX_BYTES):
+        self.executor = executor
+        self.extractor = extractor
+        self.thumbnails = thumbnails
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.window = []
+        self.lock = threading.RLock()
+
+    def load(self, path):
+        """Retourne (future de la vignette, future des métadonnées), en lançant le chargement si besoin"""
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is None or any(future.cancelled() for future in entry):
+                entry = (
+                    self.executor.submit(self.thumbnails.thumbnail, path),
+                    self.executor.submit(self.extractor.extract_metadata, path)
+                )
+                self.entries[path] = entry
+                entry[0].add_done_callback(lambda future: self.enforce_limit())
+            return entry
+
+    def focus(self, paths, index):
+        """Recentre la fenêtre de préchargement sur ``paths[index]``
+
+        L'image courante est soumise en premier, puis les suivantes dans
+        l'ordre de navigation et enfin la précédente.
+        """
+        window = [paths[index]] + paths[index + 1:index + 1 + self.depth] + paths[max(0, index - 1):index]
+        with self.lock:
+            self.window = window
+            for path in [path for path in self.entries if path not in set(window)]:
+                for future in self.entries.pop(path):
+                    future.cancel()
+        for path in window:
+            self.load(path)
+        self.enforce_limit()
+
+    def enforce_limit(self):
+        """Abandonne les images les plus lointaines tant que les vignettes dépassent ``max_bytes``"""
+        with self.lock:
+            window = self.window
+            total = sum(self.entry_bytes(self.entries[path]) for path in window if path in self.entries)
+            for path in reversed(window[1:]):
+                if total <= self.max_bytes:
+                    break
+                entry = self.entries.pop(path, None)
+                if entry is None:
+                    continue
+                total -= self.entry_bytes(entry)
+                for future in entry:
+                    future.cancel()
+
+    @staticmethod
+    def entry_bytes(entry):
+        """Taille décodée de la vignette d'une entrée terminée"""
+        preview = entry[0]
+        if not preview.done() or preview.cancelled() or preview.exception() is not None:
+            return 0
+        image = preview.result()
+        return image.width * image.height * len(image.getbands())
+
+    def clear(self):
+        """Annule et oublie tous les chargements"""
+        with self.lock:
+            for entry in self.entries.values():
+                for future in entry:
+                    future.cancel()
+            self.entries.clear()
+            self.window = []
@@ -0,0 +1,412 @@
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.chrome.service import Service
+from selenium.common.exceptions import TimeoutException
+from webdriver_manager.chrome import ChromeDriverManager
+from logger import Logger
+from metrics import metrics
+from search_cache import dhash
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_MAX_USES = 50
+
+SEARCH_URL = "https://images.google.com/imghp"
+
+# Délais maximaux (secondes) de chaque phase de la recherche inverse
+DEFAULT_TIMEOUTS = {
+    "navigation": 15,
+    "upload": 20,
+    "results": 20
+}
+
+DEFAULT_RATE = 0.5
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 2.0
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+
+def resolve_driver_path():
+    """Résout le binaire chromedriver une seule fois par processus"""
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = ChromeDriverManager().install()
+        return _driver_path
+
+
+def create_driver():
+    """Démarre un Chrome headless avec une configuration optimisée"""
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless=new')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--window-size=1920,1080')
+    options.add_argument('--disable-notifications')
+    options.add_argument('--disable-extensions')
+    options.add_argument('--ignore-certificate-errors')
+    options.add_argument('--disable-infobars')
+    options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+
+    service = Service(resolve_driver_path())
+    return webdriver.Chrome(service=service, options=options)
+
+
+class DriverPool:
+    """Classe pour prêter des drivers Chrome déjà démarrés
+
+    Au plus ``max_size`` drivers existent à la fois (``grow`` relève la
+    limite). Un driver est vérifié
+    avant chaque prêt, et remplacé s'il ne répond plus, s'il a servi
+    ``max_uses`` fois ou si la recherche qui l'utilisait a échoué.
+    ``factory`` permet de substituer un faux driver à Chrome.
+    """
+    def __init__(self, max_size=DEFAULT_POOL_SIZE, max_uses=DEFAULT_MAX_USES, factory=create_driver):
+        self.max_size = max_size
+        self.max_uses = max_uses
+        self.factory = factory
+        self.logger = Logger()
+        self.idle = queue.LifoQueue()
+        self.uses = {}
+        self.slots = threading.Semaphore(max_size)
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def grow(self, max_size):
+        """Relève le nombre maximal de drivers à ``max_size`` (sans effet s'il est déjà atteint)"""
+        with self.lock:
+            extra = max_size - self.max_size
+            if extra <= 0:
+                return
+            self.max_size = max_size
+        self.slots.release(extra)
+
+    @contextmanager
+    def driver(self):
+        """Prête un driver pour la durée du bloc"""
+        driver = self.acquire()
+        broken = False
+        try:
+            yield driver
+        except Exception:
+            broken = True
+            raise
+        finally:
+            self.release(driver, broken)
+
+    def acquire(self):
+        """Retourne un driver sain, en démarrant un nouveau si aucun n'est libre"""
+        if self.closed:
+            raise RuntimeError("Le pool de drivers est fermé")
+        self.slots.acquire()
+        try:
+            while True:
+                try:
+                    driver = self.idle.get_nowait()
+                except queue.Empty:
+                    break
+                if self.is_healthy(driver):
+                    return driver
+                self.discard(driver)
+
+            start = time.perf_counter()
+            driver = self.factory()
+            metrics.increment("driver_launches")
+            metrics.observe("driver_launch_seconds", time.perf_counter() - start)
+            with self.lock:
+                self.uses[id(driver)] = 0
+            self.logger.log_info("Driver Chrome initialisé avec succès")
+            return driver
+        except Exception as e:
+            self.slots.release()
+            metrics.increment("driver_launch_errors")
+            self.logger.log_error("Erreur d'initialisation du driver", error=str(e))
+            raise
+
+    def release(self, driver, broken=False):
+        """Rend un driver au pool, ou le ferme s'il est usé ou en erreur"""
+        try:
+            with self.lock:
+                self.uses[id(driver)] = self.uses.get(id(driver), 0) + 1
+                worn = self.uses[id(driver)] >= self.max_uses
+            if broken or worn or self.closed:
+                self.discard(driver)
+            else:
+                self.idle.put(driver)
+        finally:
+            self.slots.release()
+
+    @staticmethod
+    def is_healthy(driver):
+        """Vérifie que le navigateur répond encore"""
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def discard(self, driver):
+        """Ferme un driver et l'oublie"""
+        with self.lock:
+            self.uses.pop(id(driver), None)
+        try:
+            driver.quit()
+            self.logger.log_info("Driver fermé avec succès")
+        except Exception as e:
+            self.logger.log_error("Erreur lors de la fermeture du driver", error=str(e))
+
+    def close(self):
+        """Ferme tous les drivers inactifs ; ceux en cours d'usage le seront à leur retour"""
+        self.closed = True
+        while True:
+            try:
+                driver = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            self.discard(driver)
+
+
+class RateLimiter:
+    """Seau à jetons : au plus ``rate`` requêtes par seconde, par rafales de ``burst``"""
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Attend qu'un jeton soit disponible et le consomme"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Le jeton est réservé tout de suite : les appels suivants attendent d'autant plus
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0
+        if delay:
+            time.sleep(delay)
+
+
+class ImageReverseSearch:
+    """Classe pour gérer la recherche inverse d'images
+
+    Chaque phase attend une condition explicite plutôt qu'un délai fixe ;
+    ``timeouts`` remplace tout ou partie de ``DEFAULT_TIMEOUTS``. Avec
+    ``result_cache`` (``ReverseSearchCache``), une image proche d'une image
+    déjà recherchée est servie sans ouvrir le navigateur.
+    """
+    def __init__(self, pool=None, timeouts=None, search_url=SEARCH_URL, result_cache=None):
+        self.pool = pool or DriverPool()
+        self.result_cache = result_cache
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.search_url = search_url
+        self.logger = Logger()
+
+    def search_image(self, image_path, callback):
+        """Effectue la recherche inverse d'image et transmet le résultat à ``callback``
+
+        Les résultats contiennent ``timings`` : la durée en secondes de la
+        navigation, de l'envoi, de l'affichage des résultats et de leur
+        extraction.
+        """
+        timings = {}
+        try:
+            results = self.run_search(image_path, timings)
+        except Exception as e:
+            error_msg = f"Erreur lors de la recherche: {str(e)}"
+            metrics.increment("search_errors")
+            self.logger.log_error("Erreur lors de la recherche", path=image_path, error=str(e))
+            callback({"error": error_msg, "timings": timings})
+            return
+        callback(results)
+
+    def run_search(self, image_path, timings):
+        """Effectue une recherche inverse avec un driver du pool et lève en cas d'échec
+
+        ``timings`` reçoit la durée de chaque phase terminée, même en cas d'erreur.
+        """
+        image_hash = None
+        if self.result_cache is not None:
+            start = time.perf_counter()
+            try:
+                image_hash = dhash(image_path)
+            except Exception as e:
+                self.logger.log_error("Erreur lors du calcul de l'empreinte", path=image_path, error=str(e))
+            cached = self.result_cache.get(image_hash) if image_hash is not None else None
+            timings["hash"] = time.perf_counter() - start
+            if cached is not None:
+                metrics.increment("search_cache_hits")
+                self.logger.log_info("Résultats servis depuis le cache de recherche", path=image_path)
+                cached["timings"] = timings
+                return cached
+
+        with self.pool.driver() as driver:
+            self.logger.log_info("Début de la recherche inverse")
+
+            # Accès à Google Images, jusqu'à ce que le bouton soit cliquable
+            start = time.perf_counter()
+            driver.get(self.search_url)
+            search_button = WebDriverWait(driver, self.timeouts["navigation"]).until(
+                EC.element_to_be_clickable((By.CSS_SELECTOR, "[aria-label='Recherche par image']"))
+            )
+            timings["navigation"] = time.perf_counter() - start
+
+            # Upload de l'image, jusqu'au départ de la page de recherche
+            start = time.perf_counter()
+            search_button.click()
+            file_input = WebDriverWait(driver, self.timeouts["upload"]).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "input[type='file']"))
+            )
+            abs_path = os.path.abspath(image_path)
+            self.logger.log_info("Envoi de l'image", path=abs_path)
+            file_input.send_keys(abs_path)
+            WebDriverWait(driver, self.timeouts["upload"]).until(EC.staleness_of(file_input))
+            timings["upload"] = time.perf_counter() - start
+
+            # Attente des résultats
+            start = time.perf_counter()
+            try:
+                elements = WebDriverWait(driver, self.timeouts["results"]).until(
+                    EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".g"))
+                )
+            except TimeoutException:
+                metrics.increment("search_timeouts", phase="results")
+                self.logger.log_error("Aucun résultat affiché dans le délai imparti", path=image_path)
+                elements = []
+            timings["results"] = time.perf_counter() - start
+
+            # Extraction des résultats
+            start = time.perf_counter()
+            results = self.extract_results(elements)
+            timings["extraction"] = time.perf_counter() - start
+
+        if image_hash is not None and (results["sites"] or results["descriptions"]):
+            self.result_cache.put(image_hash, results)
+        results["timings"] = timings
+        for phase, duration in timings.items():
+            metrics.observe("search_phase_seconds", duration, phase=phase)
+        metrics.observe("search_seconds", sum(timings.values()))
+        self.logger.log_info("Recherche terminée", path=image_path, timings=timings)
+        return results
+
+    def search_images(self, image_paths, workers=None, rate=DEFAULT_RATE, retries=DEFAULT_RETRIES,
+                      backoff=DEFAULT_BACKOFF, stats=None):
+        """Recherche une suite d'images en parallèle et retourne les résultats au fil de l'eau
+
+        Chaque recherche en vol utilise son propre driver du pool ; ``workers``
+        vaut par défaut la taille du pool, qui est agrandie si ``workers`` la
+        dépasse. Les lancements sont limités à
+        ``rate`` par seconde et une recherche en échec est relancée jusqu'à
+        ``retries`` fois, après une attente exponentielle. Chaque
+        enregistrement contient ``path``, ``results`` ou ``error``,
+        ``attempts`` et ``latency`` (secondes, tentatives comprises). Si
+        ``stats`` est fourni, il reçoit le nombre d'images, d'erreurs, la
+        durée totale et le débit en images par seconde.
+        """
+        stats = {} if stats is None else stats
+        workers = workers or self.pool.max_size
+        self.pool.grow(workers)
+        limiter = RateLimiter(rate, burst=workers) if rate else None
+        started = time.perf_counter()
+        count = errors = 0
+
+        def search_one(path):
+            start = time.perf_counter()
+            for attempt in range(retries + 1):
+                if limiter is not None:
+                    limiter.acquire()
+                timings = {}
+                try:
+                    results = self.run_search(path, timings)
+                except Exception as e:
+                    error_msg = f"Erreur lors de la recherche: {str(e)}"
+                    self.logger.log_error("Erreur lors de la recherche", path=path, attempt=attempt + 1, error=str(e))
+                    if attempt < retries:
+                        time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+                    continue
+                return {"path": path, "results": results, "attempts": attempt + 1,
+                        "latency": time.perf_counter() - start}
+            # Une image en échec ne compte qu'une fois, quel que soit le nombre de tentatives
+            metrics.increment("search_errors")
+            return {"path": path, "error": error_msg, "attempts": retries + 1,
+                    "latency": time.perf_counter() - start}
+
+        paths = iter(image_paths)
+        pending = set()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            try:
+                while True:
+                    for path in paths:
+                        pending.add(executor.submit(search_one, path))
+                        if len(pending) >= workers * 2:
+                            break
+                    if not pending:
+                        break
+
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record = future.result()
+                        count += 1
+                        errors += "error" in record
+                        yield record
+            finally:
+                for future in pending:
+                    future.cancel()
+
+                elapsed = time.perf_counter() - started
+                stats.update({
+                    "images": count,
+                    "errors": errors,
+                    "elapsed": elapsed,
+                    "throughput": count / elapsed if elapsed else 0.0
+                })
+
+    def extract_results(self, elements):
+        """Extrait les informations pertinentes des éléments de résultat affichés"""
+        results = {
+            "locations": [],
+            "sites": [],
+            "descriptions": []
+        }
+
+        try:
+            for element in elements[:5]:
+                try:
+                    # Extraction du texte
+                    text = element.text.strip()
+                    if text:
+                        results["descriptions"].append(text)
+
+                    # Extraction des liens
+                    links = element.find_elements(By.CSS_SELECTOR, "a")
+                    for link in links:
+                        url = link.get_attribute("href")
+                        if url and url not in results["sites"]:
+                            results["sites"].append(url)
+
+                except Exception as e:
+                    self.logger.log_error("Erreur lors de l'extraction d'un élément", error=str(e))
+                    continue
+
+        except Exception as e:
+            self.logger.log_error("Erreur lors de l'extraction des résultats", error=str(e))
+
+        return results
+
+    def close(self):
+        """Ferme proprement les drivers du pool et le cache de résultats"""
+        self.pool.close()
+        if self.result_cache is not None:
+            self.result_cache.close()
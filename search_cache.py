@@ -0,0 +1,110 @@
+"""Cache des résultats de recherche inverse, indexé par empreinte perceptuelle (SQLite)"""
+import pickle
+import sqlite3
+import threading
+import time
+
+from PIL import Image
+
+HASH_SIZE = 8
+DEFAULT_MAX_DISTANCE = 5
+DEFAULT_TTL = 7 * 24 * 3600
+
+HASH_MASK = (1 << 64) - 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    hash INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_created ON results(created);
+"""
+
+
+def dhash(image_path, hash_size=HASH_SIZE):
+    """Empreinte par différence (dHash) sur ``hash_size`` x ``hash_size`` bits
+
+    Pour un JPEG, ``draft`` fait décoder l'image directement à une échelle
+    réduite dans le domaine DCT : le coût reste faible sur les gros fichiers.
+    """
+    with Image.open(image_path) as img:
+        img.draft('L', ((hash_size + 1) * 8, hash_size * 8))
+        return dhash_image(img, hash_size)
+
+
+def dhash_image(img, hash_size=HASH_SIZE):
+    """dHash d'une image déjà ouverte (éventuellement décodée à échelle réduite)"""
+    small = img.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+    pixels = small.tobytes()
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def to_signed(value):
+    """Ramène une empreinte de 64 bits dans la plage des entiers SQLite"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def hamming(a, b):
+    """Nombre de bits différents entre deux empreintes"""
+    return ((a ^ b) & HASH_MASK).bit_count()
+
+
+class ReverseSearchCache:
+    """Classe pour mémoriser les résultats de recherche inverse
+
+    Une image dont l'empreinte est à au plus ``max_distance`` bits d'une
+    empreinte connue (copie redimensionnée ou recompressée) reçoit les
+    résultats en cache sans nouvelle recherche. Les entrées expirent après
+    ``ttl`` secondes. La connexion est partagée entre threads sous verrou.
+    """
+    def __init__(self, db_path, max_distance=DEFAULT_MAX_DISTANCE, ttl=DEFAULT_TTL):
+        self.db_path = db_path
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        self.connection = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.connection.create_function("hamming", 2, hamming, deterministic=True)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+
+    def get(self, image_hash):
+        """Retourne les résultats de l'empreinte connue la plus proche, ou None"""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT payload, hamming(hash, ?) AS distance FROM results "
+                "WHERE created >= ? AND distance <= ? ORDER BY distance LIMIT 1",
+                (to_signed(image_hash), time.time() - self.ttl, self.max_distance)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return pickle.loads(row[0])
+
+    def put(self, image_hash, results):
+        """Enregistre les résultats d'une recherche et purge les entrées expirées"""
+        blob = pickle.dumps(results, protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?)", (to_signed(image_hash), now, blob)
+            )
+            self.connection.execute("DELETE FROM results WHERE created < ?", (now - self.ttl,))
+
+    def stats(self):
+        """Compteurs de succès et d'échecs"""
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        """Ferme la base"""
+        self.connection.close()
@@ -0,0 +1,157 @@
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+from PIL import Image
+from PIL.TiffImagePlugin import IFDRational
+
+import main
+from archive import MEMBER_SEPARATOR, extract_archive
+from exif_parser import EXIF_IFD_TAG, GPS_IFD_TAG
+from extractor import MetadataExtractor
+from manifest import ScanManifest
+
+
+class Pipe(io.RawIOBase):
+    """Flux non positionnable, lu par petits morceaux comme un tube"""
+    def __init__(self, data, chunk=1000):
+        self.data = io.BytesIO(data)
+        self.chunk = chunk
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def readinto(self, buffer):
+        data = self.data.read(min(len(buffer), self.chunk))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def write_images(root):
+    exif = Image.Exif()
+    exif[0x010F] = "TestCam"
+    exif.get_ifd(EXIF_IFD_TAG)[0x9003] = "2024:05:17 10:30:00"
+    exif[EXIF_IFD_TAG] = 0
+    gps = exif.get_ifd(GPS_IFD_TAG)
+    gps[1] = "S"
+    gps[2] = (IFDRational(33, 1), IFDRational(52, 1), IFDRational(4, 1))
+    gps[3] = "W"
+    gps[4] = (IFDRational(151, 1), IFDRational(12, 1), IFDRational(36, 1))
+    exif[GPS_IFD_TAG] = 0
+    paths = [root / "gps.jpg", root / "plain.png", root / "image.tiff"]
+    Image.new("RGB", (120, 80), (10, 20, 30)).save(paths[0], format="JPEG", exif=exif, dpi=(300, 300))
+    Image.new("RGBA", (40, 30)).save(paths[1], format="PNG")
+    Image.new("L", (50, 60)).save(paths[2], format="TIFF", exif=exif)
+    return paths
+
+
+@pytest.fixture
+def images(tmp_path):
+    root = tmp_path / "images"
+    root.mkdir()
+    return write_images(root)
+
+
+def same_metadata(streamed, reference):
+    assert streamed["image_info"] == reference["image_info"]
+    assert streamed["exif_info"] == reference["exif_info"]
+
+
+@pytest.mark.parametrize("kind", ["bytes", "memoryview", "pipe", "fichier"])
+def test_extract_stream_matches_path(images, kind):
+    extractor = MetadataExtractor()
+    for path in images:
+        data = path.read_bytes()
+        source = {
+            "bytes": lambda: data,
+            "memoryview": lambda: memoryview(bytearray(data)),
+            "pipe": lambda: Pipe(data),
+            "fichier": lambda: open(path, "rb"),
+        }[kind]()
+        try:
+            streamed = extractor.extract_stream(source, name=str(path), size=len(data))
+        finally:
+            if hasattr(source, "close"):
+                source.close()
+        same_metadata(streamed, extractor.extract_metadata(str(path)))
+        assert streamed["file_info"]["filename"] == path.name
+
+
+def write_zip(path, images):
+    with zipfile.ZipFile(path, "w") as zf:
+        for image in images:
+            zf.write(image, f"album/{image.name}")
+        zf.writestr("notes.txt", "pas une image")
+
+
+def write_tar(path, images, mode):
+    with tarfile.open(path, mode) as tf:
+        for image in images:
+            tf.add(image, f"album/{image.name}")
+
+
+@pytest.mark.parametrize("name, mode", [
+    ("album.zip", None), ("album.tar", "w"), ("album.tar.gz", "w:gz"), ("album.tar.xz", "w:xz")
+])
+def test_extract_archive_matches_path(images, tmp_path, name, mode):
+    archive = tmp_path / name
+    if mode is None:
+        write_zip(archive, images)
+    else:
+        write_tar(archive, images, mode)
+
+    extractor = MetadataExtractor()
+    results = list(extract_archive(str(archive), extractor))
+    assert [record["path"] for record, _ in results] == [
+        f"{archive}{MEMBER_SEPARATOR}album/{image.name}" for image in images
+    ]
+    for (record, member_stat), image in zip(results, images):
+        assert record["archive"] == str(archive)
+        assert member_stat.st_size == os.path.getsize(image)
+        same_metadata(record["metadata"], extractor.extract_metadata(str(image)))
+
+
+def test_extract_tar_from_pipe(images, tmp_path):
+    archive = tmp_path / "album.tar.gz"
+    write_tar(archive, images, "w:gz")
+    extractor = MetadataExtractor()
+    results = list(extract_archive(Pipe(archive.read_bytes()), extractor, name="-"))
+    assert len(results) == len(images)
+    for (record, _), image in zip(results, images):
+        same_metadata(record["metadata"], extractor.extract_metadata(str(image)))
+
+
+def test_zip_from_pipe_is_rejected(images, tmp_path):
+    archive = tmp_path / "album.zip"
+    write_zip(archive, images)
+    with pytest.raises(ValueError):
+        list(extract_archive(Pipe(archive.read_bytes()), name="-"))
+
+
+@pytest.mark.parametrize("bad_first", [True, False])
+def test_archive_with_failed_member_is_not_recorded(images, tmp_path, bad_first):
+    root = tmp_path / "scan"
+    root.mkdir()
+    archive = root / "album.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        members = [("bad.jpg", b"\xff\xd8 pas un JPEG")] + [(image.name, image.read_bytes()) for image in images]
+        if not bad_first:
+            members.reverse()
+        for name, data in members:
+            zf.writestr(name, data)
+
+    write_zip(root / "good.zip", images)
+
+    manifest_path = tmp_path / "manifest.db"
+    argv = [str(root), "-w", "1", "--archives", "-o", str(tmp_path / "out.jsonl"), "--manifest", str(manifest_path)]
+    assert main.main(argv) == 0
+    manifest = ScanManifest(str(manifest_path))
+    try:
+        assert manifest.connection.execute("SELECT path FROM files").fetchall() == [(str(root / "good.zip"),)]
+    finally:
+        manifest.close()
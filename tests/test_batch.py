@@ -0,0 +1,186 @@
+import pytest
+from PIL import Image
+from PIL.TiffImagePlugin import IFDRational
+
+import export
+import main
+from exif_parser import GPS_IFD_TAG
+from manifest import ScanManifest
+
+
+def write_jpeg(path, latitude=48.5, longitude=2.25, shade=0):
+    exif = Image.Exif()
+    exif[0x010F] = "TestCam"
+    gps = exif.get_ifd(GPS_IFD_TAG)
+    gps[1] = "N"
+    gps[2] = (IFDRational(int(latitude), 1), IFDRational(int(latitude % 1 * 60), 1), IFDRational(0, 1))
+    gps[3] = "E"
+    gps[4] = (IFDRational(int(longitude), 1), IFDRational(int(longitude % 1 * 60), 1), IFDRational(0, 1))
+    exif[GPS_IFD_TAG] = 0
+    Image.new("RGB", (64, 48), (shade, shade, shade)).save(path, format="JPEG", exif=exif)
+
+
+@pytest.fixture
+def photos(tmp_path):
+    root = tmp_path / "photos"
+    root.mkdir()
+    for i in range(5):
+        write_jpeg(root / f"img{i}.jpg", latitude=40 + i, shade=i * 40)
+    return root
+
+
+def manifest_paths(path):
+    manifest = ScanManifest(str(path))
+    try:
+        return {row[0] for row in manifest.connection.execute("SELECT path FROM files")}
+    finally:
+        manifest.close()
+
+
+def test_export_keeps_thumbnail_path(photos, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    out = tmp_path / "out.parquet"
+    thumbs = tmp_path / "thumbs"
+    assert main.main([str(photos), "-w", "1", "--export", str(out), "--thumbnails", str(thumbs)]) == 0
+    table = pq.read_table(out).to_pydict()
+    assert len(table["thumbnail"]) == 5
+    assert all(path and path.startswith(str(thumbs)) for path in table["thumbnail"])
+
+
+def test_manifest_not_committed_before_export_is_closed(photos, tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    manifest = tmp_path / "manifest.db"
+
+    def fail_close(self):
+        raise OSError("disque plein")
+
+    monkeypatch.setattr(export.ArrowWriter, "close", fail_close)
+    with pytest.raises(OSError):
+        main.main([str(photos), "-w", "1", "--export", str(tmp_path / "out.arrow"), "--manifest", str(manifest)])
+    assert manifest_paths(manifest) == set()
+
+    monkeypatch.undo()
+    assert main.main([str(photos), "-w", "1", "--export", str(tmp_path / "out.arrow"), "--manifest", str(manifest)]) == 0
+    assert len(manifest_paths(manifest)) == 5
+
+
+@pytest.fixture
+def photos_with_archive(photos):
+    import zipfile
+
+    members = photos.parent / "members"
+    members.mkdir()
+    with zipfile.ZipFile(photos / "album.zip", "w") as zf:
+        for i in range(2):
+            member = members / f"member{i}.jpg"
+            write_jpeg(member, latitude=10 + i, shade=200 + i * 20)
+            zf.write(member, member.name)
+    return photos
+
+
+def test_deleted_files_leave_geo_index(photos_with_archive, tmp_path):
+    from geo_index import GeoIndex
+
+    photos = photos_with_archive
+    argv = [str(photos), "-w", "1", "--archives", "-o", str(tmp_path / "out.jsonl"),
+            "--manifest", str(tmp_path / "manifest.db"), "--geo-index", str(tmp_path / "geo.db")]
+    assert main.main(argv) == 0
+    index = GeoIndex(str(tmp_path / "geo.db"))
+    assert len(index) == 7
+    index.close()
+
+    (photos / "img0.jpg").unlink()
+    (photos / "album.zip").unlink()
+    assert main.main(argv) == 0
+    index = GeoIndex(str(tmp_path / "geo.db"))
+    try:
+        assert len(index) == 4
+        nearest = [match[0] for match in index.nearest(40, 2.25, k=10)]
+        assert str(photos / "img0.jpg") not in nearest
+        assert not any("album.zip" in path for path in nearest)
+    finally:
+        index.close()
+
+
+def test_deleted_files_leave_duplicate_index(photos_with_archive, tmp_path):
+    import json
+
+    from dedup import DuplicateIndex
+
+    photos = photos_with_archive
+    duplicates = tmp_path / "clusters.jsonl"
+    argv = [str(photos), "-w", "1", "--archives", "-o", str(tmp_path / "out.jsonl"),
+            "--manifest", str(tmp_path / "manifest.db"), "--dedup", str(tmp_path / "dedup.db"),
+            "--duplicates", str(duplicates)]
+    assert main.main(argv) == 0
+    # Images unies : même dHash, un seul groupe
+    clusters = [json.loads(line) for line in duplicates.read_text().splitlines()]
+    assert [len(cluster["paths"]) for cluster in clusters] == [5]
+
+    (photos / "img0.jpg").unlink()
+    (photos / "img1.jpg").unlink()
+    (photos / "album.zip").unlink()
+    assert main.main(argv) == 0
+    clusters = [json.loads(line) for line in duplicates.read_text().splitlines()]
+    assert len(clusters) == 1
+    assert sorted(clusters[0]["paths"]) == [str(photos / f"img{i}.jpg") for i in range(2, 5)]
+    index = DuplicateIndex(str(tmp_path / "dedup.db"))
+    try:
+        assert len(index) == 3
+    finally:
+        index.close()
+
+
+def test_worker_metrics_match_file_count(tmp_path):
+    from metrics import metrics
+
+    root = tmp_path / "many"
+    root.mkdir()
+    for i in range(60):
+        write_jpeg(root / f"img{i:02d}.jpg", latitude=10 + i % 50, shade=i * 4)
+    # Compteurs non nuls dans le processus principal avant la création des processus de travail
+    metrics.increment("files_processed", 1000)
+
+    before = metrics.snapshot()["counters"]
+    argv = [str(root), "-w", "3", "--io-threads", "4", "-o", str(tmp_path / "out.jsonl")]
+    assert main.main(argv) == 0
+    after = metrics.snapshot()["counters"]
+
+    def delta(name):
+        return after.get(name, 0) - before.get(name, 0)
+
+    assert delta("files_processed") == 60
+    assert delta('pipeline_items{stage="io"}') == 60
+    assert delta("gps_hits") == 60
+
+
+def test_crashing_file_does_not_fail_others(tmp_path, monkeypatch):
+    import os
+
+    import batch
+
+    root = tmp_path / "crash"
+    root.mkdir()
+    paths = []
+    for i in range(120):
+        path = root / f"img{i:03d}.jpg"
+        Image.new("RGB", (16, 16), (i, i, i)).save(path, format="JPEG")
+        paths.append(str(path))
+    bad = paths[37]
+    extract_records = batch.extract_records
+
+    def crash_on_bad(chunk):
+        # Hérité par les processus de travail (fork)
+        if any(batch.entry_path(path) == bad for path in chunk):
+            os._exit(1)
+        return extract_records(chunk)
+
+    monkeypatch.setattr(batch, "extract_records", crash_on_bad)
+    records = list(batch.run_batch(paths, workers=4, chunk_size=4))
+
+    by_path = {record["path"]: record for record in records}
+    assert len(records) == len(paths) == len(by_path)
+    assert by_path[bad]["error"] == "Le processus de travail s'est arrêté"
+    for path in paths:
+        if path != bad:
+            assert "metadata" in by_path[path], by_path[path]
@@ -0,0 +1,150 @@
+import os
+
+from PIL import Image
+
+from cache import MetadataCache
+from extractor import MetadataExtractor
+
+
+def write_jpeg(path):
+    exif = Image.Exif()
+    exif[0x010F] = "TestCam"
+    exif[0x0110] = "Model 1"
+    Image.new("RGB", (32, 32)).save(path, format="JPEG", exif=exif)
+
+
+def test_other_tag_set_counts_as_miss(tmp_path):
+    image = tmp_path / "a.jpg"
+    write_jpeg(image)
+    cache = MetadataCache(str(tmp_path / "cache.db"))
+    try:
+        make = MetadataExtractor(cache=cache, tags=["Make"])
+        model = MetadataExtractor(cache=cache, tags=["Model"])
+
+        assert make.extract_metadata(str(image))["exif_info"]["Make"] == "TestCam"
+        assert model.extract_metadata(str(image))["exif_info"]["Model"] == "Model 1"
+        assert (cache.hits, cache.misses) == (0, 2)
+
+        assert model.extract_metadata(str(image))["exif_info"]["Model"] == "Model 1"
+        assert (cache.hits, cache.misses) == (1, 2)
+
+        # Sans liste de tags, une entrée restreinte n'est pas servie non plus
+        assert MetadataExtractor(cache=cache).extract_metadata(str(image))["exif_info"]["Make"] == "TestCam"
+        assert (cache.hits, cache.misses) == (1, 3)
+    finally:
+        cache.close()
+
+
+def test_prefetched_other_tag_set_counts_as_miss(tmp_path):
+    image = tmp_path / "a.jpg"
+    write_jpeg(image)
+    file_stat = os.stat(image)
+    head = image.read_bytes()
+    cache = MetadataCache(str(tmp_path / "cache.db"))
+    try:
+        MetadataExtractor(cache=cache, tags=["Make"]).extract_prefetched(str(image), file_stat, head)
+        metadata = MetadataExtractor(cache=cache, tags=["Model"]).extract_prefetched(str(image), file_stat, head)
+        assert metadata["exif_info"]["Model"] == "Model 1"
+        assert (cache.hits, cache.misses) == (0, 2)
+    finally:
+        cache.close()
+
+
+def test_content_hash_lookup_skips_other_tag_set(tmp_path):
+    image = tmp_path / "a.jpg"
+    write_jpeg(image)
+    cache = MetadataCache(str(tmp_path / "cache.db"), use_content_hash=True)
+    try:
+        MetadataExtractor(cache=cache, tags=["Make"]).extract_metadata(str(image))
+        moved = tmp_path / "b.jpg"
+        os.rename(image, moved)
+        metadata = MetadataExtractor(cache=cache, tags=["Model"]).extract_metadata(str(moved))
+        assert metadata["exif_info"]["Model"] == "Model 1"
+        assert (cache.hits, cache.hash_hits, cache.misses) == (0, 0, 2)
+    finally:
+        cache.close()
+
+
+class Stat:
+    def __init__(self, size, mtime_ns=1):
+        self.st_size = size
+        self.st_mtime_ns = mtime_ns
+
+
+def test_hit_miss_and_hash_hit(tmp_path):
+    image = tmp_path / "a.jpg"
+    write_jpeg(image)
+    cache = MetadataCache(str(tmp_path / "cache.db"), use_content_hash=True)
+    try:
+        file_stat = os.stat(image)
+        assert cache.get(str(image), file_stat)[0] is None
+        cache.put(str(image), file_stat, {"value": 1})
+        assert cache.get(str(image), file_stat) == ({"value": 1}, None)
+
+        # Fichier modifié : même chemin, autre mtime
+        changed = Stat(file_stat.st_size, file_stat.st_mtime_ns + 1)
+        payload, content_hash = cache.get(str(image), changed)
+        assert payload == {"value": 1} and content_hash is not None
+
+        moved = tmp_path / "b.jpg"
+        os.rename(image, moved)
+        assert cache.get(str(moved), os.stat(moved))[0] == {"value": 1}
+        assert (cache.hits, cache.hash_hits, cache.misses) == (1, 2, 1)
+    finally:
+        cache.close()
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = MetadataCache(str(tmp_path / "cache.db"), max_bytes=10000)
+    try:
+        for i in range(8):
+            cache.put(str(tmp_path / f"{i}.jpg"), Stat(i), b"x" * 1000)
+        # La première entrée redevient la plus récente
+        assert cache.get(str(tmp_path / "0.jpg"), Stat(0))[0] is not None
+        for i in range(8, 12):
+            cache.put(str(tmp_path / f"{i}.jpg"), Stat(i), b"x" * 1000)
+
+        assert cache.evictions > 0
+        assert cache.total_bytes <= 10000
+        assert cache.get(str(tmp_path / "0.jpg"), Stat(0))[0] is not None
+        assert cache.get(str(tmp_path / "1.jpg"), Stat(1))[0] is None
+        assert cache.get(str(tmp_path / "11.jpg"), Stat(11))[0] is not None
+        stored = cache.connection.execute("SELECT COALESCE(SUM(LENGTH(payload)), 0) FROM metadata").fetchone()[0]
+        assert stored == cache.total_bytes
+    finally:
+        cache.close()
+
+
+def fill_cache(db_path, worker, count):
+    cache = MetadataCache(db_path, max_bytes=20000)
+    for i in range(count):
+        cache.put(f"/images/{worker}/{i}.jpg", Stat(i), b"x" * 500)
+    cache.close()
+
+
+def test_max_bytes_holds_across_processes(tmp_path):
+    from concurrent.futures import ProcessPoolExecutor
+
+    db_path = str(tmp_path / "cache.db")
+    MetadataCache(db_path).close()
+    with ProcessPoolExecutor(max_workers=8) as executor:
+        list(executor.map(fill_cache, [db_path] * 8, range(8), [30] * 8))
+
+    cache = MetadataCache(db_path, max_bytes=20000)
+    try:
+        stored = cache.connection.execute("SELECT COALESCE(SUM(LENGTH(payload)), 0) FROM metadata").fetchone()[0]
+        assert stored == cache.total_bytes
+        assert stored <= 20000
+    finally:
+        cache.close()
+
+
+def test_zero_max_bytes_is_not_the_default(tmp_path):
+    import batch
+
+    batch.init_worker({"cache_path": str(tmp_path / "cache.db"), "cache_max_bytes": 0})
+    try:
+        assert batch._extractor.cache.max_bytes == 0
+    finally:
+        batch._extractor.cache.close()
+        batch._extractor = None
@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+import dedup
+from dedup import MAX_DISTANCE, MAX_VARIABLES, DuplicateIndex, neighbour_queries
+from search_cache import hamming
+
+
+def flip(phash, bits):
+    for bit in bits:
+        phash ^= 1 << bit
+    return phash
+
+
+@pytest.fixture
+def index(tmp_path):
+    rng = random.Random(7)
+    index = DuplicateIndex(str(tmp_path / "dedup.db"))
+    base = rng.getrandbits(64)
+    hashes = {}
+    # Voisins de ``base`` à toutes les distances, et images sans rapport
+    for distance in range(0, 30):
+        phash = flip(base, rng.sample(range(64), distance))
+        hashes[f"/near/{distance}.jpg"] = phash
+    for i in range(200):
+        hashes[f"/far/{i}.jpg"] = rng.getrandbits(64)
+    for path, phash in hashes.items():
+        index.add(path, path, phash)
+    index.commit()
+    yield index, base, hashes
+    index.close()
+
+
+@pytest.mark.parametrize("distance", [0, dedup.DEFAULT_MAX_DISTANCE, 15, MAX_DISTANCE])
+def test_similar_matches_brute_force(index, distance):
+    index, base, hashes = index
+    expected = sorted(
+        (path, hamming(base, phash)) for path, phash in hashes.items() if hamming(base, phash) <= distance
+    )
+    found = sorted((path, match_distance) for path, match_distance, _ in index.similar("autre", base, distance))
+    assert found == expected
+
+
+def test_queries_stay_under_variable_limit():
+    queries = list(neighbour_queries(random.Random(1).getrandbits(64), MAX_DISTANCE // 3))
+    assert len(queries) > 1
+    assert all(len(params) <= MAX_VARIABLES for _, params in queries)
+
+
+def test_distance_beyond_limit_is_rejected(index, tmp_path, capsys):
+    index, base, _ = index
+    with pytest.raises(ValueError):
+        index.similar("autre", base, MAX_DISTANCE + 1)
+    with pytest.raises(ValueError):
+        DuplicateIndex(str(tmp_path / "other.db"), max_distance=MAX_DISTANCE + 1)
+    with pytest.raises(SystemExit):
+        dedup.main([index.db_path, "similar", "image.jpg", "-d", str(MAX_DISTANCE + 1)])
+    assert "--distance" in capsys.readouterr().err
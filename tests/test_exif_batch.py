@@ -0,0 +1,127 @@
+import json
+import math
+import os
+import subprocess
+import sys
+
+import pytest
+from PIL.TiffImagePlugin import IFDRational
+
+import exif_batch
+from extractor import GPS_LATITUDE, GPS_LATITUDE_REF, GPS_LONGITUDE, GPS_LONGITUDE_REF, MetadataExtractor
+
+
+def dms(d, m, s):
+    return (IFDRational(*d), IFDRational(*m), IFDRational(*s))
+
+
+def gps(lat, lon, lat_ref="N", lon_ref="E"):
+    info = {GPS_LATITUDE: lat, GPS_LONGITUDE: lon}
+    if lat_ref is not None:
+        info[GPS_LATITUDE_REF] = lat_ref
+    if lon_ref is not None:
+        info[GPS_LONGITUDE_REF] = lon_ref
+    return info
+
+
+PARIS = dms((48, 1), (51, 1), (2938, 100))
+GREENWICH_WEST = dms((0, 1), (5, 1), (3141, 1000))
+
+CASES = {
+    "nord-est": gps(PARIS, dms((2, 1), (21, 1), (354, 10))),
+    "sud-ouest": gps(dms((33, 1), (52, 1), (4, 1)), dms((151, 1), (12, 1), (3620, 100)), "S", "W"),
+    "références absentes": gps(PARIS, PARIS, None, None),
+    "références inconnues": gps(PARIS, PARIS, "X", b"W"),
+    "minutes seules": gps(dms((0, 1), (30, 1), (0, 1)), GREENWICH_WEST, "N", "W"),
+    "équateur": gps(dms((0, 1), (0, 1), (0, 1)), PARIS),
+    "dénominateur nul": gps(dms((48, 0), (51, 1), (0, 1)), PARIS),
+    "secondes à 0/0": gps(PARIS, dms((2, 1), (21, 1), (0, 0))),
+    "NaN": gps((float("nan"), 0.0, 0.0), PARIS),
+    "infini": gps((float("inf"), 0.0, 0.0), PARIS, "S"),
+    "entiers et chaînes": gps((48, "51", 2.5), (2, 21, "35.4")),
+    "liste au lieu de tuple": gps([48.0, 51.0, 29.0], [2.0, 21.0, 35.0]),
+    "deux valeurs": gps((48.0, 51.0), PARIS),
+    "quatre valeurs": gps((48.0, 51.0, 0.0, 1.0), PARIS),
+    "vide": gps((), PARIS),
+    "valeur non numérique": gps(("abc", 0, 0), PARIS),
+    "None dans le tuple": gps((None, 0, 0), PARIS),
+    "longitude absente": {GPS_LATITUDE: PARIS, GPS_LATITUDE_REF: "N"},
+    "dictionnaire vide": {},
+    "entier": 42,
+    "chaîne": "GPS",
+    "None": None,
+}
+
+
+def same(a, b):
+    """Égalité des positions, NaN compris, bit à bit"""
+    if a is None or b is None:
+        return a is None and b is None
+    if set(a) != set(b):
+        return False
+    return all(
+        (math.isnan(a[key]) and math.isnan(b[key])) or (a[key] == b[key] and math.copysign(1, a[key]) == math.copysign(1, b[key]))
+        for key in a
+    )
+
+
+def expected(extractor, gps_info):
+    return extractor.process_gps_data(gps_info) or None
+
+
+@pytest.fixture(params=["numpy", "scalaire"])
+def mode(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(exif_batch, "numpy_module", lambda: None)
+    return request.param
+
+
+@pytest.mark.parametrize("name", list(CASES))
+def test_apply_gps_matches_process_gps_data(name, mode):
+    extractor = MetadataExtractor()
+    exif_info = {"GPSInfo": CASES[name]}
+    exif_batch.apply_gps([exif_info], extractor)
+    assert same(exif_info.get("GPS"), expected(extractor, CASES[name]))
+
+
+def test_apply_gps_whole_batch(mode):
+    extractor = MetadataExtractor()
+    exif_infos = [{"GPSInfo": gps_info} for gps_info in CASES.values()]
+    # Une position déjà présente est remplacée ou retirée
+    exif_infos.append({"GPSInfo": CASES["équateur"], "GPS": {"latitude": 1.0, "longitude": 1.0}})
+    exif_infos.append({"Make": "TestCam"})
+    exif_batch.apply_gps(exif_infos, extractor)
+
+    for exif_info in exif_infos[:-1]:
+        assert same(exif_info.get("GPS"), expected(extractor, exif_info["GPSInfo"]))
+    assert exif_infos[-1] == {"Make": "TestCam"}
+
+
+def test_apply_gps_counts_hits_like_process_gps_data(mode):
+    from metrics import metrics
+
+    extractor = MetadataExtractor()
+    before = metrics.snapshot()["counters"].get("gps_hits", 0)
+    for gps_info in CASES.values():
+        extractor.process_gps_data(gps_info)
+    scalar = metrics.snapshot()["counters"].get("gps_hits", 0) - before
+
+    before = metrics.snapshot()["counters"].get("gps_hits", 0)
+    exif_batch.apply_gps([{"GPSInfo": gps_info} for gps_info in CASES.values()], extractor)
+    assert metrics.snapshot()["counters"].get("gps_hits", 0) - before == scalar
+
+
+def test_numpy_loaded_only_for_gps_rows():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    probe = (
+        "import json, sys\n"
+        "import batch, exif_batch\n"
+        "loaded = ['numpy' in sys.modules]\n"
+        "exif_batch.apply_gps([{'Make': 'TestCam'}, {'GPSInfo': 42}])\n"
+        "loaded.append('numpy' in sys.modules)\n"
+        "print(json.dumps(loaded))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", probe], cwd=root, capture_output=True, text=True, check=True)
+    assert json.loads(result.stdout) == [False, False]
@@ -0,0 +1,122 @@
+import io
+import os
+
+from PIL import Image
+from PIL.TiffImagePlugin import IFDRational
+
+from exif_parser import DEFAULT_MAX_BYTES, EXIF_IFD_TAG, GPS_IFD_TAG, TIFF_STRUCTURE_TAGS, ExifHeaderReader
+from extractor import MetadataExtractor
+
+
+def write_tiff(path, with_exif=True):
+    exif = None
+    if with_exif:
+        exif = Image.Exif()
+        exif[0x010F] = "TestCam"
+        exif.get_ifd(EXIF_IFD_TAG)[0x9003] = "2024:05:17 10:30:00"
+        exif[EXIF_IFD_TAG] = 0
+        gps = exif.get_ifd(GPS_IFD_TAG)
+        gps[1] = "N"
+        gps[2] = (IFDRational(48, 1), IFDRational(51, 1), IFDRational(0, 1))
+        gps[3] = "E"
+        gps[4] = (IFDRational(2, 1), IFDRational(21, 1), IFDRational(0, 1))
+        exif[GPS_IFD_TAG] = 0
+    options = {"exif": exif} if exif is not None else {}
+    # Plusieurs bandes : StripOffsets et StripByteCounts sont des tuples
+    Image.new("RGB", (64, 256)).save(path, format="TIFF", **options)
+
+
+def test_tiff_exif_has_no_structure_tags(tmp_path):
+    path = tmp_path / "gps.tiff"
+    write_tiff(path)
+    extractor = MetadataExtractor()
+    exif_info = extractor.extract_metadata(str(path))["exif_info"]
+    assert exif_info["Make"] == "TestCam"
+    assert exif_info["DateTimeOriginal"] == "2024:05:17 10:30:00"
+    assert round(exif_info["GPS"]["latitude"], 2) == 48.85
+    for name in ("StripOffsets", "StripByteCounts", "BitsPerSample", "ImageWidth", "Compression"):
+        assert name not in exif_info
+
+
+def test_tiff_without_exif_is_empty(tmp_path):
+    path = tmp_path / "plain.tiff"
+    write_tiff(path, with_exif=False)
+    assert MetadataExtractor().extract_metadata(str(path))["exif_info"] == {}
+
+
+def test_pillow_fallback_skips_structure_tags(tmp_path):
+    path = tmp_path / "gps.tiff"
+    write_tiff(path)
+    with Image.open(path) as img:
+        raw = MetadataExtractor.pillow_exif(img)
+    assert not TIFF_STRUCTURE_TAGS & set(raw)
+    assert raw[0x010F] == "TestCam"
+
+
+def write_jpeg(path, padding=0):
+    """JPEG avec IFD0, ExifIFD (MakerNote comprise) et GPS ; ``padding`` octets de segments APP15 avant l'EXIF"""
+    exif = Image.Exif()
+    exif[0x010F] = "TestCam"
+    exif[0x0110] = "Model 1"
+    exif[0x0112] = 6
+    exif[0x011A] = IFDRational(300, 1)
+    exif_ifd = exif.get_ifd(EXIF_IFD_TAG)
+    exif_ifd[0x9003] = "2024:05:17 10:30:00"
+    exif_ifd[0x829A] = IFDRational(1, 250)
+    exif_ifd[0x8827] = 400
+    exif_ifd[0x927C] = bytes(range(256)) * 4
+    exif[EXIF_IFD_TAG] = 0
+    gps = exif.get_ifd(GPS_IFD_TAG)
+    gps[1] = "S"
+    gps[2] = (IFDRational(33, 1), IFDRational(52, 1), IFDRational(4, 1))
+    gps[3] = "W"
+    gps[4] = (IFDRational(151, 1), IFDRational(12, 1), IFDRational(3620, 100))
+    exif[GPS_IFD_TAG] = 0
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), (200, 100, 50)).save(buffer, format="JPEG", exif=exif)
+    data = buffer.getvalue()
+    segments = b""
+    while padding > 0:
+        size = min(padding, 65533)
+        segments += b"\xff\xef" + (size + 2).to_bytes(2, "big") + b"\x00" * size
+        padding -= size
+    path.write_bytes(data[:2] + segments + data[2:])
+
+
+class CountingFile(io.FileIO):
+    bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def test_jpeg_header_matches_pillow(tmp_path):
+    path = tmp_path / "full.jpg"
+    write_jpeg(path)
+    with Image.open(path) as img:
+        expected = img._getexif()
+    assert expected[0x927C] == bytes(range(256)) * 4
+    assert ExifHeaderReader().parse(path.read_bytes()) == expected
+
+
+def test_exif_beyond_limit_falls_back_to_pillow(tmp_path, monkeypatch):
+    path = tmp_path / "padded.jpg"
+    write_jpeg(path, padding=DEFAULT_MAX_BYTES + 1000)
+    reader = ExifHeaderReader()
+
+    with CountingFile(path) as fp:
+        assert reader.read(fp, os.path.getsize(path)) is None
+        assert fp.bytes_read <= DEFAULT_MAX_BYTES
+
+    calls = []
+    pillow_exif = MetadataExtractor.pillow_exif
+    monkeypatch.setattr(MetadataExtractor, "pillow_exif", staticmethod(lambda img: calls.append(img) or pillow_exif(img)))
+    extractor = MetadataExtractor()
+    with Image.open(path) as img:
+        expected = extractor.decode_exif(img._getexif())
+    assert extractor.extract_metadata(str(path))["exif_info"] == expected
+    assert len(calls) == 1
+    assert expected["Make"] == "TestCam" and expected["GPS"]["latitude"] < 0
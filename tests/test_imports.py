@@ -0,0 +1,54 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from bench import HEAVY_MODULES, bench_imports
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Budgets d'un processus neuf : durée cumulée de l'import (-X importtime) et RSS maximal.
+# Mesuré vers 45 ms / 20 Mo (main, extractor) et 90 ms / 26 Mo (batch) ; Selenium
+# ajoute à lui seul plus de 300 ms et 18 Mo.
+IMPORT_BUDGETS = {
+    "main": (250, 32 * 1024),
+    "extractor": (250, 32 * 1024),
+    "batch": (350, 40 * 1024),
+}
+
+PROBE = """
+import json, sys
+{statement}
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+@pytest.mark.parametrize("statement", [
+    "import main",
+    "from main import MetadataExtractor",
+    "from extractor import MetadataExtractor",
+    "import batch",
+])
+def test_extraction_does_not_load_heavy_modules(statement):
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(statement=statement)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    modules = json.loads(result.stdout)
+    loaded = [
+        name for name in modules
+        if any(name == prefix or name.startswith(prefix + ".") for prefix in HEAVY_MODULES)
+    ]
+    assert loaded == []
+
+
+@pytest.mark.parametrize("module", sorted(IMPORT_BUDGETS))
+def test_import_cost_within_budget(module):
+    max_ms, max_rss_kb = IMPORT_BUDGETS[module]
+    # Meilleure de trois mesures : un seul processus lent ne fait pas échouer le test
+    reports = [bench_imports([module])[0] for _ in range(3)]
+    assert min(report["import_ms"] for report in reports) <= max_ms
+    assert min(report["max_rss_kb"] for report in reports) <= max_rss_kb
+    assert all(report["heavy_modules"] == [] for report in reports)
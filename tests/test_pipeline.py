@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+from batch import run_batch
+from pipeline import HeaderPrefetcher
+
+
+class SlowOpener:
+    """``open`` ralenti de ``latency`` secondes, qui compte les lectures en cours ou non consommées"""
+    def __init__(self, latency, failing=()):
+        self.latency = latency
+        self.failing = set(failing)
+        self.lock = threading.Lock()
+        self.started = 0
+        self.consumed = 0
+        self.max_outstanding = 0
+
+    def __call__(self, path, mode):
+        with self.lock:
+            self.started += 1
+            self.max_outstanding = max(self.max_outstanding, self.started - self.consumed)
+        time.sleep(self.latency)
+        if path in self.failing:
+            raise OSError(f"Délai dépassé : {path}")
+        return open(path, mode)
+
+    def consume(self):
+        with self.lock:
+            self.consumed += 1
+
+
+@pytest.fixture
+def images(tmp_path):
+    paths = []
+    for i in range(40):
+        path = tmp_path / f"img{i:02d}.jpg"
+        Image.new("RGB", (16, 16), (i, i, i)).save(path, format="JPEG")
+        paths.append(str(path))
+    return paths
+
+
+def test_reads_in_flight_stay_within_queue_size(images):
+    opener = SlowOpener(0.002)
+    prefetcher = HeaderPrefetcher(images, threads=4, queue_size=6, opener=opener)
+    seen = []
+    for entry in prefetcher:
+        opener.consume()
+        # Consommateur plus lent que la lecture
+        time.sleep(0.005)
+        seen.append(entry.path)
+    assert sorted(seen) == images
+    assert opener.max_outstanding <= 6
+    assert prefetcher.stats()["files"] == len(images)
+
+
+def test_threads_hide_latency(images):
+    durations = {}
+    for threads in (1, 8):
+        prefetcher = HeaderPrefetcher(images, threads=threads, opener=SlowOpener(0.02))
+        start = time.perf_counter()
+        assert len(list(prefetcher)) == len(images)
+        durations[threads] = time.perf_counter() - start
+    assert durations[8] < durations[1] / 2
+
+
+def test_opener_errors_become_error_records(images):
+    failing = {images[3], images[17]}
+    prefetcher = HeaderPrefetcher(images, threads=4, opener=SlowOpener(0.001, failing))
+    records = list(run_batch(prefetcher, workers=1))
+
+    assert sorted(record["path"] for record in records) == images
+    for record in records:
+        if record["path"] in failing:
+            assert set(record) == {"path", "error"}
+            assert "Délai dépassé" in record["error"]
+        else:
+            assert "metadata" in record
+    assert prefetcher.stats()["errors"] == 2
@@ -0,0 +1,215 @@
+import functools
+import os
+import shutil
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+pytest.importorskip("selenium")
+pytest.importorskip("webdriver_manager")
+
+import reverse_search
+from metrics import metrics
+from reverse_search import DriverPool, ImageReverseSearch
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "search")
+
+
+class FakeDriver:
+    """Faux driver : ``current_url`` échoue une fois le navigateur « mort »"""
+    def __init__(self):
+        self.alive = True
+        self.quit_calls = 0
+
+    @property
+    def current_url(self):
+        if not self.alive:
+            raise RuntimeError("navigateur arrêté")
+        return "about:blank"
+
+    def quit(self):
+        self.quit_calls += 1
+
+
+class FakeFactory:
+    def __init__(self):
+        self.drivers = []
+
+    def __call__(self):
+        driver = FakeDriver()
+        self.drivers.append(driver)
+        return driver
+
+
+def test_driver_is_reused_then_recycled_after_max_uses():
+    factory = FakeFactory()
+    pool = DriverPool(max_size=1, max_uses=2, factory=factory)
+    with pool.driver() as first:
+        pass
+    with pool.driver() as second:
+        pass
+    assert second is first
+    assert first.quit_calls == 1
+
+    with pool.driver() as third:
+        pass
+    assert third is not first
+    assert len(factory.drivers) == 2
+
+
+def test_unhealthy_driver_is_replaced():
+    factory = FakeFactory()
+    pool = DriverPool(max_size=1, factory=factory)
+    with pool.driver() as first:
+        pass
+    first.alive = False
+    with pool.driver() as second:
+        pass
+    assert second is not first
+    assert first.quit_calls == 1
+    assert second.quit_calls == 0
+
+
+def test_driver_is_discarded_after_exception():
+    factory = FakeFactory()
+    pool = DriverPool(max_size=1, factory=factory)
+    with pytest.raises(ValueError):
+        with pool.driver() as first:
+            raise ValueError("échec de la recherche")
+    assert first.quit_calls == 1
+    with pool.driver() as second:
+        pass
+    assert second is not first
+
+
+def test_close_with_checked_out_driver():
+    factory = FakeFactory()
+    pool = DriverPool(max_size=2, factory=factory)
+    idle = pool.acquire()
+    busy = pool.acquire()
+    pool.release(idle)
+
+    pool.close()
+    assert idle.quit_calls == 1
+    assert busy.quit_calls == 0
+
+    pool.release(busy)
+    assert busy.quit_calls == 1
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+
+
+def test_pool_never_exceeds_max_size():
+    factory = FakeFactory()
+    pool = DriverPool(max_size=2, factory=factory)
+    drivers = [pool.acquire(), pool.acquire()]
+    assert not pool.slots.acquire(timeout=0.05)
+    for driver in drivers:
+        pool.release(driver)
+    assert len(factory.drivers) == 2
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fixture_server():
+    """Serveur HTTP local des pages de tests/fixtures/search"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=FIXTURES))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def chrome_pool(monkeypatch):
+    """Pool de vrais drivers Chrome headless ; le test est sauté sans chromedriver local"""
+    driver_path = shutil.which("chromedriver")
+    if driver_path is None:
+        pytest.skip("chromedriver introuvable dans le PATH")
+    monkeypatch.setattr(reverse_search, "_driver_path", driver_path)
+    pool = DriverPool(max_size=1)
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def image_path(tmp_path):
+    path = tmp_path / "image.jpg"
+    Image.new("RGB", (32, 32), "red").save(path)
+    return str(path)
+
+
+def test_run_search_against_fixture_pages(fixture_server, chrome_pool, image_path):
+    search = ImageReverseSearch(pool=chrome_pool, search_url=fixture_server + "/index.html",
+                                timeouts={"navigation": 10, "upload": 10, "results": 10})
+    timings = {}
+    results = search.run_search(image_path, timings)
+
+    assert results["descriptions"] == ["Tour Eiffel - Wikipédia", "Paris, vue du Champ-de-Mars"]
+    assert results["sites"] == ["https://fr.wikipedia.org/wiki/Tour_Eiffel", "https://example.com/paris"]
+    assert set(timings) == {"navigation", "upload", "results", "extraction"}
+    # Les attentes explicites couvrent les délais d'affichage des pages de test
+    assert timings["navigation"] >= 0.3
+    assert timings["results"] >= 0.3
+    assert results["timings"] is timings
+
+
+def test_run_search_without_results_times_out_cleanly(fixture_server, chrome_pool, image_path):
+    search = ImageReverseSearch(pool=chrome_pool, search_url=fixture_server + "/empty.html",
+                                timeouts={"navigation": 10, "upload": 10, "results": 1})
+    timings = {}
+    results = search.run_search(image_path, timings)
+
+    assert results["sites"] == [] and results["descriptions"] == []
+    assert 1 <= timings["results"] < 5
+
+
+class SlowSearch(ImageReverseSearch):
+    """Recherche factice qui emprunte un driver et mesure la concurrence"""
+    def __init__(self, pool, fail=False):
+        super().__init__(pool=pool)
+        self.fail = fail
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def run_search(self, image_path, timings):
+        with self.pool.driver():
+            with self.lock:
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+            time.sleep(0.05)
+            with self.lock:
+                self.active -= 1
+            if self.fail:
+                raise RuntimeError("page indisponible")
+        return {"locations": [], "sites": [], "descriptions": []}
+
+
+def test_search_images_sizes_pool_from_workers():
+    factory = FakeFactory()
+    search = SlowSearch(DriverPool(max_size=2, factory=factory))
+    records = list(search.search_images([f"{i}.jpg" for i in range(8)], workers=4, rate=None))
+
+    assert len(records) == 8
+    assert search.max_active == 4
+    assert len(factory.drivers) == 4
+    # Aucun temps d'attente d'un driver libre dans la latence
+    assert max(record["latency"] for record in records) < 0.5
+
+
+def test_search_errors_counted_once_per_image():
+    search = SlowSearch(DriverPool(max_size=1, factory=FakeFactory()), fail=True)
+    before = metrics.snapshot()["counters"].get("search_errors", 0)
+    records = list(search.search_images(["a.jpg", "b.jpg"], workers=1, rate=None, retries=2, backoff=0))
+
+    assert [record["attempts"] for record in records] == [3, 3]
+    assert metrics.snapshot()["counters"].get("search_errors", 0) - before == 2
@@ -0,0 +1,149 @@
+"""Génération rapide de vignettes pour l'aperçu et l'export en lot"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+from exif_parser import DEFAULT_MAX_BYTES, ExifHeaderReader
+
+DEFAULT_SIZE = (350, 350)
+DEFAULT_MEMORY_ITEMS = 64
+JPEG_QUALITY = 90
+APP_CACHE_NAME = "image-xtract-metadata"
+
+
+def user_cache_dir():
+    """Dossier de vignettes propre à l'utilisateur ($XDG_CACHE_HOME ou ~/.cache)"""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, APP_CACHE_NAME, "thumbnails")
+
+
+class ThumbnailEngine:
+    """Classe pour produire des vignettes sans décoder l'image en pleine résolution
+
+    Dans l'ordre : vignette EXIF embarquée si elle couvre la taille demandée,
+    puis décodage JPEG réduit dans le domaine DCT (``draft``) et réduction au
+    chargement (``reducing_gap``). Les dernières vignettes sont gardées en
+    mémoire (LRU de ``memory_items`` éléments) et, si ``cache_dir`` est
+    fourni, sur disque, indexées par chemin, taille, ``st_mtime_ns`` et
+    dimensions demandées.
+    """
+    def __init__(self, size=DEFAULT_SIZE, memory_items=DEFAULT_MEMORY_ITEMS, cache_dir=None,
+                 max_header_bytes=DEFAULT_MAX_BYTES):
+        self.size = tuple(size)
+        self.memory_items = memory_items
+        self.cache_dir = cache_dir
+        self.header_reader = ExifHeaderReader(max_header_bytes)
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def thumbnail(self, image_path):
+        """Retourne la vignette d'une image (copie modifiable par l'appelant)"""
+        key = self.cache_key(image_path)
+        with self.lock:
+            cached = self.memory.get(key)
+            if cached is not None:
+                self.memory.move_to_end(key)
+                return cached.copy()
+
+        thumb = self.load_from_disk(key)
+        if thumb is None:
+            thumb = self.render(image_path)
+            self.save_to_disk(key, thumb)
+        self.remember(key, thumb)
+        return thumb.copy()
+
+    def thumbnail_path(self, image_path):
+        """Retourne le fichier de la vignette dans ``cache_dir``, en le créant au besoin"""
+        if not self.cache_dir:
+            raise ValueError("Aucun dossier de vignettes configuré")
+        key = self.cache_key(image_path)
+        path = self.disk_path(key)
+        if path is None:
+            self.save_to_disk(key, self.render(image_path))
+            path = self.disk_path(key)
+        return path
+
+    def cache_key(self, image_path):
+        """Clé de cache : chemin absolu, taille, date de modification et dimensions"""
+        file_stat = os.stat(image_path)
+        raw = f"{os.path.abspath(image_path)}|{file_stat.st_size}|{file_stat.st_mtime_ns}|{self.size[0]}x{self.size[1]}"
+        return hashlib.blake2b(raw.encode("utf-8", "surrogateescape"), digest_size=16).hexdigest()
+
+    def render(self, image_path):
+        """Calcule la vignette d'une image"""
+        with open(image_path, 'rb') as fp:
+            head = fp.read(self.header_reader.max_bytes)
+            embedded = self.embedded_thumbnail(head)
+            if embedded is not None:
+                return embedded
+
+            fp.seek(0)
+            with Image.open(fp) as img:
+                img.draft(img.mode, self.size)
+                img.thumbnail(self.size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+                return img.copy()
+
+    def embedded_thumbnail(self, head):
+        """Vignette EXIF embarquée, si elle est au moins aussi grande que la taille demandée"""
+        data = self.header_reader.read_thumbnail(head, complete=False)
+        if data is None:
+            return None
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                if img.width < self.size[0] and img.height < self.size[1]:
+                    return None
+                img.thumbnail(self.size, Image.Resampling.LANCZOS)
+                return img.copy()
+        except Exception:
+            return None
+
+    def remember(self, key, thumb):
+        """Ajoute une vignette au LRU en mémoire"""
+        with self.lock:
+            self.memory[key] = thumb
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_items:
+                self.memory.popitem(last=False)
+
+    def disk_path(self, key):
+        """Fichier existant de la vignette sur disque, ou None"""
+        if not self.cache_dir:
+            return None
+        for ext in (".jpg", ".png"):
+            path = os.path.join(self.cache_dir, key + ext)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def load_from_disk(self, key):
+        """Relit une vignette du cache disque"""
+        path = self.disk_path(key)
+        if path is None:
+            return None
+        try:
+            with Image.open(path) as img:
+                img.load()
+                return img.copy()
+        except Exception:
+            return None
+
+    def save_to_disk(self, key, thumb):
+        """Écrit une vignette dans le cache disque (JPEG, ou PNG si l'image a de la transparence)"""
+        if not self.cache_dir:
+            return
+        if thumb.mode in ("RGB", "L"):
+            path, image, fmt = os.path.join(self.cache_dir, key + ".jpg"), thumb, "JPEG"
+        else:
+            path, image, fmt = os.path.join(self.cache_dir, key + ".png"), thumb.convert("RGBA"), "PNG"
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if fmt == "JPEG":
+            image.save(tmp_path, fmt, quality=JPEG_QUALITY)
+        else:
+            image.save(tmp_path, fmt)
+        os.replace(tmp_path, path)
@@ -0,0 +1,146 @@
+"""Tableau Tk virtualisé pour parcourir de grands volumes de lignes"""
+import tkinter as tk
+from tkinter import ttk
+
+DEFAULT_ROW_HEIGHT = 20
+HEADER_HEIGHT = 25
+
+
+class VirtualTable(ttk.Frame):
+    """Classe pour afficher un grand tableau en ne créant que les lignes visibles
+
+    Les lignes restent dans une liste Python ; le ``ttk.Treeview`` ne
+    contient qu'autant d'éléments que la hauteur affichée, réutilisés et
+    remplis à chaque défilement. ``on_select`` reçoit l'indice de la ligne
+    choisie, ``on_activate`` celui de la ligne double-cliquée.
+    """
+    def __init__(self, parent, columns, on_select=None, on_activate=None, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.rows = []
+        self.offset = 0
+        self.visible = 1
+        self.selected = None
+        self.on_select = on_select
+        self.on_activate = on_activate
+
+        self.tree = ttk.Treeview(
+            self,
+            columns=[name for name, _ in columns],
+            show="headings",
+            selectmode="browse"
+        )
+        for name, width in columns:
+            self.tree.heading(name, text=name)
+            self.tree.column(name, width=width, stretch=True)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.on_scroll)
+
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self.row_height = int(ttk.Style().lookup("Treeview", "rowheight") or DEFAULT_ROW_HEIGHT)
+        self.tree.bind("<Configure>", self.on_resize)
+        self.tree.bind("<MouseWheel>", self.on_wheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll_by(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll_by(3))
+        self.tree.bind("<Up>", lambda event: self.move_selection(-1))
+        self.tree.bind("<Down>", lambda event: self.move_selection(1))
+        self.tree.bind("<Prior>", lambda event: self.move_selection(-self.visible))
+        self.tree.bind("<Next>", lambda event: self.move_selection(self.visible))
+        self.tree.bind("<ButtonRelease-1>", self.on_click)
+        self.tree.bind("<Double-1>", self.on_double_click)
+
+    def set_rows(self, rows):
+        """Remplace le contenu du tableau (liste de tuples, une valeur par colonne)"""
+        self.rows = rows
+        self.offset = 0
+        self.selected = None
+        self.render()
+
+    def append_rows(self, rows):
+        """Ajoute des lignes à la fin du tableau"""
+        self.rows.extend(rows)
+        self.render()
+
+    def render(self):
+        """Recopie la fenêtre visible des lignes dans les éléments du Treeview"""
+        self.offset = max(0, min(self.offset, len(self.rows) - self.visible))
+        items = self.tree.get_children()
+        wanted = min(self.visible, len(self.rows) - self.offset)
+
+        for item in items[wanted:]:
+            self.tree.delete(item)
+        for position in range(wanted):
+            index = self.offset + position
+            values = self.rows[index]
+            if position < len(items):
+                self.tree.item(items[position], values=values)
+            else:
+                self.tree.insert("", tk.END, iid=str(position), values=values)
+
+        self.tree.selection_set(
+            [str(self.selected - self.offset)]
+            if self.selected is not None and 0 <= self.selected - self.offset < wanted else []
+        )
+        if self.rows:
+            self.scrollbar.set(self.offset / len(self.rows), (self.offset + wanted) / len(self.rows))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def on_resize(self, event):
+        visible = max(1, (event.height - HEADER_HEIGHT) // self.row_height)
+        if visible != self.visible:
+            self.visible = visible
+            self.render()
+
+    def on_scroll(self, action, amount, unit=None):
+        """Commande de la barre de défilement (``moveto`` ou ``scroll``)"""
+        if action == "moveto":
+            self.offset = int(float(amount) * len(self.rows))
+        elif unit == "pages":
+            self.offset += int(amount) * self.visible
+        else:
+            self.offset += int(amount)
+        self.render()
+
+    def on_wheel(self, event):
+        self.scroll_by(-3 if event.delta > 0 else 3)
+
+    def scroll_by(self, count):
+        self.offset += count
+        self.render()
+        return "break"
+
+    def move_selection(self, step):
+        """Déplace la sélection au clavier en faisant défiler si besoin"""
+        if not self.rows:
+            return "break"
+        current = self.offset if self.selected is None else self.selected
+        self.select(max(0, min(len(self.rows) - 1, current + step)))
+        return "break"
+
+    def select(self, index):
+        """Sélectionne une ligne et la rend visible"""
+        self.selected = index
+        if index < self.offset:
+            self.offset = index
+        elif index >= self.offset + self.visible:
+            self.offset = index - self.visible + 1
+        self.render()
+        if self.on_select:
+            self.on_select(index)
+
+    def row_at(self, event):
+        item = self.tree.identify_row(event.y)
+        return self.offset + int(item) if item else None
+
+    def on_click(self, event):
+        index = self.row_at(event)
+        if index is not None:
+            self.select(index)
+
+    def on_double_click(self, event):
+        index = self.row_at(event)
+        if index is not None and self.on_activate:
+            self.on_activate(index)